@@ -17,6 +17,108 @@ class Settings:
     # Feature Flags
     DEMO_MODE: bool = os.getenv("DEMO_MODE", "True").lower() == "true"
 
+    # Local cache directory (point at an EFS mount on Lambda so it survives cold starts)
+    CACHE_DIR: str = os.getenv("CACHE_DIR", "/tmp/hyperbolic_cache")
+
+    # Bedrock Throughput
+    BEDROCK_POOL_SIZE: int = int(os.getenv("BEDROCK_POOL_SIZE", "32")) # keep-alive connections and dedicated threads
+    BEDROCK_STREAM_POOL_SIZE: int = int(os.getenv("BEDROCK_STREAM_POOL_SIZE", "8")) # threads for response streams, kept apart from the pool above
+    BEDROCK_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("BEDROCK_CONNECT_TIMEOUT_SECONDS", "5"))
+    BEDROCK_EMBED_TIMEOUT_SECONDS: float = float(os.getenv("BEDROCK_EMBED_TIMEOUT_SECONDS", "15"))
+    BEDROCK_GENERATE_TIMEOUT_SECONDS: float = float(os.getenv("BEDROCK_GENERATE_TIMEOUT_SECONDS", "120")) # also bounds stream gaps
+    BEDROCK_EMBED_CONCURRENCY: int = int(os.getenv("BEDROCK_EMBED_CONCURRENCY", "8"))
+    BEDROCK_MAX_RETRIES: int = int(os.getenv("BEDROCK_MAX_RETRIES", "4"))
+    BEDROCK_BACKOFF_BASE_SECONDS: float = float(os.getenv("BEDROCK_BACKOFF_BASE_SECONDS", "0.25"))
+    BEDROCK_BACKOFF_MAX_SECONDS: float = float(os.getenv("BEDROCK_BACKOFF_MAX_SECONDS", "4.0"))
+    # Bedrock Gateway: per-kind quotas (<= 0 disables), priority queue, circuit breaker
+    BEDROCK_GENERATE_RPM: float = float(os.getenv("BEDROCK_GENERATE_RPM", "500"))
+    BEDROCK_GENERATE_TPM: float = float(os.getenv("BEDROCK_GENERATE_TPM", "500000"))
+    BEDROCK_EMBED_RPM: float = float(os.getenv("BEDROCK_EMBED_RPM", "2000"))
+    BEDROCK_EMBED_TPM: float = float(os.getenv("BEDROCK_EMBED_TPM", "300000"))
+    BEDROCK_GATEWAY_BURST_SECONDS: float = float(os.getenv("BEDROCK_GATEWAY_BURST_SECONDS", "5")) # bucket capacity, in seconds of quota
+    BEDROCK_GATEWAY_MAX_QUEUE_SECONDS: float = float(os.getenv("BEDROCK_GATEWAY_MAX_QUEUE_SECONDS", "15"))
+    BEDROCK_BREAKER_WINDOW: int = int(os.getenv("BEDROCK_BREAKER_WINDOW", "20")) # most recent calls considered
+    BEDROCK_BREAKER_MIN_CALLS: int = int(os.getenv("BEDROCK_BREAKER_MIN_CALLS", "10"))
+    BEDROCK_BREAKER_ERROR_RATE: float = float(os.getenv("BEDROCK_BREAKER_ERROR_RATE", "0.5"))
+    BEDROCK_BREAKER_SLOW_RATE: float = float(os.getenv("BEDROCK_BREAKER_SLOW_RATE", "0.5"))
+    BEDROCK_BREAKER_COOLDOWN_SECONDS: float = float(os.getenv("BEDROCK_BREAKER_COOLDOWN_SECONDS", "30"))
+    BEDROCK_EMBED_SLOW_SECONDS: float = float(os.getenv("BEDROCK_EMBED_SLOW_SECONDS", "5"))
+    BEDROCK_GENERATE_SLOW_SECONDS: float = float(os.getenv("BEDROCK_GENERATE_SLOW_SECONDS", "30")) # streams: time to first token
+    DENSITY_BATCH_SIZE: int = int(os.getenv("DENSITY_BATCH_SIZE", "5")) # transcripts per density-scoring prompt
+    DENSITY_BATCH_CONCURRENCY: int = int(os.getenv("DENSITY_BATCH_CONCURRENCY", "4"))
+
+    # Bedrock Response Cache (deterministic prompts only, keyed by prompt hash)
+    BEDROCK_RESPONSE_CACHE_ENABLED: bool = os.getenv("BEDROCK_RESPONSE_CACHE_ENABLED", "True").lower() == "true"
+    BEDROCK_RESPONSE_CACHE_TTL_SECONDS: int = int(os.getenv("BEDROCK_RESPONSE_CACHE_TTL_SECONDS", "86400"))
+    # Per call site overrides, e.g. "terrain_niches=604800,atlas_mapping=2592000"
+    BEDROCK_RESPONSE_CACHE_TTLS: str = os.getenv(
+        "BEDROCK_RESPONSE_CACHE_TTLS",
+        "terrain_niches=604800,map_interests=604800,atlas_mapping=2592000,community_vision=604800"
+    )
+
+    # Intent Cache (analyze_vibe): exact normalized query, then embedding near-duplicates
+    INTENT_CACHE_ENABLED: bool = os.getenv("INTENT_CACHE_ENABLED", "True").lower() == "true"
+    INTENT_CACHE_TTL_SECONDS: int = int(os.getenv("INTENT_CACHE_TTL_SECONDS", "259200")) # 3d
+    INTENT_SEMANTIC_THRESHOLD: float = float(os.getenv("INTENT_SEMANTIC_THRESHOLD", "0.93")) # cosine; >1 disables the semantic tier
+    INTENT_SEMANTIC_MAX_ENTRIES: int = int(os.getenv("INTENT_SEMANTIC_MAX_ENTRIES", "5000"))
+
+    # Embedding Cache
+    EMBEDDING_CACHE_MAX_MB: float = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "64"))
+    EMBEDDING_CACHE_TTL_SECONDS: int = int(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "86400"))
+    EMBEDDING_STORE_ENABLED: bool = os.getenv("EMBEDDING_STORE_ENABLED", "True").lower() == "true"
+    EMBEDDING_STORE_MAX_AGE_DAYS: int = int(os.getenv("EMBEDDING_STORE_MAX_AGE_DAYS", "30"))
+    EMBEDDING_CACHE_CODEC: str = os.getenv("EMBEDDING_CACHE_CODEC", "float32").lower() # float32 | int8 | pq
+    EMBEDDING_PQ_CODEBOOK: str = os.getenv("EMBEDDING_PQ_CODEBOOK", os.path.join(CACHE_DIR, "quantization", "pq_codebook.npz"))
+
+    # Ranking
+    LEXICAL_PRERANK_WEIGHT: float = float(os.getenv("LEXICAL_PRERANK_WEIGHT", "10.0")) # Best BM25 match ~= +10 log-views
+
+    # Feedback Learning
+    FEEDBACK_LEARNING_RATE: float = float(os.getenv("FEEDBACK_LEARNING_RATE", "0.1"))
+    FEEDBACK_DECAY: float = float(os.getenv("FEEDBACK_DECAY", "0.98"))
+    FEEDBACK_STRENGTH: float = float(os.getenv("FEEDBACK_STRENGTH", "0.3")) # 0 disables intent re-weighting
+    FEEDBACK_PERSIST_SECONDS: int = int(os.getenv("FEEDBACK_PERSIST_SECONDS", "60"))
+    VIDEO_CACHE_MAX: int = int(os.getenv("VIDEO_CACHE_MAX", "5000"))
+
+    # Pantry ANN Index / Feed Retrieval
+    PANTRY_INDEX_ENABLED: bool = os.getenv("PANTRY_INDEX_ENABLED", "True").lower() == "true"
+    PANTRY_INDEX_NPROBE: int = int(os.getenv("PANTRY_INDEX_NPROBE", "8"))
+    PANTRY_INDEX_CODEC: str = os.getenv("PANTRY_INDEX_CODEC", "float32").lower() # float32 | int8
+    PANTRY_INDEX_BACKFILL: bool = os.getenv("PANTRY_INDEX_BACKFILL", "False").lower() == "true"
+    FEED_RETRIEVAL_MODE: str = os.getenv("FEED_RETRIEVAL_MODE", "live").lower() # live | hybrid | pantry
+    FEED_PANTRY_CANDIDATES: int = int(os.getenv("FEED_PANTRY_CANDIDATES", "100"))
+    FEED_PANTRY_MIN_RESULTS: int = int(os.getenv("FEED_PANTRY_MIN_RESULTS", "20"))
+
+    # YouTube Discovery
+    YOUTUBE_TRANSPORT: str = os.getenv("YOUTUBE_TRANSPORT", "aiohttp").lower() # aiohttp | discovery (googleapiclient)
+    YOUTUBE_HTTP_POOL_SIZE: int = int(os.getenv("YOUTUBE_HTTP_POOL_SIZE", "20"))
+    YOUTUBE_HTTP_TIMEOUT_SECONDS: float = float(os.getenv("YOUTUBE_HTTP_TIMEOUT_SECONDS", "15"))
+    YOUTUBE_DAILY_QUOTA_UNITS: int = int(os.getenv("YOUTUBE_DAILY_QUOTA_UNITS", "10000")) # per key, resets at midnight Pacific
+    YOUTUBE_SEARCH_CONCURRENCY: int = int(os.getenv("YOUTUBE_SEARCH_CONCURRENCY", "5"))
+    YOUTUBE_DETAILS_CONCURRENCY: int = int(os.getenv("YOUTUBE_DETAILS_CONCURRENCY", "5")) # concurrent 50-ID videos.list chunks
+    YOUTUBE_DETAILS_RETRIES: int = int(os.getenv("YOUTUBE_DETAILS_RETRIES", "2"))
+    TRANSCRIPT_CACHE_ENABLED: bool = os.getenv("TRANSCRIPT_CACHE_ENABLED", "True").lower() == "true"
+    TRANSCRIPT_CACHE_TTL_SECONDS: int = int(os.getenv("TRANSCRIPT_CACHE_TTL_SECONDS", "2592000")) # 30d
+    TRANSCRIPT_NEGATIVE_TTL_SECONDS: int = int(os.getenv("TRANSCRIPT_NEGATIVE_TTL_SECONDS", "86400")) # "no captions", 1d
+    YOUTUBE_KEY_RATE_PER_SECOND: float = float(os.getenv("YOUTUBE_KEY_RATE_PER_SECOND", "10")) # 0 disables
+    YOUTUBE_KEY_BURST: int = int(os.getenv("YOUTUBE_KEY_BURST", "10"))
+    SEARCH_CACHE_ENABLED: bool = os.getenv("SEARCH_CACHE_ENABLED", "True").lower() == "true"
+    SEARCH_CACHE_TTL_SECONDS: int = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "21600")) # 6h fresh
+    SEARCH_CACHE_STALE_SECONDS: int = int(os.getenv("SEARCH_CACHE_STALE_SECONDS", "86400")) # then served stale while revalidating
+    VIDEO_DETAILS_CACHE_ENABLED: bool = os.getenv("VIDEO_DETAILS_CACHE_ENABLED", "True").lower() == "true"
+    VIDEO_SNIPPET_TTL_SECONDS: int = int(os.getenv("VIDEO_SNIPPET_TTL_SECONDS", "604800")) # 7d
+    VIDEO_STATISTICS_TTL_SECONDS: int = int(os.getenv("VIDEO_STATISTICS_TTL_SECONDS", "21600")) # 6h
+
+    # Record / Replay of upstream calls (see app/core/replay.py)
+    REPLAY_MODE: str = os.getenv("REPLAY_MODE", "off").lower() # off | record | replay
+    REPLAY_DIR: str = os.getenv("REPLAY_DIR", os.path.join(CACHE_DIR, "cassettes"))
+    REPLAY_LATENCY: str = os.getenv("REPLAY_LATENCY", "recorded")
+    REPLAY_LATENCY_SCALE: float = float(os.getenv("REPLAY_LATENCY_SCALE", "1.0"))
+    REPLAY_FAULTS: str = os.getenv("REPLAY_FAULTS", "")
+    REPLAY_SEED: Optional[int] = int(os.getenv("REPLAY_SEED")) if os.getenv("REPLAY_SEED") else None
+    if REPLAY_MODE == "replay":
+        DEMO_MODE = False # Replay exercises the live code paths against cassettes
+
     # API Keys
     YOUTUBE_API_KEYS: List[str] = [k.strip() for k in os.getenv("YOUTUBE_API_KEY", "").split(",") if k.strip()]
     BHASHINI_API_KEY: str | None = os.getenv("BHASHINI_API_KEY", "")
@@ -0,0 +1,100 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# SQLite's default limit on bound parameters per statement is 999
+_MAX_PARAMS = 500
+
+class KVCache:
+    """
+    Small persistent key/value cache on SQLite (WAL mode), shared by every worker
+    process that points at the same file. Values are stored as JSON along with the
+    wall-clock time they were written; freshness policy stays with the caller.
+
+    Calls block on disk briefly, so request paths should run them via asyncio.to_thread.
+    Connections are per thread, which makes that safe.
+    """
+
+    def __init__(self, path: str, namespace: str):
+        self.path = path
+        self.namespace = namespace
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, stored_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Returns (value, age_seconds), or None if the key was never stored."""
+        row = self._connect().execute(
+            "SELECT value, stored_at FROM kv WHERE namespace = ? AND key = ?", (self.namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), time.time() - row[1]
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Tuple[Any, float]]:
+        keys = list(dict.fromkeys(keys))
+        now = time.time()
+        found: Dict[str, Tuple[Any, float]] = {}
+        conn = self._connect()
+        for i in range(0, len(keys), _MAX_PARAMS):
+            chunk = keys[i:i + _MAX_PARAMS]
+            rows = conn.execute(
+                f"SELECT key, value, stored_at FROM kv WHERE namespace = ? AND key IN ({','.join('?' * len(chunk))})",
+                (self.namespace, *chunk),
+            )
+            for key, value, stored_at in rows:
+                found[key] = (json.loads(value), now - stored_at)
+        return found
+
+    def set(self, key: str, value: Any) -> None:
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, Any]) -> None:
+        if not items:
+            return
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR REPLACE INTO kv (namespace, key, value, stored_at) VALUES (?, ?, ?, ?)",
+                [(self.namespace, key, json.dumps(value), now) for key, value in items.items()],
+            )
+
+    def recent(self, max_age_seconds: float, limit: int) -> List[Tuple[str, Any, float]]:
+        """Newest entries first, as (key, value, age_seconds); used to warm in-memory indexes."""
+        now = time.time()
+        rows = self._connect().execute(
+            "SELECT key, value, stored_at FROM kv WHERE namespace = ? AND stored_at >= ? ORDER BY stored_at DESC LIMIT ?",
+            (self.namespace, now - max_age_seconds, limit),
+        )
+        return [(key, json.loads(value), now - stored_at) for key, value, stored_at in rows]
+
+    def delete(self, key: str) -> None:
+        self._connect().execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def purge(self, max_age_seconds: float) -> int:
+        """Deletes entries older than max_age_seconds. Returns the number removed."""
+        cursor = self._connect().execute(
+            "DELETE FROM kv WHERE namespace = ? AND stored_at < ?", (self.namespace, time.time() - max_age_seconds)
+        )
+        return cursor.rowcount
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM kv WHERE namespace = ?", (self.namespace,)).fetchone()[0]
@@ -0,0 +1,93 @@
+import time
+import asyncio
+from typing import Any, Dict, Hashable
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens per second, bursts up to `capacity`.
+    Waiters sleep only for their own deficit, so a drained bucket throttles
+    callers without ever rejecting them. rate <= 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+        self.acquired = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        if self.rate <= 0:
+            return True
+        self._refill()
+        if self._tokens < tokens:
+            return False
+        self._tokens -= tokens
+        self.acquired += 1
+        return True
+
+    def release(self, tokens: float) -> None:
+        """Returns unused tokens (e.g. an over-estimate settled after the call)."""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def seconds_until(self, tokens: float = 1.0) -> float:
+        """How long until `tokens` would be available (0 if they are now)."""
+        if self.rate <= 0:
+            return 0.0
+        return max(0.0, (min(tokens, self.capacity) - self.available) / self.rate)
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """Waits until `tokens` are available and takes them. Returns the seconds spent waiting."""
+        tokens = min(tokens, self.capacity)
+        started = time.monotonic()
+        while not self.try_acquire(tokens):
+            await asyncio.sleep((tokens - self._tokens) / self.rate)
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.waits += 1
+            self.wait_seconds += waited
+        return waited
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate_per_second": self.rate,
+            "capacity": self.capacity,
+            "available": round(self.available, 2),
+            "acquired": self.acquired,
+            "waits": self.waits,
+            "wait_seconds": round(self.wait_seconds, 3),
+        }
+
+class KeyedRateLimiter:
+    """One TokenBucket per key (e.g. per API key), created on first use."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+
+    def bucket(self, key: Hashable) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity)
+        return bucket
+
+    async def acquire(self, key: Hashable, tokens: float = 1.0) -> float:
+        return await self.bucket(key).acquire(tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        return {str(key): bucket.stats() for key, bucket in self._buckets.items()}
@@ -0,0 +1,246 @@
+"""
+Record/replay layer for upstream calls (YouTube Data API, Bedrock, Sarvam, Polly).
+
+REPLAY_MODE=record  passes calls through and appends each successful response,
+                    with its measured latency, to <REPLAY_DIR>/<service>.jsonl.
+REPLAY_MODE=replay  answers from those cassettes with no network, sleeping for a
+                    latency drawn from REPLAY_LATENCY and injecting REPLAY_FAULTS.
+REPLAY_MODE=off     (default) is a straight pass-through.
+
+Latency spec, optionally per service prefix, `;`-separated:
+    recorded                 the latency recorded with that response (default)
+    empirical                a random latency recorded for the same service
+    fixed:<ms>
+    lognormal:<median_ms>:<sigma>
+    none
+    e.g. REPLAY_LATENCY="youtube=lognormal:180:0.5;bedrock.embed=fixed:40;default=recorded"
+
+Fault spec, `;`-separated <service prefix>=<fault>:<probability>:
+    e.g. REPLAY_FAULTS="bedrock.embed=throttling:0.05;youtube.search=quotaExceeded:0.02"
+Each integration maps fault names (throttling, quotaExceeded, unavailable, timeout)
+onto the error its real upstream would raise.
+
+REPLAY_SEED makes latency and fault draws repeatable for a given call order.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from collections import defaultdict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from app.core.config import settings
+
+class ReplayMissError(Exception):
+    """A replayed call has no recorded response in the cassette."""
+
+class Cassette:
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self.latencies: List[float] = []
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]].append(entry)
+                        self.latencies.append(entry.get("latency_ms", 0.0))
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Recorded entry for `key`; repeated recordings are replayed round-robin."""
+        entries = self._entries.get(key)
+        if not entries:
+            return None
+        index = self._cursor[key] % len(entries)
+        self._cursor[key] += 1
+        return entries[index]
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        # Bedrock/Polly calls record from worker threads
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            self._entries[entry["key"]].append(entry)
+            self.latencies.append(entry["latency_ms"])
+
+def _parse_specs(spec: str) -> List[Tuple[str, str]]:
+    """'a=x;b.c=y;z' -> [('b.c', 'y'), ('a', 'x'), ('default', 'z')], longest prefix first."""
+    rules = []
+    for part in filter(None, (p.strip() for p in spec.split(";"))):
+        prefix, _, value = part.rpartition("=")
+        rules.append((prefix or "default", value))
+    return sorted(rules, key=lambda r: -len(r[0]) if r[0] != "default" else 1)
+
+def _match(rules: List[Tuple[str, str]], service: str) -> List[str]:
+    return [value for prefix, value in rules if prefix == "default" or service == prefix or service.startswith(prefix + ".")]
+
+class ReplayLayer:
+    def __init__(self, mode: str, directory: str, latency: str = "recorded", faults: str = "",
+                 latency_scale: float = 1.0, seed: Optional[int] = None):
+        self.mode = mode
+        self.directory = directory
+        self.latency_rules = _parse_specs(latency)
+        self.fault_rules = _parse_specs(faults)
+        self.latency_scale = latency_scale
+        self.rng = random.Random(seed)
+        self._cassettes: Dict[str, Cassette] = {}
+
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.faults_injected: Dict[str, int] = defaultdict(int)
+        self.misses: Dict[str, int] = defaultdict(int)
+        if mode != "off":
+            print(f"📼 Replay layer: {mode} ({directory})")
+
+    @classmethod
+    def from_settings(cls) -> "ReplayLayer":
+        return cls(
+            mode=settings.REPLAY_MODE,
+            directory=settings.REPLAY_DIR,
+            latency=settings.REPLAY_LATENCY,
+            faults=settings.REPLAY_FAULTS,
+            latency_scale=settings.REPLAY_LATENCY_SCALE,
+            seed=settings.REPLAY_SEED
+        )
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def cassette(self, service: str) -> Cassette:
+        name = service.split(".")[0]
+        if name not in self._cassettes:
+            self._cassettes[name] = Cassette(os.path.join(self.directory, f"{name}.jsonl"))
+        return self._cassettes[name]
+
+    @staticmethod
+    def make_key(service: str, request: Dict[str, Any]) -> str:
+        canonical = json.dumps({"service": service, "request": request}, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _latency_seconds(self, service: str, entry: Dict[str, Any]) -> float:
+        spec = (_match(self.latency_rules, service) or ["recorded"])[0]
+        kind, *args = spec.split(":")
+        if kind == "none":
+            ms = 0.0
+        elif kind == "fixed":
+            ms = float(args[0])
+        elif kind == "lognormal":
+            ms = self.rng.lognormvariate(0, float(args[1]) if len(args) > 1 else 0.5) * float(args[0])
+        elif kind == "empirical":
+            latencies = self.cassette(service).latencies
+            ms = self.rng.choice(latencies) if latencies else 0.0
+        else:
+            ms = entry.get("latency_ms", 0.0)
+        return ms * self.latency_scale / 1000.0
+
+    def _draw_fault(self, service: str) -> Optional[str]:
+        for value in _match(self.fault_rules, service):
+            fault, _, probability = value.partition(":")
+            if self.rng.random() < float(probability or 0):
+                return fault
+        return None
+
+    async def call(self, service: str, request: Dict[str, Any], fn: Callable[[], Awaitable[Any]],
+                   on_fault: Optional[Callable[[str], Any]] = None) -> Any:
+        """
+        Runs one upstream call through the layer. `request` identifies the call (no secrets)
+        and `fn` performs it live; its result must be JSON-serializable. `on_fault(name)`
+        raises (or returns) whatever the real upstream would for an injected fault.
+        """
+        if self.mode == "off":
+            return await fn()
+
+        self.calls[service] += 1
+        key = self.make_key(service, request)
+        if self.mode == "record":
+            started = time.perf_counter()
+            response = await fn()
+            self.cassette(service).record({
+                "key": key,
+                "service": service,
+                "request": request,
+                "response": response,
+                "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+            })
+            return response
+
+        entry = self.cassette(service).lookup(key)
+        if entry is None:
+            self.misses[service] += 1
+            raise ReplayMissError(f"No recorded {service} response for {json.dumps(request, default=str)[:200]}")
+        await asyncio.sleep(self._latency_seconds(service, entry))
+
+        fault = self._draw_fault(service)
+        if fault and on_fault is not None:
+            self.faults_injected[f"{service}:{fault}"] += 1
+            return on_fault(fault)
+        return entry["response"]
+
+    async def stream(self, service: str, request: Dict[str, Any], fn: Callable[[], AsyncIterator[Any]],
+                     on_fault: Optional[Callable[[str], Any]] = None) -> AsyncIterator[Any]:
+        """
+        Streaming counterpart of `call`. Records the full chunk list once the stream ends;
+        latency_ms is time-to-first-chunk and the remaining time is spread across chunks on replay.
+        """
+        if self.mode == "off":
+            async for chunk in fn():
+                yield chunk
+            return
+
+        self.calls[service] += 1
+        key = self.make_key(service, request)
+        if self.mode == "record":
+            started = time.perf_counter()
+            first_ms: Optional[float] = None
+            chunks = []
+            async for chunk in fn():
+                if first_ms is None:
+                    first_ms = (time.perf_counter() - started) * 1000
+                chunks.append(chunk)
+                yield chunk
+            total_ms = (time.perf_counter() - started) * 1000
+            self.cassette(service).record({
+                "key": key,
+                "service": service,
+                "request": request,
+                "response": chunks,
+                "latency_ms": round(first_ms if first_ms is not None else total_ms, 2),
+                "total_ms": round(total_ms, 2),
+            })
+            return
+
+        entry = self.cassette(service).lookup(key)
+        if entry is None:
+            self.misses[service] += 1
+            raise ReplayMissError(f"No recorded {service} response for {json.dumps(request, default=str)[:200]}")
+        first_seconds = self._latency_seconds(service, entry)
+        await asyncio.sleep(first_seconds)
+
+        fault = self._draw_fault(service)
+        if fault and on_fault is not None:
+            self.faults_injected[f"{service}:{fault}"] += 1
+            on_fault(fault)
+            return
+        chunks = entry["response"]
+        rest_seconds = max(0.0, entry.get("total_ms", 0.0) - entry.get("latency_ms", 0.0)) * self.latency_scale / 1000.0
+        gap = rest_seconds / len(chunks) if chunks and first_seconds > 0 else 0.0
+        for chunk in chunks:
+            yield chunk
+            if gap:
+                await asyncio.sleep(gap)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "calls": dict(self.calls),
+            "misses": dict(self.misses),
+            "faults_injected": dict(self.faults_injected),
+        }
+
+replay = ReplayLayer.from_settings()
@@ -1,15 +1,20 @@
 import uvicorn
 import os
-from fastapi import FastAPI, HTTPException, Query
+import json
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
 load_dotenv()
-from typing import List, Dict, Optional, Any
+from typing import AsyncIterator, List, Dict, Optional, Any, Tuple
 from app.core.models import FeedRequest, UserContext, Video, CreatorProfile, FeedbackRequest, SubCulture
 from app.core.config import settings
+from app.core.replay import replay
 from app.services.bedrock_agent import BedrockAgent
+from app.services.bedrock_gateway import Priority, bedrock_priority
 from app.services.ranking_engine import RankingEngine
 from app.services.youtube_client import YouTubeClient
 from app.services.analytics_service import CreatorAnalyticsService
@@ -25,6 +30,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def bedrock_priority_by_path(request: Request, call_next):
+    """Creator tools yield Bedrock capacity to the interactive feed."""
+    if request.url.path.startswith("/creator"):
+        bedrock_priority.set(Priority.CREATOR)
+    return await call_next(request)
+
 # Initialize Shared Services
 bedrock_agent = BedrockAgent()
 youtube_client = YouTubeClient() # Live YouTube API
@@ -49,11 +61,73 @@ import asyncio
 @app.on_event("startup")
 async def startup_event():
     asyncio.create_task(background_market_pulse())
+    asyncio.create_task(asyncio.to_thread(ranking_engine.compact_embedding_store))
+    if ranking_engine.pantry_index is not None:
+        asyncio.create_task(pantry_index_maintenance())
+    asyncio.create_task(feedback_persistence())
+    if youtube_client.search_cache is not None:
+        asyncio.create_task(asyncio.to_thread(youtube_client.search_cache.purge))
+    if youtube_client.transcript_cache is not None:
+        asyncio.create_task(asyncio.to_thread(youtube_client.transcript_cache.purge))
+    if bedrock_agent.response_cache is not None:
+        asyncio.create_task(asyncio.to_thread(bedrock_agent.response_cache.purge))
+    if bedrock_agent.intent_cache is not None:
+        asyncio.create_task(asyncio.to_thread(bedrock_agent.intent_cache.purge))
+        asyncio.create_task(asyncio.to_thread(bedrock_agent.intent_cache.warm))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    pantry_index = ranking_engine.pantry_index
+    if pantry_index is not None and pantry_index.dirty:
+        pantry_index.persist(pantry_index.snapshot())
+    if ranking_engine.feedback_store.dirty:
+        ranking_engine.feedback_store.persist(ranking_engine.feedback_store.snapshot())
+    await youtube_client.close()
+    if bedrock_agent.transport is not None:
+        bedrock_agent.transport.close()
+
+async def feedback_persistence():
+    """
+    Periodically writes learned feedback preferences to disk, off the request path.
+    """
+    store = ranking_engine.feedback_store
+    while True:
+        await asyncio.sleep(settings.FEEDBACK_PERSIST_SECONDS)
+        if not store.dirty:
+            continue
+        try:
+            await asyncio.to_thread(store.persist, store.snapshot())
+        except Exception as e:
+            store.dirty = True
+            print(f"⚠️ Feedback persistence failed: {e}")
+
+async def pantry_index_maintenance():
+    """
+    Backfills the local Pantry index from S3 (opt-in), then snapshots it to disk every 5 minutes.
+    """
+    bedrock_priority.set(Priority.BACKGROUND)
+    pantry_index = ranking_engine.pantry_index
+    if settings.PANTRY_INDEX_BACKFILL and not settings.DEMO_MODE:
+        try:
+            added = await ranking_engine.backfill_pantry_index(creator_service.storage)
+            print(f"🗂️ Pantry index backfilled with {added} videos")
+        except Exception as e:
+            print(f"⚠️ Pantry index backfill failed: {e}")
+    while True:
+        try:
+            await asyncio.sleep(300)
+            snapshot = pantry_index.snapshot()
+            if snapshot is not None:
+                await asyncio.to_thread(pantry_index.persist, snapshot)
+        except Exception as e:
+            pantry_index.dirty = True
+            print(f"⚠️ Pantry index snapshot failed: {e}")
 
 async def background_market_pulse():
     """
     Simulates an 'Hourly' Market Pulse check.
     """
+    bedrock_priority.set(Priority.BACKGROUND)
     print("🌅 Market Pulse Daemon Started")
     while True:
         try:
@@ -79,6 +153,30 @@ async def root():
         "routes": routes
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """
+    In-process cache counters, used to size caches and budgets.
+    """
+    return {
+        "embedding_cache": ranking_engine.embedding_cache.stats(),
+        "embedding_requests": ranking_engine.embedding_flights.stats(),
+        "embedding_store": ranking_engine.embedding_store.stats() if ranking_engine.embedding_store is not None else None,
+        "pantry_index": ranking_engine.pantry_index.stats() if ranking_engine.pantry_index is not None else None,
+        "feedback": ranking_engine.feedback_store.stats(),
+        "youtube_search_cache": youtube_client.search_cache.stats() if youtube_client.search_cache is not None else None,
+        "youtube_details_cache": youtube_client.details_cache.stats() if youtube_client.details_cache is not None else None,
+        "youtube_quota": youtube_client.quota.stats(),
+        "transcript_cache": youtube_client.transcript_cache.stats() if youtube_client.transcript_cache is not None else None,
+        "bedrock_transport": bedrock_agent.transport.stats() if bedrock_agent.transport is not None else None,
+        "bedrock_gateway": bedrock_agent.gateway.stats(),
+        "bedrock_response_cache": bedrock_agent.response_cache.stats() if bedrock_agent.response_cache is not None else None,
+        "bedrock_response_requests": bedrock_agent.response_flights.stats(),
+        "intent_cache": bedrock_agent.intent_cache.stats() if bedrock_agent.intent_cache is not None else None,
+        "intent_requests": bedrock_agent.intent_flights.stats(),
+        "replay": replay.stats()
+    }
+
 @app.post("/creator/assessment")
 async def create_creator_assessment(profile: CreatorProfile):
     """
@@ -93,8 +191,8 @@ async def receive_consumer_feedback(feedback: FeedbackRequest):
     """
     Updates the Global Demand Matrix based on consumer relevance feedback.
     """
-    ranking_engine.incorporate_feedback(feedback.video_id, feedback.is_relevant)
-    return {"status": "Feedback Received", "matrix_updated": True}
+    updated = await ranking_engine.incorporate_feedback(feedback.video_id, feedback.is_relevant, feedback.context)
+    return {"status": "Feedback Received", "matrix_updated": updated}
 
 @app.post("/creator/insights")
 async def get_creator_insights(request: FeedRequest):
@@ -107,13 +205,14 @@ async def get_creator_insights(request: FeedRequest):
 
 class InterestMapRequest(BaseModel):
     interests: List[str]
+    refresh: bool = False # Skip the Bedrock response cache
 
 @app.post("/user/map-interests")
 async def map_user_interests(req: InterestMapRequest):
     """
     Step 2 of Onboarding: Maps broad interests to Deep Hyperbolic Vectors.
     """
-    deep_interests = await bedrock_agent.map_interests(req.interests)
+    deep_interests = await bedrock_agent.map_interests(req.interests, refresh=req.refresh)
     return {"deep_interests": deep_interests}
 
 class AtlasMappingRequest(BaseModel):
@@ -124,6 +223,7 @@ class AtlasMappingRequest(BaseModel):
     tools: List[str]
     language: str
     example: str
+    refresh: bool = False # Skip the Bedrock response cache
 
 @app.post("/creator/atlas-mapping")
 async def generate_atlas_mapping(req: AtlasMappingRequest):
@@ -176,7 +276,7 @@ async def generate_atlas_mapping(req: AtlasMappingRequest):
                 ]
             }
             
-        res = await bedrock_agent._invoke_bedrock(prompt)
+        res = await bedrock_agent._invoke_bedrock(prompt, cache_site="atlas_mapping", bypass_cache=req.refresh)
         domain_id = res.get("domain_id", "science").lower()
         return {
             "placement_string": res.get("placement_string", f"Mapped to {req.language} communities"),
@@ -198,20 +298,24 @@ async def generate_atlas_mapping(req: AtlasMappingRequest):
 class ScriptRequest(BaseModel):
     topic: str
     angle: str
+    stream: bool = False # text/plain chunks as they are generated
 
 class PlannerRequest(BaseModel):
     niche: str
     platforms: List[str]
     days: int
     tone: str
+    stream: bool = False
 
 class RepurposeRequest(BaseModel):
     transcript: str
     format: str
+    stream: bool = False
 
 class ForgeRequest(BaseModel):
     url: str
     format: str
+    stream: bool = False
 
 class SummaryRequest(BaseModel):
     transcript: str
@@ -219,16 +323,34 @@ class SummaryRequest(BaseModel):
 class VisionRequest(BaseModel):
     community_name: str
     quiz_context: Dict[str, Any]
+    refresh: bool = False # Skip the Bedrock response cache
 
 @app.post("/creator/community-vision")
 async def get_community_vision(req: VisionRequest):
-    return await creator_service.generate_community_vision(req.community_name, req.quiz_context)
+    return await creator_service.generate_community_vision(req.community_name, req.quiz_context, req.refresh)
+
+
+def text_stream_response(chunks: AsyncIterator[str]) -> StreamingResponse:
+    """
+    Shared streaming response for creator tools (`"stream": true`): the generated
+    markdown as plain-text chunks, flushed as they arrive.
+    """
+    return StreamingResponse(
+        chunks,
+        media_type="text/plain; charset=utf-8",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/creator/tools/script")
 async def generate_script(req: ScriptRequest):
+    if req.stream:
+        return text_stream_response(creator_service.stream_script(req.topic, req.angle))
     return {"script": await creator_service.generate_script(req.topic, req.angle)}
 
 @app.post("/creator/tools/planner")
 async def generate_planner(req: PlannerRequest):
+    if req.stream:
+        return text_stream_response(creator_service.stream_content_planner(req.niche, req.platforms, req.days, req.tone))
     return {"content": await creator_service.generate_content_planner(req.niche, req.platforms, req.days, req.tone)}
 
 @app.post("/creator/tools/summarize")
@@ -237,6 +359,8 @@ async def summarize_video(req: SummaryRequest):
 
 @app.post("/creator/tools/repurpose")
 async def repurpose_content(req: RepurposeRequest):
+    if req.stream:
+        return text_stream_response(creator_service.stream_repurpose_content(req.transcript, req.format))
     return {"content": await creator_service.repurpose_content(req.transcript, req.format)}
 
 @app.post("/creator/tools/forge")
@@ -259,6 +383,8 @@ async def forge_content(req: ForgeRequest):
              if audio_path:
                   translated = await translation_engine.translate_video(audio_path)
                   transcript = translated.get("translated_text", "")
+                  if transcript:
+                      await youtube_client.cache_transcript(video_id, transcript, source="audio")
              
              # Fallback 2: If audio extraction fails or no API keys, grab Title & Description instead
              if not transcript:
@@ -273,6 +399,8 @@ async def forge_content(req: ForgeRequest):
              raise HTTPException(status_code=500, detail=f"Could not extract transcript or metadata: {e}")
              
     # Route through the existing repurpose pipeline with the exact format
+    if req.stream:
+        return text_stream_response(creator_service.stream_repurpose_content(transcript, req.format))
     result = await creator_service.repurpose_content(transcript, req.format)
     return {"content": result}
 
@@ -333,6 +461,107 @@ async def translate_video_endpoint(req: Dict[str, str]):
         "provider": f"{text_result.get('provider', 'Sarvam')} (Text Fallback)"
     }
 
+def merge_candidates(live_data: List[Dict[str, Any]], pantry_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merges live YouTube results with Pantry index hits, de-duplicated by video_id.
+    Live records win since their statistics are fresher.
+    """
+    seen = {d.get("video_id") for d in live_data}
+    return live_data + [d for d in pantry_data if d.get("video_id") not in seen]
+
+def build_search_queries(search_query: Optional[str], intent) -> List[str]:
+    # Generate Multiple Regional Search Seeds (Balanced for Quota)
+    queries = [search_query or "trending high-signal tech"]
+    if intent.boost_keywords:
+        # Create a separate query for each boost keyword (Capped at 4 additional for quota)
+        for keyword in intent.boost_keywords[:4]: 
+            queries.append(f"{search_query} {keyword}")
+    return queries
+
+async def retrieve_feed_candidates(query: Optional[str], context: UserContext, intent) -> Tuple[List[Video], Optional[str]]:
+    """
+    Step 2 of /feed: live YouTube and/or Pantry retrieval, mapped to Video objects.
+    Returns (candidates, error_message).
+    """
+    # Step 2: Retrieval (Live Scraping)
+    search_query = query
+    
+    # DISCOVERY MODE: If no query, pick a random deep interest or rotate
+    if not search_query and context.deep_interests:
+        import random
+        discovery_interest = random.choice(context.deep_interests)
+        search_query = discovery_interest.name
+        print(f"🎲 Discovery Mode: Searching for '{search_query}'")
+        
+    print(f"🕵️‍♀️ Fetching real-world data for: {search_query}...")
+    queries = build_search_queries(search_query, intent)
+        
+    # Local semantic candidates from the Pantry index (no YouTube quota)
+    pantry_data = []
+    if settings.FEED_RETRIEVAL_MODE == "pantry":
+        pantry_data = await ranking_engine.search_pantry(intent, settings.FEED_PANTRY_CANDIDATES)
+        print(f"🗂️ Pantry index returned {len(pantry_data)} semantic candidates")
+
+    if settings.FEED_RETRIEVAL_MODE == "pantry" and len(pantry_data) >= settings.FEED_PANTRY_MIN_RESULTS:
+        candidates_data = pantry_data
+    else:
+        print(f"🔍 Executing 5 deep strategic queries: {queries}")
+
+        # Note: YouTubeClient returns dictionaries, not Video objects directly.
+        if settings.FEED_RETRIEVAL_MODE == "hybrid":
+            # The Pantry lookup overlaps with the YouTube fetch instead of preceding it
+            live_data, pantry_data = await asyncio.gather(
+                youtube_client.deep_search(queries, max_results_per_query=50),
+                ranking_engine.search_pantry(intent, settings.FEED_PANTRY_CANDIDATES)
+            )
+            print(f"🗂️ Pantry index returned {len(pantry_data)} semantic candidates")
+        else:
+            live_data = await youtube_client.deep_search(queries, max_results_per_query=50)
+        candidates_data = merge_candidates(live_data, pantry_data)
+    
+    if not candidates_data:
+         error_msg = "YouTube API Quota Exhausted" if youtube_client.exhausted else "No videos found or try a broader query"
+         print(f"⚠️ {error_msg}")
+         return [], error_msg
+         
+    # JIT RAG View-Count Filter (DEACTIVATED per user request for broad reach)
+    # MAX_VIEWS = 50000
+    filtered_candidates_data = candidates_data 
+    
+    print(f"✅ Processing {len(filtered_candidates_data)} candidates across all view counts.")
+
+    # Step 2b: FAST DISCOVERY (Metadata-Only Mapping)
+    # We skip deep ASR/Vision for the initial 500+ candidates to hit <2s latency
+    candidates = []
+    for d in filtered_candidates_data:
+        v_kwargs = {
+            "video_id": d.get("video_id"),
+            "title": d.get("title"),
+            "description": d.get("description"),
+            "channel": d.get("channel_title"),
+            "views": str(d.get("views")),      
+            "published": d.get("published_at"),
+            "tags": d.get("tags", []),
+            "transcript_summary": d.get("description"), # Metadata-only for fast ranking
+            "raw_views": d.get("views", 0),
+            "like_count": d.get("likes", 0)
+        }
+        candidates.append(Video(**v_kwargs))
+    return candidates, None
+
+async def deep_enrich(video: Video) -> Video:
+    transcript = await youtube_client.get_captions(video.video_id)
+    if not transcript:
+        transcript = await audio_processor.extract_transcript(video.video_id)
+    if not transcript:
+         await bedrock_agent.generate_multimodal_embeddings(
+             text=video.description, image_base64=None
+         )
+         transcript = f"[VISION CONTEXT] Deep visual analysis completed."
+         
+    video.transcript_summary = transcript or video.description
+    return video
+
 @app.post("/feed")
 async def get_hyperbolic_feed(request: FeedRequest):
     """
@@ -349,80 +578,18 @@ async def get_hyperbolic_feed(request: FeedRequest):
         intent = await bedrock_agent.analyze_vibe(request.query, context)
         print(f"🧠 Detected Intent: {intent.sub_culture} ({intent.vibe})")
 
-        # Step 2: Retrieval (Live Scraping)
-        search_query = request.query
-        
-        # DISCOVERY MODE: If no query, pick a random deep interest or rotate
-        if not search_query and context.deep_interests:
-            import random
-            discovery_interest = random.choice(context.deep_interests)
-            search_query = discovery_interest.name
-            print(f"🎲 Discovery Mode: Searching for '{search_query}'")
-            
-        print(f"🕵️‍♀️ Fetching real-world data for: {search_query}...")
-        
-        # Generate Multiple Regional Search Seeds (Balanced for Quota)
-        queries = [search_query or "trending high-signal tech"]
-        if intent.boost_keywords:
-            # Create a separate query for each boost keyword (Capped at 4 additional for quota)
-            for keyword in intent.boost_keywords[:4]: 
-                queries.append(f"{search_query} {keyword}")
-            
-        print(f"🔍 Executing 5 deep strategic queries: {queries}")
-
-        # Note: YouTubeClient returns dictionaries, not Video objects directly.
-        candidates_data = await youtube_client.deep_search(queries, max_results_per_query=50)
-        
-        if not candidates_data:
-             error_msg = "YouTube API Quota Exhausted" if youtube_client.exhausted else "No videos found or try a broader query"
-             print(f"⚠️ {error_msg}")
+        candidates, error_msg = await retrieve_feed_candidates(request.query, context, intent)
+        if error_msg:
              return {"intent": intent, "feed": [], "message": error_msg}
-             
-        # JIT RAG View-Count Filter (DEACTIVATED per user request for broad reach)
-        # MAX_VIEWS = 50000
-        filtered_candidates_data = candidates_data 
-        
-        print(f"✅ Processing {len(filtered_candidates_data)} candidates across all view counts.")
-
-        # Step 2b: FAST DISCOVERY (Metadata-Only Mapping)
-        # We skip deep ASR/Vision for the initial 500+ candidates to hit <2s latency
-        candidates = []
-        for d in filtered_candidates_data:
-            v_kwargs = {
-                "video_id": d.get("video_id"),
-                "title": d.get("title"),
-                "description": d.get("description"),
-                "channel": d.get("channel_title"),
-                "views": str(d.get("views")),      
-                "published": d.get("published_at"),
-                "tags": d.get("tags", []),
-                "transcript_summary": d.get("description"), # Metadata-only for fast ranking
-                "raw_views": d.get("views", 0),
-                "like_count": d.get("likes", 0)
-            }
-            candidates.append(Video(**v_kwargs))
 
         print(f"📊 Initial metadata-based ranking for {len(candidates)} candidates...")
         
         # Step 3: Fast Ranking (Metadata Path)
-        initial_ranked = await ranking_engine.rank_videos(candidates, intent)
+        initial_ranked = await ranking_engine.rank_videos(candidates, intent, k=50)
         
         # Step 4: Deferred Deep Enrichment (Top 10 Only)
         # Further reducing to top 10 for blazing speed
         top_slice = initial_ranked[:10]
-        
-        async def deep_enrich(video):
-            transcript = await youtube_client.get_captions(video.video_id)
-            if not transcript:
-                transcript = await audio_processor.extract_transcript(video.video_id)
-            if not transcript:
-                 await bedrock_agent.generate_multimodal_embeddings(
-                     text=video.description, image_base64=None
-                 )
-                 transcript = f"[VISION CONTEXT] Deep visual analysis completed."
-                 
-            video.transcript_summary = transcript or video.description
-            return video
 
         print(f"🧠 Deep Enrichment for Top 10 Candidates...")
         enriched_top_slice = await asyncio.gather(*(deep_enrich(v) for v in top_slice))
@@ -440,11 +607,59 @@ async def get_hyperbolic_feed(request: FeedRequest):
         print(f"❌ Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def ndjson_event(event: str, **payload) -> str:
+    return json.dumps({"event": event, **jsonable_encoder(payload)}) + "\n"
+
+@app.post("/feed/stream")
+async def stream_hyperbolic_feed(request: FeedRequest):
+    """
+    Streaming /feed (NDJSON, one event per line):
+    1. {"event": "intent"}   as soon as intent analysis returns
+    2. {"event": "feed"}     provisional metadata-ranked top 50
+    3. {"event": "enriched"} one per top-10 video, in completion order, with its rank
+    4. {"event": "done"}     (or {"event": "error"})
+    """
+    print(f"🔥 Stream Request: {request.query}")
+    context = request.user_context or UserContext()
+
+    async def events():
+        enrich_tasks = []
+        try:
+            intent = await bedrock_agent.analyze_vibe(request.query, context)
+            yield ndjson_event("intent", intent=intent)
+
+            candidates, error_msg = await retrieve_feed_candidates(request.query, context, intent)
+            if error_msg:
+                yield ndjson_event("done", count=0, message=error_msg)
+                return
+
+            initial_ranked = await ranking_engine.rank_videos(candidates, intent, k=50)
+            yield ndjson_event("feed", feed=initial_ranked[:50], provisional=True)
+
+            async def enrich_ranked(rank, video):
+                return rank, await deep_enrich(video)
+
+            enrich_tasks = [asyncio.create_task(enrich_ranked(i, v)) for i, v in enumerate(initial_ranked[:10])]
+            for next_done in asyncio.as_completed(enrich_tasks):
+                rank, video = await next_done
+                yield ndjson_event("enriched", rank=rank, video=video)
+            yield ndjson_event("done", count=len(initial_ranked[:50]))
+        except Exception as e:
+            print(f"❌ Stream Error: {e}")
+            yield ndjson_event("error", message=str(e))
+        finally:
+            # Client went away mid-stream: don't leave enrichment running
+            for task in enrich_tasks:
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
 
 class TerrainRequest(BaseModel):
     domain: str
     parent_topic: Optional[str] = None
     watch_history: Optional[List[str]] = []
+    refresh: bool = False # Skip the Bedrock response cache
 
 @app.post("/explore/generate_terrain")
 async def generate_terrain(request: TerrainRequest):
@@ -456,7 +671,8 @@ async def generate_terrain(request: TerrainRequest):
         topics = await bedrock_agent.generate_terrain_niches(
             domain=request.domain,
             parent_topic=request.parent_topic,
-            watch_history=request.watch_history or []
+            watch_history=request.watch_history or [],
+            refresh=request.refresh
         )
         return {"topics": topics, "domain": request.domain, "parent": request.parent_topic}
     except Exception as e:
@@ -20,6 +20,13 @@ class AudioProcessor:
         1. Downloads a 30-second audio snippet using yt-dlp.
         2. Routes to ASR model (Saaras preferred).
         """
+        # A snippet already converted by this container is reused instead of re-downloaded.
+        # Only complete conversions ever land at this path (see _download_audio_snippet).
+        cached_path = f"/tmp/{video_id}.wav"
+        if os.path.exists(cached_path) and os.path.getsize(cached_path) > 0:
+            print(f"🎙️ [Audio Ingest] Reusing audio snippet for {video_id}")
+            return cached_path
+
         print(f"🎙️ [Audio Ingest] Triggering real extraction for {video_id}...")
         
         # Step 1: Download Audio Stream Snippet
@@ -38,6 +45,8 @@ class AudioProcessor:
         """
         temp_path = f"/tmp/{video_id}_raw"
         output_path = f"/tmp/{video_id}.wav"
+        # ffmpeg writes here; renamed into place only after a clean exit
+        partial_path = f"/tmp/{video_id}.{os.getpid()}.partial.wav"
         
         # 1. Download best audio
         download_command = [
@@ -70,7 +79,7 @@ class AudioProcessor:
                 "-i", temp_path,
                 "-ar", "16000",
                 "-ac", "1",
-                output_path
+                partial_path
             ]
             
             conv_proc = await asyncio.create_subprocess_exec(
@@ -84,7 +93,8 @@ class AudioProcessor:
             if os.path.exists(temp_path):
                 os.remove(temp_path)
 
-            if conv_proc.returncode == 0 and os.path.exists(output_path):
+            if conv_proc.returncode == 0 and os.path.exists(partial_path):
+                os.replace(partial_path, output_path)
                 print(f"   ✅ Audio converted: {output_path} ({os.path.getsize(output_path)} bytes)")
                 return output_path
             else:
@@ -93,3 +103,6 @@ class AudioProcessor:
         except Exception as e:
             print(f"   ❌ Audio Processing Error: {e}")
             return None
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
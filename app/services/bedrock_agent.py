@@ -1,19 +1,115 @@
+import os
 import json
-import boto3
+import sqlite3
+import threading
+import random
 import asyncio
-from typing import List, Dict, Optional, Any
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Dict, Optional, Any, Tuple
+from botocore.exceptions import ClientError
 from app.core.config import settings
+from app.core.replay import replay
+from app.core.single_flight import SingleFlight
 from app.core.models import UserContext, HyperbolicIntent, CreatorProfile, SubCulture
+from app.services.bedrock_cache import BedrockResponseCache, parse_site_ttls
+from app.services.intent_cache import IntentCache
+from app.services.bedrock_transport import BedrockTransport
+from app.services.bedrock_gateway import BedrockGateway
+
+# Bedrock error codes worth retrying with backoff
+RETRYABLE_ERROR_CODES = {"ThrottlingException", "ServiceUnavailableException", "ModelNotReadyException"}
+
+# REPLAY_FAULTS names -> Bedrock error codes
+REPLAY_FAULT_CODES = {
+    "throttling": "ThrottlingException",
+    "unavailable": "ServiceUnavailableException",
+    "timeout": "ModelTimeoutException",
+}
+
+def _replay_fault(fault: str):
+    code = REPLAY_FAULT_CODES.get(fault, fault)
+    raise ClientError({"Error": {"Code": code, "Message": f"Injected {fault} (replay)"}}, "InvokeModel")
+
+# Streaming tools emit markdown directly; JSON would only arrive whole
+STREAM_MARKDOWN_INSTRUCTION = """
+        Output ONLY the markdown itself, starting with "{start}". Do NOT wrap it in JSON or code fences.
+        """
+
+class EmbeddingError(Exception):
+    """Raised when a text could not be embedded after retries."""
+
+@dataclass
+class EmbeddingResult:
+    text: str
+    vector: Optional[List[float]] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.vector is not None
 
 class BedrockAgent:
+    EMBEDDING_MODEL_ID = "amazon.titan-embed-text-v2:0"
+    EMBEDDING_DIMENSIONS = 1024
+    GENERATION_MODEL_ID = "anthropic.claude-3-haiku-20240307-v1:0"
+
     def __init__(self):
+        # Shared cap on in-flight Titan calls across all requests
+        self._embedding_semaphore = asyncio.Semaphore(settings.BEDROCK_EMBED_CONCURRENCY)
+        self._density_semaphore = asyncio.Semaphore(settings.DENSITY_BATCH_CONCURRENCY)
+        self.transport: Optional[BedrockTransport] = None
+        self.gateway = BedrockGateway(
+            limits={
+                "embed": {"rpm": settings.BEDROCK_EMBED_RPM, "tpm": settings.BEDROCK_EMBED_TPM,
+                          "slow_seconds": settings.BEDROCK_EMBED_SLOW_SECONDS},
+                "generate": {"rpm": settings.BEDROCK_GENERATE_RPM, "tpm": settings.BEDROCK_GENERATE_TPM,
+                             "slow_seconds": settings.BEDROCK_GENERATE_SLOW_SECONDS},
+            },
+            burst_seconds=settings.BEDROCK_GATEWAY_BURST_SECONDS,
+            max_queue_seconds=settings.BEDROCK_GATEWAY_MAX_QUEUE_SECONDS,
+            breaker={
+                "window": settings.BEDROCK_BREAKER_WINDOW,
+                "min_calls": settings.BEDROCK_BREAKER_MIN_CALLS,
+                "error_rate": settings.BEDROCK_BREAKER_ERROR_RATE,
+                "slow_rate": settings.BEDROCK_BREAKER_SLOW_RATE,
+                "cooldown_seconds": settings.BEDROCK_BREAKER_COOLDOWN_SECONDS,
+            }
+        )
+        self.response_cache: Optional[BedrockResponseCache] = None
+        self.response_flights = SingleFlight() # Identical uncached prompts share one generation
+        if settings.BEDROCK_RESPONSE_CACHE_ENABLED:
+            try:
+                self.response_cache = BedrockResponseCache(
+                    path=os.path.join(settings.CACHE_DIR, "bedrock_cache.sqlite3"),
+                    site_ttls=parse_site_ttls(settings.BEDROCK_RESPONSE_CACHE_TTLS),
+                    default_ttl_seconds=settings.BEDROCK_RESPONSE_CACHE_TTL_SECONDS
+                )
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️ Bedrock response cache unavailable: {e}")
+        self.intent_cache: Optional[IntentCache] = None
+        self.intent_flights = SingleFlight()
+        if settings.INTENT_CACHE_ENABLED:
+            try:
+                self.intent_cache = IntentCache(
+                    path=os.path.join(settings.CACHE_DIR, "bedrock_cache.sqlite3"),
+                    ttl_seconds=settings.INTENT_CACHE_TTL_SECONDS,
+                    similarity_threshold=settings.INTENT_SEMANTIC_THRESHOLD,
+                    max_entries=settings.INTENT_SEMANTIC_MAX_ENTRIES,
+                    dim=self.EMBEDDING_DIMENSIONS
+                )
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️ Intent cache unavailable: {e}")
         if not settings.DEMO_MODE:
             try:
-                self.client = boto3.client(
-                    service_name='bedrock-runtime',
-                    region_name=settings.AWS_REGION
+                self.transport = BedrockTransport(
+                    region=settings.AWS_REGION,
+                    pool_size=settings.BEDROCK_POOL_SIZE,
+                    connect_timeout=settings.BEDROCK_CONNECT_TIMEOUT_SECONDS,
+                    embed_timeout=settings.BEDROCK_EMBED_TIMEOUT_SECONDS,
+                    generate_timeout=settings.BEDROCK_GENERATE_TIMEOUT_SECONDS,
+                    stream_pool_size=settings.BEDROCK_STREAM_POOL_SIZE
                 )
-                print("✅ AWS Bedrock Client Initialized")
+                print(f"✅ AWS Bedrock Client Initialized (pool: {settings.BEDROCK_POOL_SIZE})")
             except Exception as e:
                 print(f"⚠️ Failed to initialize AWS Client: {e}")
                 settings.DEMO_MODE = True
@@ -21,6 +117,7 @@ class BedrockAgent:
     async def analyze_vibe(self, query: str, context: UserContext) -> HyperbolicIntent:
         """
         Analyzes the query to find the 'Hyperbolic Vector' (Sub-culture/Intent).
+        Served from the intent cache when the same (or a near-duplicate) query was seen.
         """
         if settings.DEMO_MODE:
             # check if deep interests can inform this
@@ -28,7 +125,79 @@ class BedrockAgent:
             if context.deep_interests:
                 deep_context = f" User deeply interested in: {[d.name for d in context.deep_interests]}"
             return self._mock_analysis(query + deep_context, context)
-            
+
+        if self.intent_cache is None:
+            try:
+                return await self._analyze_vibe_live(query, context)
+            except Exception as e:
+                print(f"Bedrock Intent Analysis Failed: {e}")
+                return self._mock_analysis(query, context)
+
+        key, interests_hash = self.intent_cache.make_key(query, context.interests)
+        try:
+            cached = await asyncio.to_thread(self.intent_cache.get, key)
+        except Exception as e:
+            print(f"⚠️ Intent cache read failed: {e}")
+            cached = None
+        if cached is None:
+            cached = await self.intent_flights.do(key, lambda: self._resolve_intent(query, context, key, interests_hash))
+        if cached is None:
+            return self._mock_analysis(query, context)
+        return HyperbolicIntent(**cached)
+
+    async def _resolve_intent(self, query: str, context: UserContext, key: str, interests_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Exact-miss path: reuse a near-duplicate query's intent, else ask the model.
+        The model call and the query embedding start together, so a semantic miss costs the
+        slower of the two rather than their sum; a semantic hit cancels the model call.
+        Returns None when the model failed (the mock fallback is never cached).
+        """
+        model = asyncio.ensure_future(self._analyze_vibe_live(query, context))
+        embedding = asyncio.ensure_future(self._embed_query(query))
+        # A model call cancelled after it already failed must not log "exception never retrieved"
+        model.add_done_callback(lambda task: task.cancelled() or task.exception())
+        try:
+            if self.intent_cache.has_neighbours(interests_hash):
+                vector = await embedding
+                match = self.intent_cache.nearest(interests_hash, vector) if vector is not None else None
+                if match is not None:
+                    model.cancel()
+                    intent, similarity = match
+                    print(f"🧠 Intent reused for '{query}' (cosine {similarity:.3f})")
+                    await self._store_intent(key, interests_hash, query, intent, vector)
+                    return intent
+            else:
+                self.intent_cache.record_miss()
+
+            try:
+                intent = (await model).dict()
+            except Exception as e:
+                print(f"Bedrock Intent Analysis Failed: {e}")
+                return None
+            await self._store_intent(key, interests_hash, query, intent, await embedding)
+            return intent
+        finally:
+            model.cancel()
+            embedding.cancel()
+
+    async def _store_intent(self, key: str, interests_hash: str, query: str, intent: Dict[str, Any],
+                            vector: Optional[List[float]]) -> None:
+        try:
+            await asyncio.to_thread(self.intent_cache.put, key, interests_hash, query, intent, vector)
+        except Exception as e:
+            print(f"⚠️ Intent cache write failed: {e}")
+
+    async def _embed_query(self, query: str) -> Optional[List[float]]:
+        if self.intent_cache.similarity_threshold > 1:
+            return None
+        try:
+            return await self._embed_text(query)
+        except Exception as e:
+            print(f"⚠️ Query embedding for intent cache failed: {e}")
+            return None
+
+    async def _analyze_vibe_live(self, query: str, context: UserContext) -> HyperbolicIntent:
+        """One Bedrock intent analysis; raises on failure or unusable output."""
         # Real Bedrock Call for Intent Analysis
         prompt = f"""
         Analyze this search query: "{query}" and user context interests: {context.interests}.
@@ -48,39 +217,35 @@ class BedrockAgent:
         }}
         """
         
-        try:
-            response = await self._invoke_bedrock(prompt)
-            # Ensure it's never ambiguous regardless of the model output
-            if "is_ambiguous" in response:
-                 response["is_ambiguous"] = False
-            
-            # Fix: Model sometimes returns strings instead of dicts for potential_intents
-            if "potential_intents" in response and isinstance(response["potential_intents"], list):
-                sanitized_intents = []
-                for item in response["potential_intents"]:
-                    if isinstance(item, dict):
-                        # Ensure required fields are present to satisfy Pydantic
-                        item.setdefault("sub_culture", response.get("sub_culture", "Related"))
-                        item.setdefault("vibe", response.get("vibe", "Similar"))
-                        item.setdefault("target_audience", response.get("target_audience", "General"))
-                        item.setdefault("boost_keywords", [])
-                        item.setdefault("suppress_keywords", [])
-                        sanitized_intents.append(item)
-                    elif isinstance(item, str):
-                        sanitized_intents.append({
-                            "sub_culture": item,
-                            "vibe": "Exploratory",
-                            "target_audience": "Curious Users",
-                            "boost_keywords": [],
-                            "suppress_keywords": [],
-                            "is_ambiguous": False
-                        })
-                response["potential_intents"] = sanitized_intents
-
-            return HyperbolicIntent(**response)
-        except Exception as e:
-            print(f"Bedrock Intent Analysis Failed: {e}")
-            return self._mock_analysis(query, context)
+        response = await self._invoke_bedrock(prompt)
+        # Ensure it's never ambiguous regardless of the model output
+        if "is_ambiguous" in response:
+             response["is_ambiguous"] = False
+        
+        # Fix: Model sometimes returns strings instead of dicts for potential_intents
+        if "potential_intents" in response and isinstance(response["potential_intents"], list):
+            sanitized_intents = []
+            for item in response["potential_intents"]:
+                if isinstance(item, dict):
+                    # Ensure required fields are present to satisfy Pydantic
+                    item.setdefault("sub_culture", response.get("sub_culture", "Related"))
+                    item.setdefault("vibe", response.get("vibe", "Similar"))
+                    item.setdefault("target_audience", response.get("target_audience", "General"))
+                    item.setdefault("boost_keywords", [])
+                    item.setdefault("suppress_keywords", [])
+                    sanitized_intents.append(item)
+                elif isinstance(item, str):
+                    sanitized_intents.append({
+                        "sub_culture": item,
+                        "vibe": "Exploratory",
+                        "target_audience": "Curious Users",
+                        "boost_keywords": [],
+                        "suppress_keywords": [],
+                        "is_ambiguous": False
+                    })
+            response["potential_intents"] = sanitized_intents
+
+        return HyperbolicIntent(**response)
 
     async def analyze_semantic_density(self, transcript: str) -> dict:
         """
@@ -118,36 +283,188 @@ class BedrockAgent:
             return await self._invoke_bedrock(prompt)
         except Exception as e:
             print(f"Bedrock Transcript Analysis Failed: {e}")
-            return {
-                "density_score": 40, # Penalize if we can't analyze
-                "signal_ratio": 0.4,
-                "key_insights": ["Analysis Failed"],
-                "noise_flags": ["AI Error"]
+            return self._density_failure()
+
+    @staticmethod
+    def _density_failure() -> dict:
+        return {
+            "density_score": 40, # Penalize if we can't analyze
+            "signal_ratio": 0.4,
+            "key_insights": ["Analysis Failed"],
+            "noise_flags": ["AI Error"]
+        }
+
+    async def analyze_semantic_density_batch(self, transcripts: List[str]) -> List[dict]:
+        """
+        analyze_semantic_density for many transcripts: DENSITY_BATCH_SIZE per prompt,
+        batches run concurrently under DENSITY_BATCH_CONCURRENCY. Results are aligned with
+        `transcripts` and use the single-call schema. Items a batch answer leaves out are
+        scored on their own; a failed batch gets the usual failure scores.
+        """
+        if settings.DEMO_MODE:
+            return [await self.analyze_semantic_density(t) for t in transcripts]
+
+        size = max(1, settings.DENSITY_BATCH_SIZE)
+        batches = [transcripts[i:i + size] for i in range(0, len(transcripts), size)]
+        scored = await asyncio.gather(*(self._score_density_batch(batch) for batch in batches))
+        return [result for batch in scored for result in batch]
+
+    async def _score_density_batch(self, transcripts: List[str]) -> List[dict]:
+        if len(transcripts) == 1:
+            async with self._density_semaphore:
+                return [await self.analyze_semantic_density(transcripts[0])]
+
+        # Keep the whole batch within roughly the single-call transcript budget
+        per_item = max(1500, 10000 // len(transcripts))
+        items = "\n\n".join(
+            f'<video id="v{i}">\n{t[:per_item]}\n</video>' for i, t in enumerate(transcripts)
+        )
+        prompt = f"""
+        Analyze each of the following video transcripts independently. Code serves as the "Semantic Judge" for a Hyperbolic Search Engine.
+        Your goal is to score the "Information Density" (0-100) of every video.
+        High Score = Dense, technical, novel insights, efficient communication.
+        Low Score = Repetitive, fluff, generic advice, slow pacing, engagement bait.
+
+        {items}
+
+        Return JSON format, with exactly one result per video id:
+        {{
+            "results": [
+                {{
+                    "id": "<video id>",
+                    "density_score": <int 0-100>,
+                    "signal_ratio": <float 0.0-1.0>,
+                    "key_insights": [<list of top 3 unique insights>],
+                    "noise_flags": [<list of detected fluff e.g. 'Excessive self-promo', 'Repetitive'>]
+                }}
+            ]
+        }}
+        """
+
+        try:
+            async with self._density_semaphore:
+                response = await self._invoke_bedrock(prompt, max_tokens=min(4096, 250 + 300 * len(transcripts)))
+            by_id = {
+                str(item.get("id")): item
+                for item in response.get("results", []) if isinstance(item, dict)
             }
+        except Exception as e:
+            print(f"Bedrock Batch Transcript Analysis Failed ({len(transcripts)} videos): {e}")
+            return [self._density_failure() for _ in transcripts]
 
-    async def _invoke_bedrock(self, prompt: str) -> dict:
+        results: List[Optional[dict]] = [
+            self._normalize_density(by_id[f"v{i}"]) if f"v{i}" in by_id else None
+            for i in range(len(transcripts))
+        ]
+        missing = [i for i, r in enumerate(results) if r is None]
+        if missing:
+            print(f"⚠️ Density batch skipped {len(missing)}/{len(transcripts)} videos; scoring them individually.")
+            retried = await asyncio.gather(*(self._score_density_batch([transcripts[i]]) for i in missing))
+            for i, result in zip(missing, retried):
+                results[i] = result[0]
+        return results
+
+    @staticmethod
+    def _normalize_density(item: Dict[str, Any]) -> dict:
+        try:
+            density = max(0, min(100, int(round(float(item.get("density_score", 40))))))
+            signal = max(0.0, min(1.0, float(item.get("signal_ratio", density / 100))))
+        except (TypeError, ValueError):
+            density, signal = 40, 0.4
+        return {
+            "density_score": density,
+            "signal_ratio": signal,
+            "key_insights": list(item.get("key_insights") or []),
+            "noise_flags": list(item.get("noise_flags") or []),
+        }
+
+    async def _invoke_model(self, model_id: str, body: Dict[str, Any], service: str) -> Dict[str, Any]:
+        """
+        One invoke_model call returning the parsed JSON body.
+        Goes through the record/replay layer (service: bedrock.generate / bedrock.embed).
+        """
+        kind = "embed" if service == "bedrock.embed" else "generate"
+
+        async def invoke():
+            # Run blocking boto3 client call on the Bedrock thread pool to keep event loop free
+            response = await self.transport.run(
+                kind,
+                self.transport.client(kind).invoke_model,
+                modelId=model_id,
+                accept="application/json",
+                contentType="application/json",
+                body=json.dumps(body)
+            )
+            return json.loads(response.get("body").read())
+
+        # Admission (rate limits, priority, circuit breaker) covers replayed calls too
+        async with self.gateway.admit(kind, self._estimate_tokens(body)) as ticket:
+            response_body = await replay.call(service, {"model_id": model_id, "body": body}, invoke, on_fault=_replay_fault)
+            ticket.used_tokens = self._used_tokens(response_body)
+        return response_body
+
+    @staticmethod
+    def _estimate_tokens(body: Dict[str, Any]) -> int:
+        """Upper-bound estimate charged before the call: ~4 chars per input token plus max output."""
+        return len(json.dumps(body)) // 4 + int(body.get("max_tokens", 0))
+
+    @staticmethod
+    def _used_tokens(response_body: Dict[str, Any]) -> Optional[int]:
+        usage = response_body.get("usage")
+        if isinstance(usage, dict):
+            return int(usage.get("input_tokens", 0)) + int(usage.get("output_tokens", 0))
+        if "inputTextTokenCount" in response_body:
+            return int(response_body["inputTextTokenCount"])
+        return None
+
+    async def _invoke_bedrock(self, prompt: str, cache_site: Optional[str] = None, bypass_cache: bool = False,
+                              max_tokens: int = 2000) -> dict:
         """
         Helper to invoke Claude 3 Haiku via Bedrock asynchronously.
+        Call sites whose prompt fully determines the answer pass `cache_site` to reuse
+        earlier responses (per-site TTL); `bypass_cache` forces a fresh generation.
         """
-        body = json.dumps({
+        if cache_site is None or self.response_cache is None:
+            return (await self._generate_json(prompt, max_tokens))[0]
+        if bypass_cache:
+            self.response_cache.record_bypass(cache_site)
+            return await self._generate_and_store(cache_site, prompt, max_tokens)
+
+        key = self.response_cache.make_key(self.GENERATION_MODEL_ID, prompt, max_tokens)
+        try:
+            cached = await asyncio.to_thread(self.response_cache.get, cache_site, key)
+        except Exception as e:
+            print(f"⚠️ Bedrock response cache read failed ({cache_site}): {e}")
+            cached = None
+        if cached is not None:
+            return cached
+        return await self.response_flights.do(key, lambda: self._generate_and_store(cache_site, prompt, max_tokens))
+
+    async def _generate_and_store(self, cache_site: str, prompt: str, max_tokens: int) -> dict:
+        result, parsed = await self._generate_json(prompt, max_tokens)
+        # Only well-formed JSON is worth replaying; a raw-text fallback is retried next time
+        if parsed:
+            key = self.response_cache.make_key(self.GENERATION_MODEL_ID, prompt, max_tokens)
+            try:
+                await asyncio.to_thread(self.response_cache.put, key, result)
+            except Exception as e:
+                print(f"⚠️ Bedrock response cache write failed ({cache_site}): {e}")
+        return result
+
+    async def _generate_json(self, prompt: str, max_tokens: int) -> Tuple[dict, bool]:
+        """One generation call. Returns (result, parsed_as_json)."""
+        body = {
             "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 2000,
+            "max_tokens": max_tokens,
             "messages": [
                 {
                     "role": "user",
                     "content": [{"type": "text", "text": prompt}]
                 }
             ]
-        })
-
-        # Run blocking boto3 client call in a separate thread to keep event loop free
-        response = await asyncio.to_thread(
-            self.client.invoke_model,
-            modelId="anthropic.claude-3-haiku-20240307-v1:0",
-            body=body
-        )
+        }
 
-        response_body = json.loads(response.get("body").read())
+        response_body = await self._invoke_model(self.GENERATION_MODEL_ID, body, "bedrock.generate")
         content = response_body.get("content", [])[0].get("text", "{}")
         
         # Extract JSON from potential markdown blocks
@@ -157,37 +474,156 @@ class BedrockAgent:
             content = content[content.find("{"):content.rfind("}")+1]
             
         try:
-            return json.loads(content)
+            return json.loads(content), True
         except json.JSONDecodeError:
             # Fallback if AI returns raw text instead of JSON
-            return {"script": content}
+            return {"script": content}, False
+
+    async def stream_bedrock(self, prompt: str, max_tokens: int = 2000) -> AsyncIterator[str]:
+        """
+        Streams Claude 3 Haiku text deltas as they are generated (invoke_model_with_response_stream).
+        Perceived latency becomes time-to-first-token instead of the full generation.
+        """
+        body = {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": max_tokens,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [{"type": "text", "text": prompt}]
+                }
+            ]
+        }
+        request = {"model_id": self.GENERATION_MODEL_ID, "body": body}
+        async with self.gateway.admit("generate", self._estimate_tokens(body)) as ticket:
+            async for text in replay.stream("bedrock.stream", request, lambda: self._stream_model_text(self.GENERATION_MODEL_ID, body), on_fault=_replay_fault):
+                ticket.mark_first_byte()
+                yield text
+
+    async def _stream_model_text(self, model_id: str, body: dict) -> AsyncIterator[str]:
+        """
+        Bridges the blocking boto3 event stream into the event loop: a worker thread reads
+        events and hands text deltas over through an asyncio.Queue. If the consumer goes
+        away (client disconnect), the worker stops at the next event and closes the stream.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        finished = object()
+
+        def hand_over(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                stop.set() # Event loop already closed
+
+        def pump():
+            try:
+                response = self.transport.client("generate").invoke_model_with_response_stream(
+                    modelId=model_id,
+                    accept="application/json",
+                    contentType="application/json",
+                    body=json.dumps(body)
+                )
+                stream = response.get("body")
+                try:
+                    for event in stream:
+                        if stop.is_set():
+                            break
+                        chunk = event.get("chunk")
+                        if not chunk:
+                            continue
+                        payload = json.loads(chunk.get("bytes"))
+                        if payload.get("type") == "content_block_delta":
+                            text = payload.get("delta", {}).get("text")
+                            if text:
+                                hand_over(text)
+                finally:
+                    stream.close()
+                hand_over(finished)
+            except Exception as e:
+                hand_over(e)
+
+        def on_done(task: asyncio.Future):
+            # pump() reports its own errors; this catches a submit that never ran it
+            if not task.cancelled() and task.exception() is not None:
+                queue.put_nowait(task.exception())
+
+        worker = asyncio.ensure_future(self.transport.run("stream", pump))
+        worker.add_done_callback(on_done)
+        try:
+            while True:
+                item = await queue.get()
+                if item is finished:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            worker.cancel()
+
+    async def _embed_text(self, text: str) -> List[float]:
+        """
+        One Titan embedding call under the shared concurrency cap.
+        Retries throttling with full-jitter exponential backoff; raises on final failure.
+        """
+        body = {
+            "inputText": text,
+            "dimensions": self.EMBEDDING_DIMENSIONS,
+            "normalize": True
+        }
+
+        async with self._embedding_semaphore:
+            for attempt in range(settings.BEDROCK_MAX_RETRIES + 1):
+                try:
+                    response_body = await self._invoke_model(self.EMBEDDING_MODEL_ID, body, "bedrock.embed")
+                    return response_body.get("embedding", [])
+                except ClientError as e:
+                    code = e.response.get("Error", {}).get("Code")
+                    if code not in RETRYABLE_ERROR_CODES or attempt == settings.BEDROCK_MAX_RETRIES:
+                        raise
+                    delay = min(settings.BEDROCK_BACKOFF_MAX_SECONDS, settings.BEDROCK_BACKOFF_BASE_SECONDS * (2 ** attempt))
+                    await asyncio.sleep(random.uniform(0, delay))
 
     async def generate_embeddings(self, text: str) -> List[float]:
         """
         Generates Amazon Titan Text Embeddings V2 for semantic vector search asynchronously.
         """
         if settings.DEMO_MODE:
-            return [0.0] * 1024  # Standardized to 1024
-            
-        body = json.dumps({
-            "inputText": text,
-            "dimensions": 1024,
-            "normalize": True
-        })
+            return [0.0] * self.EMBEDDING_DIMENSIONS  # Standardized to 1024
         
         try:
-            response = await asyncio.to_thread(
-                self.client.invoke_model,
-                modelId="amazon.titan-embed-text-v2:0",
-                accept="application/json",
-                contentType="application/json",
-                body=body
-            )
-            response_body = json.loads(response.get("body").read())
-            return response_body.get("embedding", [])
+            return await self._embed_text(text)
         except Exception as e:
             print(f"Titan Embeddings Failed: {e}")
-            return [0.0] * 1024
+            return [0.0] * self.EMBEDDING_DIMENSIONS
+
+    async def generate_embeddings_batch(self, texts: List[str]) -> List[EmbeddingResult]:
+        """
+        Embeds many texts concurrently (capped by BEDROCK_EMBED_CONCURRENCY).
+        Unlike `generate_embeddings`, failures are reported per item instead of
+        being silently replaced with zero vectors. Results are aligned with `texts`.
+        """
+        if settings.DEMO_MODE:
+            return [EmbeddingResult(text=t, vector=[0.0] * self.EMBEDDING_DIMENSIONS) for t in texts]
+
+        async def embed_one(text: str) -> EmbeddingResult:
+            try:
+                return EmbeddingResult(text=text, vector=await self._embed_text(text))
+            except ClientError as e:
+                return EmbeddingResult(text=text, error=e.response.get("Error", {}).get("Code") or str(e))
+            except Exception as e:
+                return EmbeddingResult(text=text, error=str(e))
+
+        unique_texts = list(dict.fromkeys(texts))
+        results = await asyncio.gather(*(embed_one(t) for t in unique_texts))
+        by_text = dict(zip(unique_texts, results))
+
+        failed = [r for r in results if not r.ok]
+        if failed:
+            print(f"⚠️ Titan batch: {len(failed)}/{len(unique_texts)} embeddings failed ({failed[0].error})")
+        return [by_text[t] for t in texts]
 
     async def generate_multimodal_embeddings(self, text: str, image_base64: str) -> List[float]:
         """
@@ -203,17 +639,8 @@ class BedrockAgent:
         if image_base64: bodyPayload["inputImage"] = image_base64
         bodyPayload["embeddingConfig"] = {"outputEmbeddingLength": 1024}
         
-        body = json.dumps(bodyPayload)
-        
         try:
-            response = await asyncio.to_thread(
-                self.client.invoke_model,
-                modelId="amazon.titan-embed-image-v1",
-                accept="application/json",
-                contentType="application/json",
-                body=body
-            )
-            response_body = json.loads(response.get("body").read())
+            response_body = await self._invoke_model("amazon.titan-embed-image-v1", bodyPayload, "bedrock.embed")
             return response_body.get("embedding", [])
         except Exception as e:
             print(f"Titan Multimodal Embeddings Failed: {e}")
@@ -348,7 +775,7 @@ class BedrockAgent:
             domain_id="science" # Fallback
         )
 
-    async def map_interests(self, broad_interests: List[str]) -> List[SubCulture]:
+    async def map_interests(self, broad_interests: List[str], refresh: bool = False) -> List[SubCulture]:
         """
         Expands broad interests into a 'Hyperbolic Interest Graph' of Sub-Cultures.
         """
@@ -374,7 +801,7 @@ class BedrockAgent:
         }}
         """
         try:
-            response = await self._invoke_bedrock(prompt)
+            response = await self._invoke_bedrock(prompt, cache_site="map_interests", bypass_cache=refresh)
             return [SubCulture(**item) for item in response.get("deep_interests", [])]
         except Exception as e:
             print(f"Interest Mapping Failed: {e}")
@@ -499,9 +926,33 @@ class BedrockAgent:
         Optimized for sub-5s response.
         """
         if settings.DEMO_MODE:
-            return f"**[MOCK SCRIPT]**\n\n**Topic:** {topic}\n**Angle:** {angle}\n\n**Hook (0-5s):** 'Stop doing {topic} the wrong way!'\n\n**Body:** ... (Mock Content) ...\n\n---\n*🔒 This is a demo response. Add your AWS Bedrock keys to `.env` for real AI-generated scripts.*"
+            return self._mock_content_script(topic, angle)
 
-        prompt = f"""
+        prompt = self._content_script_prompt(topic, angle) + """
+        Return JSON ONLY:
+        {
+            "script": "# Script title\\n\\n## Hook\\n...\\n\\n## Body\\n..."
+        }
+        """
+        try:
+            res = await self._invoke_bedrock(prompt)
+            return res.get("script", "Error: Script key missing in AI response.")
+        except Exception as e:
+            print(f"❌ Script Gen Failure: {e}")
+            return f"Error generating script: {e}"
+
+    async def stream_content_script(self, topic: str, angle: str) -> AsyncIterator[str]:
+        """Streaming variant of generate_content_script: yields raw markdown as it is written."""
+        if settings.DEMO_MODE:
+            yield self._mock_content_script(topic, angle)
+            return
+
+        prompt = self._content_script_prompt(topic, angle) + STREAM_MARKDOWN_INSTRUCTION.format(start="# Script title")
+        async for text in self._stream_or_error(prompt, "Error generating script", "Script Gen"):
+            yield text
+
+    def _content_script_prompt(self, topic: str, angle: str) -> str:
+        return f"""
         Act as a master YouTube Strategist. Write a video script outline for:
         Topic: "{topic}"
         Angle/Vibe: "{angle}"
@@ -512,29 +963,59 @@ class BedrockAgent:
         - Key Points: 3 bullet points of unique insight. No tables.
         - Call to Action: Smooth interaction prompt.
         - Formatting: Use only plain text and markdown headers/lists. DO NOT use markdown tables.
-        
-        Return JSON ONLY:
-        {{
-            "script": "# Script title\\n\\n## Hook\\n...\\n\\n## Body\\n..."
-        }}
+        """
+
+    def _mock_content_script(self, topic: str, angle: str) -> str:
+        return f"**[MOCK SCRIPT]**\n\n**Topic:** {topic}\n**Angle:** {angle}\n\n**Hook (0-5s):** 'Stop doing {topic} the wrong way!'\n\n**Body:** ... (Mock Content) ...\n\n---\n*🔒 This is a demo response. Add your AWS Bedrock keys to `.env` for real AI-generated scripts.*"
+
+    async def _stream_or_error(self, prompt: str, error_prefix: str, label: str) -> AsyncIterator[str]:
+        """
+        Streams a generation. Failures become a trailing error line, like the non-streaming
+        tools return error text, since the response status is already sent.
         """
         try:
-            res = await self._invoke_bedrock(prompt)
-            return res.get("script", "Error: Script key missing in AI response.")
+            async for text in self.stream_bedrock(prompt):
+                yield text
         except Exception as e:
-            print(f"❌ Script Gen Failure: {e}")
-            return f"Error generating script: {e}"
+            print(f"❌ {label} Stream Failure: {e}")
+            yield f"\n\n{error_prefix}: {e}"
 
     async def generate_content_planner(self, niche: str, platforms: List[str], days: int, tone: str) -> str:
         """
         Generates a multi-platform content calendar.
         """
         if settings.DEMO_MODE:
-            return f"**[MOCK PLANNER]**\n\n**Niche:** {niche}\n**Platforms:** {', '.join(platforms)}\n**Duration:** {days} days\n**Tone:** {tone}\n\n*Day 1: ...*"
+            return self._mock_content_planner(niche, platforms, days, tone)
+
+        prompt = self._content_planner_prompt(niche, platforms, days, tone) + """
+        Return JSON ONLY:
+        {
+            "content": "# Content Calendar\\n\\n## Day 1\\n**[Platform 1]**\\n- Idea...\\n**[Platform 2]**\\n- Idea...\\n\\n## Day 2..."
+        }
+        """
+        try:
+            res = await self._invoke_bedrock(prompt)
+            if isinstance(res, dict):
+                return res.get("content") or res.get("script") or str(res)
+            return str(res)
+        except Exception as e:
+            print(f"❌ Planner Gen Failure: {e}")
+            return f"Error generating planner: {e}"
 
+    async def stream_content_planner(self, niche: str, platforms: List[str], days: int, tone: str) -> AsyncIterator[str]:
+        """Streaming variant of generate_content_planner."""
+        if settings.DEMO_MODE:
+            yield self._mock_content_planner(niche, platforms, days, tone)
+            return
+
+        prompt = self._content_planner_prompt(niche, platforms, days, tone) + STREAM_MARKDOWN_INSTRUCTION.format(start="# Content Calendar")
+        async for text in self._stream_or_error(prompt, "Error generating planner", "Planner Gen"):
+            yield text
+
+    def _content_planner_prompt(self, niche: str, platforms: List[str], days: int, tone: str) -> str:
         platforms_str = ", ".join(platforms) if platforms else "General"
         
-        prompt = f"""
+        return f"""
         Act as a Master Content Strategist. Create a detailed {days}-day content calendar for the niche: "{niche}".
         The content must be written in a "{tone}" tone.
         
@@ -545,20 +1026,10 @@ class BedrockAgent:
         - For EVERY DAY, you MUST provide a separate category/section for EACH of the selected platforms ({platforms_str}).
         - Under each platform, provide a highly specific content idea and a brief description of the execution.
         - NEVER output markdown tables. Use headers, bold text, and bullet points.
-        
-        Return JSON ONLY:
-        {{
-            "content": "# Content Calendar\\n\\n## Day 1\\n**[Platform 1]**\\n- Idea...\\n**[Platform 2]**\\n- Idea...\\n\\n## Day 2..."
-        }}
         """
-        try:
-            res = await self._invoke_bedrock(prompt)
-            if isinstance(res, dict):
-                return res.get("content") or res.get("script") or str(res)
-            return str(res)
-        except Exception as e:
-            print(f"❌ Planner Gen Failure: {e}")
-            return f"Error generating planner: {e}"
+
+    def _mock_content_planner(self, niche: str, platforms: List[str], days: int, tone: str) -> str:
+        return f"**[MOCK PLANNER]**\n\n**Niche:** {niche}\n**Platforms:** {', '.join(platforms)}\n**Duration:** {days} days\n**Tone:** {tone}\n\n*Day 1: ...*"
 
     async def summarize_video(self, transcript: str) -> dict:
         """
@@ -590,8 +1061,28 @@ class BedrockAgent:
         Repurposes a video transcript into a Blog Post, Twitter Thread, LinkedIn Post, or Reel Script.
         """
         if settings.DEMO_MODE:
-             return f"**[MOCK {format_type.upper()}]**\n\nBased on transcript...\n\n---\n*🔒 This is a demo response. Add your AWS Bedrock keys to `.env` for real AI-generated content.*"
+             return self._mock_repurpose(format_type)
+
+        try:
+            res = await self._invoke_bedrock(self._repurpose_prompt(transcript, format_type))
+            # Depending on how the AI answered, we might have 'content', 'script', or it might just be a string.
+            if isinstance(res, dict):
+                content = res.get("content") or res.get("script") or str(res)
+                return str(content)
+            return str(res)
+        except Exception as e:
+            return f"Error repurposing content: {e}"
+
+    async def stream_repurpose_content(self, transcript: str, format_type: str) -> AsyncIterator[str]:
+        """Streaming variant of repurpose_content (the prompt already asks for raw text)."""
+        if settings.DEMO_MODE:
+            yield self._mock_repurpose(format_type)
+            return
+
+        async for text in self._stream_or_error(self._repurpose_prompt(transcript, format_type), "Error repurposing content", "Repurpose"):
+            yield text
 
+    def _repurpose_prompt(self, transcript: str, format_type: str) -> str:
         format_prompts = {
             "twitter": "a highly engaging 5-7 tweet Twitter Thread. Use hooks, high-signal bullet points, and an actionable conclusion. Number the tweets like 1/7, 2/7. Do not use hashtags.",
             "linkedin": "a viral LinkedIn Post. Format with a story-driven hook, short punchy sentences, lots of whitespace, emojis for bullet points, and a strong professional CTA. Keep it under 200 words.",
@@ -601,7 +1092,7 @@ class BedrockAgent:
         
         target_format = format_prompts.get(format_type.lower(), "a highly engaging post.")
 
-        prompt = f"""
+        return f"""
         Repurpose the following video transcript into {target_format}
         
         IMPORTANT: Extract the HIGHEST DENSITY signal. Delete all intro fluff, sponsor reads, and irrelevant chatter. 
@@ -609,17 +1100,12 @@ class BedrockAgent:
 
         Transcript: {transcript[:15000]}...
         """
-        try:
-            res = await self._invoke_bedrock(prompt)
-            # Depending on how the AI answered, we might have 'content', 'script', or it might just be a string.
-            if isinstance(res, dict):
-                content = res.get("content") or res.get("script") or str(res)
-                return str(content)
-            return str(res)
-        except Exception as e:
-            return f"Error repurposing content: {e}"
 
-    async def generate_terrain_niches(self, domain: str, parent_topic: Optional[str], watch_history: list) -> list:
+    def _mock_repurpose(self, format_type: str) -> str:
+        return f"**[MOCK {format_type.upper()}]**\n\nBased on transcript...\n\n---\n*🔒 This is a demo response. Add your AWS Bedrock keys to `.env` for real AI-generated content.*"
+
+    async def generate_terrain_niches(self, domain: str, parent_topic: Optional[str], watch_history: list,
+                                      refresh: bool = False) -> list:
         """
         AWS Bedrock-powered terrain expansion.
         Generates personalised niche sub-topics for the Explore Terrain using Claude.
@@ -653,7 +1139,7 @@ Return JSON only:
 {{"topics": ["Topic 1", "Topic 2", "Topic 3", "Topic 4", "Topic 5", "Topic 6"]}}
 """
         try:
-            result = await self._invoke_bedrock(prompt)
+            result = await self._invoke_bedrock(prompt, cache_site="terrain_niches", bypass_cache=refresh)
             return result.get("topics", self._mock_terrain_niches(domain, parent_topic, watch_history))
         except Exception as e:
             print(f"Bedrock Terrain Gen Failed: {e}")
@@ -734,7 +1220,8 @@ Return JSON only:
             result = unseen + seen
 
         return result[:6]
-    async def generate_community_vision(self, community_name: str, quiz_context: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_community_vision(self, community_name: str, quiz_context: Dict[str, Any],
+                                        refresh: bool = False) -> Dict[str, Any]:
         """
         Generates a bespoke 'Blueprint' for a specific community/niche.
         Used when a creator explores their Personal Peak.
@@ -772,7 +1259,7 @@ Return JSON only:
             }
 
         try:
-            return await self._invoke_bedrock(prompt)
+            return await self._invoke_bedrock(prompt, cache_site="community_vision", bypass_cache=refresh)
         except Exception as e:
             print(f"Vision generation failed: {e}")
             return {"vision": "Failed to generate vision.", "roadmap": ["Try again later"], "vibe": "Neutral"}
@@ -0,0 +1,63 @@
+import hashlib
+from collections import defaultdict
+from typing import Any, Dict, Optional
+from app.core.kv_cache import KVCache
+
+def parse_site_ttls(spec: str) -> Dict[str, int]:
+    """'terrain_niches=3600,atlas_mapping=86400' -> {'terrain_niches': 3600, 'atlas_mapping': 86400}"""
+    ttls = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        site, _, seconds = part.partition("=")
+        ttls[site.strip()] = int(seconds)
+    return ttls
+
+class BedrockResponseCache:
+    """
+    Disk-backed cache of parsed Bedrock JSON responses for deterministic prompts.
+    Keyed by sha256(model id, max_tokens, prompt); each call site has its own TTL
+    and its own hit/miss counters. Shared across workers via the SQLite KV store.
+    """
+
+    def __init__(self, path: str, site_ttls: Dict[str, int], default_ttl_seconds: int):
+        self.store = KVCache(path, namespace="bedrock_responses")
+        self.site_ttls = site_ttls
+        self.default_ttl_seconds = default_ttl_seconds
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0, "bypassed": 0})
+
+    @staticmethod
+    def make_key(model_id: str, prompt: str, max_tokens: int) -> str:
+        digest = hashlib.sha256(f"{model_id}\0{max_tokens}\0{prompt}".encode("utf-8")).hexdigest()
+        return f"{model_id}:{digest}"
+
+    def ttl(self, site: str) -> int:
+        return self.site_ttls.get(site, self.default_ttl_seconds)
+
+    def get(self, site: str, key: str) -> Optional[Dict[str, Any]]:
+        """Blocking; run via asyncio.to_thread."""
+        cached = self.store.get(key)
+        if cached is not None and cached[1] <= self.ttl(site):
+            self._counters[site]["hits"] += 1
+            return cached[0]
+        self._counters[site]["misses"] += 1
+        return None
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        """Blocking; run via asyncio.to_thread."""
+        self.store.set(key, response)
+
+    def record_bypass(self, site: str) -> None:
+        self._counters[site]["bypassed"] += 1
+
+    def purge(self) -> int:
+        return self.store.purge(max([self.default_ttl_seconds, *self.site_ttls.values()]))
+
+    def stats(self) -> Dict[str, Any]:
+        sites = {}
+        for site, counters in self._counters.items():
+            lookups = counters["hits"] + counters["misses"]
+            sites[site] = {
+                **counters,
+                "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+                "ttl_seconds": self.ttl(site),
+            }
+        return {"sites": sites}
@@ -0,0 +1,287 @@
+"""
+Admission control for Bedrock calls, one lane per call kind (embed | generate):
+
+- Token buckets for requests/minute and tokens/minute, sized to the account quota,
+  so bursts queue briefly here instead of coming back as ThrottlingException.
+- A priority queue in front of the buckets: interactive (/feed) before creator
+  tools before background jobs. Priority comes from the `bedrock_priority`
+  context variable, set per request path or per background task.
+- A circuit breaker over the recent call window. When the error rate or the
+  share of slow calls crosses its threshold, calls fail fast with
+  BedrockUnavailableError (callers already fall back to their _mock_* results)
+  until a cooldown passes and a probe call succeeds.
+"""
+import time
+import heapq
+import asyncio
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+from botocore.exceptions import BotoCoreError, ClientError
+from app.core.rate_limit import TokenBucket
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    CREATOR = 1
+    BACKGROUND = 2
+
+bedrock_priority: ContextVar[Priority] = ContextVar("bedrock_priority", default=Priority.INTERACTIVE)
+
+# Client-side errors (bad prompt, access) say nothing about Bedrock's health
+NON_FAILURE_ERROR_CODES = {"ValidationException", "AccessDeniedException", "ResourceNotFoundException"}
+
+class BedrockUnavailableError(Exception):
+    """The gateway refused a call: circuit open, or queued longer than allowed."""
+
+def is_upstream_failure(e: BaseException) -> bool:
+    if isinstance(e, ClientError):
+        return e.response.get("Error", {}).get("Code") not in NON_FAILURE_ERROR_CODES
+    return isinstance(e, (BotoCoreError, TimeoutError))
+
+class CircuitBreaker:
+    """closed -> open (cooldown) -> half_open (one probe) -> closed | open."""
+
+    def __init__(self, window: int = 20, min_calls: int = 10, error_rate: float = 0.5, slow_seconds: float = 30,
+                 slow_rate: float = 0.5, cooldown_seconds: float = 30):
+        self.window: Deque[tuple] = deque(maxlen=window)
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.cooldown_seconds = cooldown_seconds
+        self.state = "closed"
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.cooldown_seconds:
+                self.rejected += 1
+                return False
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probing:
+                self.rejected += 1
+                return False
+            self._probing = True
+        return True
+
+    def record(self, ok: bool, latency: float) -> None:
+        if self.state == "half_open":
+            self._probing = False
+            if ok and latency < self.slow_seconds:
+                print("🟢 Bedrock circuit closed (probe succeeded)")
+                self.state = "closed"
+                self.window.clear()
+            else:
+                self._open()
+            return
+        self.window.append((ok, latency >= self.slow_seconds))
+        if len(self.window) < self.min_calls:
+            return
+        errors = sum(1 for ok_, _ in self.window if not ok_) / len(self.window)
+        slow = sum(1 for _, slow_ in self.window if slow_) / len(self.window)
+        if errors >= self.error_rate or slow >= self.slow_rate:
+            self._open()
+
+    def release_probe(self) -> None:
+        """A probe that ended without a verdict (cancelled) lets the next call probe."""
+        self._probing = False
+
+    def _open(self) -> None:
+        if self.state != "open":
+            print(f"🔴 Bedrock circuit opened for {self.cooldown_seconds:g}s")
+            self.opened += 1
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._probing = False
+        self.window.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "window_calls": len(self.window),
+            "window_errors": sum(1 for ok, _ in self.window if not ok),
+            "window_slow": sum(1 for _, slow in self.window if slow),
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "tokens", "future")
+
+    def __init__(self, priority: Priority, seq: int, tokens: float, future: "asyncio.Future[None]"):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.future = future
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+class Ticket:
+    """Handed to the caller inside `admit`; report actual usage and time-to-first-byte."""
+
+    def __init__(self, tokens: float):
+        self.tokens = tokens
+        self.used_tokens: Optional[float] = None
+        self.first_byte: Optional[float] = None
+
+    def mark_first_byte(self) -> None:
+        if self.first_byte is None:
+            self.first_byte = time.monotonic()
+
+class _Lane:
+    def __init__(self, kind: str, requests_per_minute: float, tokens_per_minute: float,
+                 burst_seconds: float, breaker: CircuitBreaker):
+        self.kind = kind
+        self.requests = TokenBucket(requests_per_minute / 60.0, requests_per_minute / 60.0 * burst_seconds)
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute / 60.0 * burst_seconds)
+        self.breaker = breaker
+        self.queue: List[_Waiter] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.timer_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.depth = {p.name.lower(): 0 for p in Priority}
+        self.max_depth = {p.name.lower(): 0 for p in Priority}
+        self.admitted = {p.name.lower(): 0 for p in Priority}
+        self.wait_seconds = {p.name.lower(): 0.0 for p in Priority}
+        self.queue_timeouts = 0
+
+    def grant(self, tokens: float) -> bool:
+        if not self.requests.try_acquire(1):
+            return False
+        if not self.tokens.try_acquire(tokens):
+            self.requests.release(1)
+            return False
+        return True
+
+class BedrockGateway:
+    def __init__(self, limits: Dict[str, Dict[str, float]], burst_seconds: float = 5,
+                 max_queue_seconds: float = 15, breaker: Optional[Dict[str, Any]] = None):
+        """
+        limits: {"embed": {"rpm": .., "tpm": .., "slow_seconds": ..}, "generate": {...}}
+        (rpm/tpm <= 0 disables that bucket). breaker: CircuitBreaker kwargs other than slow_seconds.
+        """
+        breaker = breaker or {}
+        self.max_queue_seconds = max_queue_seconds
+        self._seq = itertools.count()
+        self.lanes = {
+            kind: _Lane(
+                kind, limit.get("rpm", 0), limit.get("tpm", 0), burst_seconds,
+                CircuitBreaker(slow_seconds=limit.get("slow_seconds", 30), **breaker)
+            )
+            for kind, limit in limits.items()
+        }
+
+    @asynccontextmanager
+    async def admit(self, kind: str, tokens: float, priority: Optional[Priority] = None) -> AsyncIterator[Ticket]:
+        """
+        Waits for this call's turn, then yields a Ticket. The outcome of the body feeds the
+        circuit breaker; unused estimated tokens are returned once `ticket.used_tokens` is set.
+        """
+        lane = self.lanes[kind]
+        priority = bedrock_priority.get() if priority is None else priority
+        if not lane.breaker.allow():
+            raise BedrockUnavailableError(f"Bedrock {kind} circuit open")
+        tokens = min(tokens, lane.tokens.capacity)
+        try:
+            await self._wait_turn(lane, priority, tokens)
+        except BaseException:
+            lane.breaker.release_probe()
+            raise
+
+        ticket = Ticket(tokens)
+        started = time.monotonic()
+        verdict = False
+        try:
+            yield ticket
+            lane.breaker.record(True, (ticket.first_byte or time.monotonic()) - started)
+            verdict = True
+        except Exception as e:
+            if is_upstream_failure(e):
+                lane.breaker.record(False, time.monotonic() - started)
+                verdict = True
+            raise
+        finally:
+            if not verdict:
+                lane.breaker.release_probe()
+            if ticket.used_tokens is not None and ticket.used_tokens < tokens:
+                lane.tokens.release(tokens - ticket.used_tokens)
+
+    async def _wait_turn(self, lane: _Lane, priority: Priority, tokens: float) -> None:
+        name = priority.name.lower()
+        # Nobody may overtake queued callers, even if the buckets have room for us
+        if not lane.queue and lane.grant(tokens):
+            lane.admitted[name] += 1
+            return
+
+        waiter = _Waiter(priority, next(self._seq), tokens, asyncio.get_running_loop().create_future())
+        heapq.heappush(lane.queue, waiter)
+        lane.depth[name] += 1
+        lane.max_depth[name] = max(lane.max_depth[name], lane.depth[name])
+        started = time.monotonic()
+        self._dispatch(lane)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.max_queue_seconds)
+        except asyncio.TimeoutError:
+            if not waiter.future.done():
+                lane.queue_timeouts += 1
+                raise BedrockUnavailableError(f"Bedrock {lane.kind} queue wait exceeded {self.max_queue_seconds:g}s")
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as the caller went away: hand the capacity back
+                lane.requests.release(1)
+                lane.tokens.release(tokens)
+            raise
+        finally:
+            lane.depth[name] -= 1
+            lane.wait_seconds[name] += time.monotonic() - started
+            if not waiter.future.done():
+                waiter.future.cancel() # The dispatcher skips it
+            self._dispatch(lane)
+        lane.admitted[name] += 1
+
+    def _dispatch(self, lane: _Lane) -> None:
+        loop = asyncio.get_running_loop()
+        while lane.queue:
+            head = lane.queue[0]
+            # Waiters left behind by a previous event loop (Lambda) can never be woken
+            if head.future.done() or head.future.get_loop() is not loop:
+                heapq.heappop(lane.queue)
+                continue
+            if not lane.grant(head.tokens):
+                break
+            heapq.heappop(lane.queue)
+            head.future.set_result(None)
+
+        if lane.queue and (lane.timer is None or lane.timer_loop is not loop):
+            head = lane.queue[0]
+            delay = max(lane.requests.seconds_until(1), lane.tokens.seconds_until(head.tokens), 0.005)
+
+            def wake():
+                lane.timer = None
+                self._dispatch(lane)
+
+            lane.timer = loop.call_later(delay, wake)
+            lane.timer_loop = loop
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            kind: {
+                "queue_depth": dict(lane.depth),
+                "max_queue_depth": dict(lane.max_depth),
+                "admitted": dict(lane.admitted),
+                "queue_wait_seconds": {k: round(v, 3) for k, v in lane.wait_seconds.items()},
+                "queue_timeouts": lane.queue_timeouts,
+                "requests_bucket": lane.requests.stats(),
+                "tokens_bucket": lane.tokens.stats(),
+                "circuit": lane.breaker.stats(),
+            }
+            for kind, lane in self.lanes.items()
+        }
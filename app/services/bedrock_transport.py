@@ -0,0 +1,73 @@
+"""
+Pooled transport for the Bedrock runtime.
+
+- One boto3 client per call type: embeddings fail fast on a short read timeout,
+  generations (and response streams) get a long one. Both keep TCP connections
+  alive, and their pool holds `pool_size` connections instead of botocore's 10.
+- Blocking boto3 calls run on a dedicated thread pool of the same size, so Bedrock
+  traffic never queues behind (or starves) YouTube, Polly and cache work on the
+  default asyncio executor.
+- Response streams hold a thread for their whole duration, so they get their own
+  smaller pool ("stream" kind): slow /creator streams can't starve /feed embeddings.
+"""
+import asyncio
+import functools
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+import boto3
+from botocore.config import Config
+
+class BedrockTransport:
+    def __init__(self, region: str, pool_size: int = 32, connect_timeout: float = 5,
+                 embed_timeout: float = 15, generate_timeout: float = 120, stream_pool_size: int = 8):
+        self.pool_size = pool_size
+        self.stream_pool_size = stream_pool_size
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="bedrock")
+        self.stream_executor = ThreadPoolExecutor(max_workers=stream_pool_size, thread_name_prefix="bedrock-stream")
+        self.clients = {
+            "embed": self._make_client(region, connect_timeout, embed_timeout),
+            "generate": self._make_client(region, connect_timeout, generate_timeout),
+        }
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.in_flight: Dict[str, int] = defaultdict(int)
+
+    def _make_client(self, region: str, connect_timeout: float, read_timeout: float):
+        return boto3.client(
+            service_name='bedrock-runtime',
+            region_name=region,
+            config=Config(
+                max_pool_connections=self.pool_size,
+                tcp_keepalive=True,
+                connect_timeout=connect_timeout,
+                read_timeout=read_timeout
+            )
+        )
+
+    def client(self, kind: str):
+        return self.clients[kind]
+
+    async def run(self, kind: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs a blocking call for `kind` (embed | generate | stream) on its Bedrock thread pool."""
+        executor = self.stream_executor if kind == "stream" else self.executor
+        self.calls[kind] += 1
+        self.in_flight[kind] += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            self.in_flight[kind] -= 1
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+        self.stream_executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        in_flight = sum(n for kind, n in self.in_flight.items() if kind != "stream")
+        return {
+            "pool_size": self.pool_size,
+            "stream_pool_size": self.stream_pool_size,
+            "calls": dict(self.calls),
+            "in_flight": dict(self.in_flight),
+            "queued": max(0, in_flight - self.pool_size),
+            "streams_queued": max(0, self.in_flight["stream"] - self.stream_pool_size),
+        }
@@ -1,4 +1,4 @@
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional
 from app.services.youtube_client import YouTubeClient
 from app.services.storage_service import StorageService
 from app.services.ranking_engine import RankingEngine
@@ -15,8 +15,8 @@ class CreatorService:
                  ranking_engine: Optional[RankingEngine] = None):
         from app.services.storage_service import StorageService
         self.youtube = youtube_client or YouTubeClient()
-        self.storage = StorageService()
         self.ranking_engine = ranking_engine or RankingEngine(bedrock_agent=bedrock_agent)
+        self.storage = StorageService(pantry_index=self.ranking_engine.pantry_index)
         self.bedrock_agent = bedrock_agent or BedrockAgent()
 
     async def analyze_niche(self, topic: str, recursion_depth: int = 0, limit: int = 20) -> Dict[str, Any]:
@@ -53,20 +53,24 @@ class CreatorService:
 
         # [NEW] Hyperbolic Semantic Analysis (The "Brain" & "Pantry")
         print(f"🧠 analyzing {len(incumbents)} videos with Bedrock...")
-        for video in incumbents:
-            # If score is 0, it means it's fresh (not from S3 cache)
-            if video.hyperbolic_score == 0:
-                # 1. Analyze with Bedrock
-                analysis = await self.bedrock_agent.analyze_semantic_density(video.transcript_summary)
-                
-                # 2. Update Video Scores
-                video.hyperbolic_score = analysis.get('density_score', 0)
-                # Overwrite base_score to use Semantic Density instead of just views
-                video.base_score = video.hyperbolic_score 
-                video.match_reason = f"Density: {video.hyperbolic_score}/100 | Vibe: {analysis.get('noise_flags', [])}"
-                
-                # 3. Save to S3 "Pantry"
-                self.storage.upload_video_data(video.dict())
+        # If score is 0, it means it's fresh (not from S3 cache)
+        fresh = [video for video in incumbents if video.hyperbolic_score == 0]
+        # 1. Analyze with Bedrock (batched prompts, run concurrently)
+        analyses = await self.bedrock_agent.analyze_semantic_density_batch([v.transcript_summary or "" for v in fresh])
+        stored = []
+        for video, analysis in zip(fresh, analyses):
+            # 2. Update Video Scores
+            video.hyperbolic_score = analysis.get('density_score', 0)
+            # Overwrite base_score to use Semantic Density instead of just views
+            video.base_score = video.hyperbolic_score 
+            video.match_reason = f"Density: {video.hyperbolic_score}/100 | Vibe: {analysis.get('noise_flags', [])}"
+            
+            # 3. Save to S3 "Pantry"
+            if self.storage.upload_video_data(video.dict()):
+                stored.append(video)
+
+        # Make them searchable locally (embedding calls run concurrently)
+        await asyncio.gather(*(self.ranking_engine.index_video(video) for video in stored))
 
         # 2. Analyze Value Density
         # We pass 'incumbents' which now have updated scores from Bedrock
@@ -188,14 +192,24 @@ class CreatorService:
     async def generate_script(self, topic: str, angle: str) -> str:
         return await self.bedrock_agent.generate_content_script(topic, angle)
 
+    def stream_script(self, topic: str, angle: str) -> AsyncIterator[str]:
+        return self.bedrock_agent.stream_content_script(topic, angle)
+
     async def generate_content_planner(self, niche: str, platforms: List[str], days: int, tone: str) -> str:
         return await self.bedrock_agent.generate_content_planner(niche, platforms, days, tone)
 
+    def stream_content_planner(self, niche: str, platforms: List[str], days: int, tone: str) -> AsyncIterator[str]:
+        return self.bedrock_agent.stream_content_planner(niche, platforms, days, tone)
+
     async def summarize_video(self, transcript: str) -> dict:
         return await self.bedrock_agent.summarize_video(transcript)
 
     async def repurpose_content(self, transcript: str, format_type: str) -> str:
         return await self.bedrock_agent.repurpose_content(transcript, format_type)
 
-    async def generate_community_vision(self, community_name: str, quiz_context: Dict[str, Any]) -> Dict[str, Any]:
-        return await self.bedrock_agent.generate_community_vision(community_name, quiz_context)
+    def stream_repurpose_content(self, transcript: str, format_type: str) -> AsyncIterator[str]:
+        return self.bedrock_agent.stream_repurpose_content(transcript, format_type)
+
+    async def generate_community_vision(self, community_name: str, quiz_context: Dict[str, Any],
+                                        refresh: bool = False) -> Dict[str, Any]:
+        return await self.bedrock_agent.generate_community_vision(community_name, quiz_context, refresh)
@@ -0,0 +1,111 @@
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Sequence, Tuple
+import numpy as np
+from app.services.quantization import codec_stats
+
+# Rough per-entry bookkeeping cost on top of the vector + key (OrderedDict node, tuple, floats)
+_ENTRY_OVERHEAD_BYTES = 128
+
+class EmbeddingCache:
+    """
+    Bounded in-memory cache for Titan embeddings.
+    - Keys are `<model_id>:<sha256(text)>`, so long titles/descriptions are never held as keys.
+    - Vectors are stored as compact float32 arrays (4 KB for 1024 dims instead of ~32 KB of Python floats).
+    - Entries are evicted LRU-first once the byte budget is exceeded, and lazily on read after the TTL.
+    - An optional codec (see app/services/quantization.py) stores int8 / PQ codes instead,
+      fitting 4-16x more entries in the same budget. This saves memory only: every hit is
+      decoded back to float32 for ranking (~4 us int8, ~16 us PQ m=256 at 1024 dims per
+      benchmarks/bench_quantization.py), which is negligible next to a Titan call.
+    """
+
+    def __init__(self, model_id: str, max_bytes: int, ttl_seconds: float = 0, codec: Optional[Any] = None,
+                 dim: Optional[int] = None):
+        self.model_id = model_id
+        self.dim = codec.dim if codec else dim
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.codec = codec
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def make_key(self, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model_id}:{digest}"
+
+    def _drop(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = self.make_key(text)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        payload, _, stored_at = entry
+        if self.ttl_seconds and time.monotonic() - stored_at > self.ttl_seconds:
+            self._drop(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self.codec.decode_one(payload) if self.codec else payload
+
+    def put(self, text: str, vector: Sequence[float]) -> np.ndarray:
+        """Stores the vector (float32, or encoded by the codec) and returns it as float32."""
+        key = self.make_key(text)
+        array = np.asarray(vector, dtype=np.float32)
+        if self.codec:
+            payload, payload_bytes = self.codec.encode_one(array)
+        else:
+            payload, payload_bytes = array, array.nbytes
+        size = payload_bytes + len(key) + _ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return array
+
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (payload, size, time.monotonic())
+        self._bytes += size
+
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+        return array
+
+    def __contains__(self, text: str) -> bool:
+        return self.make_key(text) in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "model_id": self.model_id,
+            **(codec_stats(self.codec, self.dim) if self.dim else {"codec": "float32"}),
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,266 @@
+"""
+Persistent, memory-mapped embedding store.
+Survives process restarts so Titan embeddings are only paid for once per text.
+
+On-disk layout (inside `directory`):
+    CURRENT              -> active generation number (replaced atomically on compaction)
+    vectors-<gen>.f32    -> append-only float32 matrix, one row per embedding
+    index-<gen>.log      -> append-only "<key>\\t<row>\\t<unix_ts>" lines
+    LOCK                 -> flock target serializing writers across uvicorn workers
+
+Readers never take the file lock: a row is written before its index line, so every
+key visible in the index points at fully written data. Within a process, reader state
+(index, mmap, generation) is guarded by a thread lock; all methods block and are meant
+to run via asyncio.to_thread.
+"""
+import os
+import mmap
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: single-process locking only
+    fcntl = None
+
+class EmbeddingStore:
+    def __init__(self, directory: str, dim: int):
+        self.directory = directory
+        self.dim = dim
+        self.row_bytes = dim * 4
+        os.makedirs(directory, exist_ok=True)
+        self._lock_path = os.path.join(directory, "LOCK")
+        self._current_path = os.path.join(directory, "CURRENT")
+
+        self._generation = -1
+        self._index: Dict[str, int] = {}
+        self._index_offset = 0
+        self._mmap: Optional[mmap.mmap] = None
+        self._mapped_rows = 0
+        # Compaction swaps generations in a worker thread while lookups run in others
+        self._state_lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._open_generation(self._read_generation())
+
+    # ── File helpers ─────────────────────────────────────────────────
+
+    def _vectors_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"vectors-{generation}.f32")
+
+    def _index_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"index-{generation}.log")
+
+    def _read_generation(self) -> int:
+        try:
+            with open(self._current_path) as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write_generation(self, generation: int) -> None:
+        tmp_path = f"{self._current_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(generation))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._current_path)
+
+    @contextmanager
+    def _locked(self):
+        with open(self._lock_path, "a") as handle:
+            if fcntl:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    # ── Reader state ─────────────────────────────────────────────────
+
+    def _open_generation(self, generation: int) -> None:
+        for path in (self._vectors_path(generation), self._index_path(generation)):
+            if not os.path.exists(path):
+                open(path, "ab").close()
+
+        # Old mmap is dropped, not closed: numpy views handed out earlier keep it alive.
+        with self._state_lock:
+            self._generation = generation
+            self._index = {}
+            self._index_offset = 0
+            self._mmap = None
+            self._mapped_rows = 0
+            self._catch_up()
+
+    def _catch_up(self) -> None:
+        """Applies index lines appended by any worker since the last read."""
+        try:
+            with open(self._index_path(self._generation), "rb") as f:
+                f.seek(self._index_offset)
+                chunk = f.read()
+        except FileNotFoundError:  # compacted away underneath us; next refresh switches generation
+            return
+        if not chunk:
+            return
+
+        complete = chunk[:chunk.rfind(b"\n") + 1]  # ignore a half-written trailing line
+        for line in complete.splitlines():
+            parts = line.decode("utf-8").split("\t")
+            if len(parts) >= 2:
+                self._index[parts[0]] = int(parts[1])
+        self._index_offset += len(complete)
+
+    def _remap(self) -> None:
+        try:
+            with open(self._vectors_path(self._generation), "rb") as f:
+                rows = os.fstat(f.fileno()).st_size // self.row_bytes
+                if rows == 0:
+                    return
+                self._mmap = mmap.mmap(f.fileno(), rows * self.row_bytes, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return
+        self._mapped_rows = rows
+
+    def _refresh(self) -> None:
+        generation = self._read_generation()
+        if generation != self._generation:
+            self._open_generation(generation)
+        else:
+            self._catch_up()
+
+    # ── Public API ───────────────────────────────────────────────────
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Returns a read-only, zero-copy float32 view into the mapped file."""
+        with self._state_lock:
+            return self._get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Optional[np.ndarray]]:
+        with self._state_lock:
+            return {key: self._get(key) for key in keys}
+
+    def _get(self, key: str) -> Optional[np.ndarray]:
+        row = self._index.get(key)
+        if row is None:
+            self._refresh()
+            row = self._index.get(key)
+            if row is None:
+                self.misses += 1
+                return None
+
+        if row >= self._mapped_rows:
+            self._refresh()
+            row = self._index.get(key)
+            if row is not None and row >= self._mapped_rows:
+                self._remap()
+            if row is None or row >= self._mapped_rows:
+                self.misses += 1
+                return None
+
+        self.hits += 1
+        return np.frombuffer(self._mmap, dtype=np.float32, count=self.dim, offset=row * self.row_bytes)
+
+    def put(self, key: str, vector: Sequence[float]) -> bool:
+        return self.put_many([(key, vector)]) == 1
+
+    def put_many(self, items: List[Tuple[str, Sequence[float]]]) -> int:
+        """Appends several embeddings under one lock. Returns how many are now stored."""
+        arrays = [(key, np.asarray(vector, dtype=np.float32)) for key, vector in items]
+        arrays = [(key, array) for key, array in arrays if array.shape == (self.dim,)]
+        stored = len(arrays)
+        if not arrays:
+            return 0
+
+        with self._locked(), self._state_lock:
+            self._refresh()
+            arrays = [(key, array) for key, array in arrays if key not in self._index]
+            if arrays:
+                vectors_path = self._vectors_path(self._generation)
+                with open(vectors_path, "r+b") as f:
+                    f.seek(0, os.SEEK_END)
+                    row, partial = divmod(f.tell(), self.row_bytes)
+                    if partial:  # drop a torn row left by a crashed writer
+                        f.truncate(row * self.row_bytes)
+                        f.seek(row * self.row_bytes)
+                    f.write(b"".join(array.tobytes() for _, array in arrays))
+                now = int(time.time())
+                with open(self._index_path(self._generation), "ab") as f:
+                    f.write("".join(f"{key}\t{row + i}\t{now}\n" for i, (key, _) in enumerate(arrays)).encode("utf-8"))
+                self._catch_up()
+
+        self.writes += len(arrays)
+        return stored
+
+    def _stale_rows(self, max_age_seconds: Optional[float]) -> Tuple[Dict[str, Tuple[int, int]], int]:
+        """Returns (live key -> (row, ts), total row count) for the current generation."""
+        live: Dict[str, Tuple[int, int]] = {}
+        with open(self._index_path(self._generation), "rb") as f:
+            for line in f.read().splitlines():
+                parts = line.decode("utf-8").split("\t")
+                if len(parts) == 3:
+                    live[parts[0]] = (int(parts[1]), int(parts[2]))
+
+        if max_age_seconds:
+            cutoff = time.time() - max_age_seconds
+            live = {k: v for k, v in live.items() if v[1] >= cutoff}
+
+        total_rows = os.path.getsize(self._vectors_path(self._generation)) // self.row_bytes
+        return live, total_rows
+
+    def compact(self, max_age_seconds: Optional[float] = None, min_stale_ratio: float = 0.25) -> bool:
+        """
+        Rewrites the store without superseded or expired rows into a new generation.
+        Skipped unless at least `min_stale_ratio` of rows would be reclaimed.
+        """
+        with self._locked():
+            with self._state_lock:
+                self._refresh()
+            live, total_rows = self._stale_rows(max_age_seconds)
+            stale = total_rows - len(live)
+            if total_rows == 0 or stale / total_rows < min_stale_ratio:
+                return False
+
+            old_generation = self._generation
+            new_generation = old_generation + 1
+            source = np.memmap(self._vectors_path(old_generation), dtype=np.float32, mode="r",
+                               shape=(total_rows, self.dim))
+            with open(self._vectors_path(new_generation), "wb") as vf, \
+                 open(self._index_path(new_generation), "wb") as xf:
+                for new_row, (key, (row, ts)) in enumerate(sorted(live.items(), key=lambda kv: kv[1][0])):
+                    vf.write(source[row].tobytes())
+                    xf.write(f"{key}\t{new_row}\t{ts}\n".encode("utf-8"))
+            del source
+
+            self._write_generation(new_generation)
+            self._open_generation(new_generation)
+            # Readers that still map the old files keep their inode alive until they refresh.
+            for path in (self._vectors_path(old_generation), self._index_path(old_generation)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+        print(f"🗜️ Embedding store compacted: {stale}/{total_rows} stale rows dropped.")
+        return True
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "directory": self.directory,
+            "generation": self._generation,
+            "entries": len(self._index),
+            "mapped_bytes": self._mapped_rows * self.row_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "writes": self.writes,
+        }
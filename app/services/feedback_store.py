@@ -0,0 +1,114 @@
+import os
+import json
+import time
+from typing import Dict, Any, Optional, Sequence
+import numpy as np
+
+class FeedbackStore:
+    """
+    Online preference learning from /consumer/feedback.
+    Keeps one float32 preference vector per sub-culture, moved toward the
+    embeddings of videos rated relevant and away from those rated irrelevant
+    (exponentially decayed, so recent feedback dominates).
+
+    Request-path reads and updates are plain O(d) array ops on the event loop,
+    with no locks. Each update builds a new array and swaps the dict entry, so
+    a snapshot copy handed to a background thread never sees a half-written
+    vector.
+    """
+
+    def __init__(self, dim: int, path: str, learning_rate: float = 0.1, decay: float = 0.98):
+        self.dim = dim
+        self.path = path
+        self.learning_rate = learning_rate
+        self.decay = decay
+
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._counts: Dict[str, int] = {}
+        self.updates = 0
+        self.dirty = False
+        self.last_persisted = 0.0
+
+    @staticmethod
+    def _key(sub_culture: str) -> str:
+        return " ".join(sub_culture.lower().split())
+
+    def update(self, sub_culture: str, embedding: Sequence[float], is_relevant: bool) -> bool:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector) if vector.shape == (self.dim,) else 0.0
+        if not sub_culture or norm == 0:
+            return False
+
+        key = self._key(sub_culture)
+        direction = 1.0 if is_relevant else -1.0
+        current = self._vectors.get(key)
+        step = (self.learning_rate * direction / norm) * vector
+        updated = step if current is None else (self.decay * current + step).astype(np.float32)
+
+        self._vectors[key] = updated
+        self._counts[key] = self._counts.get(key, 0) + 1
+        self.updates += 1
+        self.dirty = True
+        return True
+
+    def apply(self, intent_vector: Sequence[float], sub_culture: Optional[str], strength: float) -> np.ndarray:
+        """
+        Re-weights the intent vector toward the learned preference for its sub-culture (O(d)).
+        The result keeps the intent vector's norm, so downstream similarity scales are unchanged.
+        """
+        query = np.asarray(intent_vector, dtype=np.float32)
+        preference = self._vectors.get(self._key(sub_culture)) if sub_culture else None
+        if preference is None or query.shape != preference.shape or strength <= 0:
+            return query
+
+        query_norm = np.linalg.norm(query)
+        preference_norm = np.linalg.norm(preference)
+        if query_norm == 0 or preference_norm == 0:
+            return query
+        adjusted = query / query_norm + strength * preference / preference_norm
+        return (adjusted * (query_norm / max(np.linalg.norm(adjusted), 1e-12))).astype(np.float32)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Shallow copy safe to hand to a background thread (arrays are never mutated in place)."""
+        self.dirty = False
+        return {"vectors": dict(self._vectors), "counts": dict(self._counts)}
+
+    def persist(self, snapshot: Dict[str, Any]) -> None:
+        """Blocking write of a snapshot; run via asyncio.to_thread."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        keys = list(snapshot["vectors"])
+        matrix = np.stack([snapshot["vectors"][k] for k in keys]) if keys else np.zeros((0, self.dim), dtype=np.float32)
+        tmp_path = f"{self.path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            vectors=matrix,
+            keys=np.array(json.dumps(keys)),
+            counts=np.array([snapshot["counts"].get(k, 0) for k in keys], dtype=np.int64),
+        )
+        os.replace(tmp_path, self.path)
+        self.last_persisted = time.time()
+
+    def load(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        try:
+            with np.load(self.path) as data:
+                keys = json.loads(str(data["keys"]))
+                matrix = data["vectors"].astype(np.float32)
+                counts = data["counts"].tolist()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Feedback store unreadable, starting fresh: {e}")
+            return 0
+        if matrix.shape[1:] != (self.dim,):
+            return 0
+        self._vectors = {k: matrix[i].copy() for i, k in enumerate(keys)}
+        self._counts = dict(zip(keys, counts))
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sub_cultures": len(self._vectors),
+            "updates": self.updates,
+            "pending_persist": self.dirty,
+            "last_persisted": self.last_persisted,
+        }
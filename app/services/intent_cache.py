@@ -0,0 +1,145 @@
+import time
+import base64
+import string
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+import numpy as np
+from app.core.kv_cache import KVCache
+from app.services.quantization import Int8Codec
+
+_PUNCTUATION = str.maketrans("", "", string.punctuation)
+
+class IntentCache:
+    """
+    Two-tier cache for analyze_vibe results, so most /feed requests skip the LLM.
+
+    1. Exact: normalized query + hash of the user's interests, persisted in the shared
+       SQLite KV store ("Lo-Fi  Beats" and "lofi beats" share an entry).
+    2. Semantic: on an exact miss, reuse the intent of a cached query whose embedding is
+       within `similarity_threshold` cosine of this one, for the same interests only.
+       Query vectors live in memory as int8 and are re-warmed from the KV store.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, similarity_threshold: float, max_entries: int, dim: int):
+        self.store = KVCache(path, namespace="intents")
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.codec = Int8Codec(dim)
+        # interests hash -> exact key -> (codes, scale, intent, stored_at)
+        self._groups: Dict[str, "OrderedDict[str, Tuple[np.ndarray, float, Dict[str, Any], float]]"] = {}
+        self._size = 0
+        self._lock = threading.Lock() # warm() and put() run in worker threads
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return " ".join(query.lower().translate(_PUNCTUATION).split())
+
+    @staticmethod
+    def interests_hash(interests: Sequence[str]) -> str:
+        canonical = "\n".join(sorted({i.strip().lower() for i in interests if i.strip()}))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+    def make_key(self, query: str, interests: Sequence[str]) -> Tuple[str, str]:
+        """Returns (exact key, interests hash)."""
+        interests_hash = self.interests_hash(interests)
+        return f"{interests_hash}:{self.normalize_query(query)}", interests_hash
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Blocking; run via asyncio.to_thread. Exact tier only."""
+        cached = self.store.get(key)
+        if cached is not None and cached[1] <= self.ttl_seconds:
+            self.exact_hits += 1
+            return cached[0]["intent"]
+        return None
+
+    def has_neighbours(self, interests_hash: str) -> bool:
+        return bool(self._groups.get(interests_hash))
+
+    def nearest(self, interests_hash: str, vector: Sequence[float]) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Closest fresh cached intent above the threshold, as (intent, cosine). Counts the miss otherwise."""
+        query = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        with self._lock:
+            group = self._groups.get(interests_hash)
+            cutoff = time.time() - self.ttl_seconds
+            entries = [e for e in group.values() if e[3] >= cutoff] if group else []
+        if entries and norm > 0:
+            # Stored vectors are unit length, so inner product / |query| is the cosine
+            scores = self.codec.inner_products(
+                query / norm,
+                np.stack([e[0] for e in entries]),
+                np.asarray([e[1] for e in entries], dtype=np.float32)
+            )
+            best = int(np.argmax(scores))
+            if scores[best] >= self.similarity_threshold:
+                self.semantic_hits += 1
+                return entries[best][2], float(scores[best])
+        self.misses += 1
+        return None
+
+    def record_miss(self) -> None:
+        self.misses += 1
+
+    def _remember(self, key: str, interests_hash: str, codes: np.ndarray, scale: float,
+                  intent: Dict[str, Any], stored_at: float) -> None:
+        with self._lock:
+            group = self._groups.setdefault(interests_hash, OrderedDict())
+            if key in group:
+                group.pop(key)
+                self._size -= 1
+            group[key] = (codes, scale, intent, stored_at)
+            self._size += 1
+            while self._size > self.max_entries:
+                # Evict the oldest entry of the largest group
+                largest = max(self._groups.values(), key=len)
+                largest.popitem(last=False)
+                self._size -= 1
+
+    def put(self, key: str, interests_hash: str, query: str, intent: Dict[str, Any],
+            vector: Optional[Sequence[float]]) -> None:
+        """Blocking; run via asyncio.to_thread. Without a vector only the exact tier is filled."""
+        value: Dict[str, Any] = {"query": query, "intent": intent}
+        if vector is not None:
+            unit = np.asarray(vector, dtype=np.float32)
+            norm = float(np.linalg.norm(unit))
+            if norm > 0:
+                (codes, scale), _ = self.codec.encode_one(unit / norm)
+                value["vector"] = base64.b64encode(codes.tobytes()).decode("ascii")
+                value["scale"] = float(scale)
+                self._remember(key, interests_hash, codes, float(scale), intent, time.time())
+        self.store.set(key, value)
+
+    def warm(self) -> int:
+        """Blocking. Loads the newest stored query vectors into the semantic tier."""
+        loaded = 0
+        for key, value, age in reversed(self.store.recent(self.ttl_seconds, self.max_entries)):
+            if "vector" not in value:
+                continue
+            codes = np.frombuffer(base64.b64decode(value["vector"]), dtype=np.int8)
+            if len(codes) != self.codec.dim:
+                continue
+            interests_hash = key.split(":", 1)[0]
+            self._remember(key, interests_hash, codes, value["scale"], value["intent"], time.time() - age)
+            loaded += 1
+        return loaded
+
+    def purge(self) -> int:
+        return self.store.purge(self.ttl_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+            "semantic_entries": self._size,
+            "similarity_threshold": self.similarity_threshold,
+        }
@@ -0,0 +1,130 @@
+import os
+import json
+import time
+import asyncio
+from typing import List, Dict, Any, Optional, Sequence
+from app.core.models import Video
+from app.services.vector_index import VectorIndex
+
+class PantryIndex:
+    """
+    Local semantic index over videos stored in the S3 'Pantry'.
+    Lets /feed pull candidates for an intent vector in milliseconds instead of
+    spending YouTube search quota. Records are returned in the same dict shape
+    as `YouTubeClient.deep_search` so both sources can be merged directly.
+    """
+
+    def __init__(self, directory: str, dim: int, nprobe: int = 8, codec: str = "float32"):
+        self.dim = dim
+        self.nprobe = nprobe
+        self.codec = codec
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, "pantry_index.npz")
+        self.metadata_path = os.path.join(directory, "pantry_metadata.json")
+
+        self.index = VectorIndex(dim, nprobe=nprobe, codec=codec)
+        self.metadata: Dict[str, Dict[str, Any]] = {}
+        self.dirty = False
+        self.last_snapshot = 0.0
+        self._retrain_task: Optional[asyncio.Task] = None
+
+    def load(self) -> int:
+        """Restores the last snapshot, if any. Returns the number of indexed videos."""
+        if not (os.path.exists(self.index_path) and os.path.exists(self.metadata_path)):
+            return 0
+        try:
+            index = VectorIndex.load(self.index_path, self.dim, nprobe=self.nprobe, codec=self.codec)
+            with open(self.metadata_path) as f:
+                metadata = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Pantry index snapshot unreadable, starting empty: {e}")
+            return 0
+
+        self.index = index
+        self.metadata = {vid: meta for vid, meta in metadata.items() if vid in index}
+        return len(self.index)
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        """
+        Copy of index + metadata to hand to `persist` in a background thread,
+        or None if nothing changed since the last snapshot.
+        """
+        if not self.dirty:
+            return None
+        self.dirty = False
+        # Metadata values are replaced, never mutated, so a shallow copy is enough
+        return {"index": self.index.snapshot(), "metadata": dict(self.metadata)}
+
+    def persist(self, snapshot: Dict[str, Any]) -> None:
+        """Blocking write of a snapshot; run via asyncio.to_thread."""
+        self.index.persist(snapshot["index"], self.index_path)
+        tmp_path = f"{self.metadata_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot["metadata"], f)
+        os.replace(tmp_path, self.metadata_path)
+        self.last_snapshot = time.time()
+
+    def schedule_retrain(self) -> None:
+        """
+        Re-partitions the index in the background once it has doubled. k-means runs in a
+        worker thread on a copy of the vectors; only the centroid swap happens on the loop.
+        """
+        if self._retrain_task is None and self.index.needs_training:
+            self._retrain_task = asyncio.create_task(self._retrain())
+
+    async def _retrain(self) -> None:
+        try:
+            ids, data = self.index.training_data()
+            centroids, assignments = await asyncio.to_thread(VectorIndex.fit_centroids, data)
+            self.index.install_centroids(ids, centroids, assignments)
+            self.dirty = True
+        except Exception as e:
+            print(f"⚠️ Pantry index retraining failed: {e}")
+        finally:
+            self._retrain_task = None
+
+    def add_video(self, video: Video, vector: Sequence[float]) -> bool:
+        if not self.index.add(video.video_id, vector):
+            return False
+        self.metadata[video.video_id] = {
+            "video_id": video.video_id,
+            "title": video.title,
+            "description": video.description,
+            "channel_title": video.channel,
+            "tags": video.tags,
+            "views": video.raw_views,
+            "likes": video.like_count,
+            "published_at": video.published,
+        }
+        self.dirty = True
+        return True
+
+    def remove_video(self, video_id: str) -> bool:
+        self.metadata.pop(video_id, None)
+        if not self.index.remove(video_id):
+            return False
+        self.dirty = True
+        return True
+
+    def search(self, vector: Sequence[float], k: int = 50) -> List[Dict[str, Any]]:
+        results = []
+        for video_id, score in self.index.search(vector, k):
+            meta = self.metadata.get(video_id)
+            if meta:
+                results.append({**meta, "pantry_similarity": score})
+        return results
+
+    def __contains__(self, video_id: str) -> bool:
+        return video_id in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "videos": len(self.index),
+            "partitioned": self.index.is_trained,
+            "nprobe": self.nprobe,
+            "codec": self.codec,
+            "last_snapshot": self.last_snapshot,
+        }
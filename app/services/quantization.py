@@ -0,0 +1,160 @@
+"""
+Compressed embedding codecs for the embedding cache and the Pantry index.
+
+- Int8Codec: per-vector symmetric scalar quantization (~4x smaller than float32).
+- ProductQuantizer: m sub-spaces x 256 centroids, one byte per sub-space
+  (1024 dims / m=256 -> 16x, m=128 -> 32x). Needs training on real vectors.
+
+Both can score queries directly against the codes (the Pantry index does, for int8).
+The embedding cache only uses them to save memory: it decodes each hit back to float32.
+"""
+import os
+from typing import Any, Dict, Optional, Sequence, Tuple
+import numpy as np
+
+# Rows converted to float32 per step when scoring int8 codes (bounds temporary memory)
+_SCORE_CHUNK_ROWS = 4096
+
+class Int8Codec:
+    name = "int8"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def bytes_per_vector(self) -> int:
+        return self.dim + 4 # int8 codes + float32 scale
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        safe = np.where(scales > 0, scales, 1.0)
+        codes = np.clip(np.rint(vectors / safe[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def decode(self, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * np.asarray(scales, dtype=np.float32)[..., None]
+
+    def encode_one(self, vector: Sequence[float]) -> Tuple[Tuple[np.ndarray, np.float32], int]:
+        codes, scales = self.encode(vector)
+        return (codes[0], scales[0]), codes[0].nbytes + 4
+
+    def decode_one(self, payload: Tuple[np.ndarray, np.float32]) -> np.ndarray:
+        codes, scale = payload
+        return codes.astype(np.float32) * np.float32(scale)
+
+    def inner_products(self, query: Sequence[float], codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        """query . decode(codes) for every row, computed chunk-wise on the int8 codes."""
+        query = np.asarray(query, dtype=np.float32)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), _SCORE_CHUNK_ROWS):
+            chunk = codes[start:start + _SCORE_CHUNK_ROWS]
+            out[start:start + len(chunk)] = chunk.astype(np.float32) @ query
+        return out * scales
+
+class ProductQuantizer:
+    name = "pq"
+
+    def __init__(self, dim: int, m: int = 256, ks: int = 256):
+        if dim % m:
+            raise ValueError(f"dim {dim} is not divisible by m={m}")
+        self.dim = dim
+        self.m = m
+        self.ks = ks
+        self.dsub = dim // m
+        self.codebooks: Optional[np.ndarray] = None # (m, ks, dsub)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.codebooks is not None
+
+    def bytes_per_vector(self) -> int:
+        return self.m
+
+    def train(self, vectors: np.ndarray, iterations: int = 15, seed: int = 0) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) < self.ks:
+            raise ValueError(f"Need at least {self.ks} vectors to train PQ, got {len(vectors)}")
+        rng = np.random.default_rng(seed)
+        codebooks = np.empty((self.m, self.ks, self.dsub), dtype=np.float32)
+        for j in range(self.m):
+            sub = vectors[:, j * self.dsub:(j + 1) * self.dsub]
+            centroids = sub[rng.choice(len(sub), size=self.ks, replace=False)].copy()
+            for _ in range(iterations):
+                assign = self._nearest(sub, centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assign, sub)
+                counts = np.bincount(assign, minlength=self.ks)
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+            codebooks[j] = centroids
+        self.codebooks = codebooks
+
+    @staticmethod
+    def _nearest(sub: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # argmin ||x - c||^2 == argmax (x.c - ||c||^2 / 2)
+        return np.argmax(sub @ centroids.T - 0.5 * (centroids ** 2).sum(axis=1), axis=1)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            sub = vectors[:, j * self.dsub:(j + 1) * self.dsub]
+            codes[:, j] = self._nearest(sub, self.codebooks[j])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        codes = np.atleast_2d(codes)
+        # One gather over all sub-spaces: (n, m, dsub) -> (n, dim)
+        return self.codebooks[np.arange(self.m), codes].reshape(len(codes), self.dim)
+
+    def encode_one(self, vector: Sequence[float]) -> Tuple[np.ndarray, int]:
+        codes = self.encode(vector)[0]
+        return codes, codes.nbytes
+
+    def decode_one(self, payload: np.ndarray) -> np.ndarray:
+        return self.decode(payload)[0]
+
+    def inner_products(self, query: Sequence[float], codes: np.ndarray) -> np.ndarray:
+        """Asymmetric scoring: one (m, ks) lookup table per query, then m table reads per code."""
+        query = np.asarray(query, dtype=np.float32).reshape(self.m, 1, self.dsub)
+        table = (self.codebooks * query).sum(axis=2) # (m, ks)
+        return table[np.arange(self.m), codes].sum(axis=1)
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(path, codebooks=self.codebooks, ks=np.array(self.ks))
+
+    @classmethod
+    def load(cls, path: str) -> "ProductQuantizer":
+        with np.load(path) as data:
+            codebooks = data["codebooks"].astype(np.float32)
+            m, ks, dsub = codebooks.shape
+            pq = cls(m * dsub, m=m, ks=int(data["ks"]))
+        pq.codebooks = codebooks
+        return pq
+
+def make_codec(name: str, dim: int, pq_path: Optional[str] = None) -> Optional[Any]:
+    """
+    Builds the codec named by EMBEDDING_CACHE_CODEC ('float32' -> None).
+    'pq' needs a trained codebook (see benchmarks/bench_quantization.py --save) and
+    falls back to int8 when none is found.
+    """
+    name = (name or "float32").lower()
+    if name == "int8":
+        return Int8Codec(dim)
+    if name == "pq":
+        if pq_path and os.path.exists(pq_path):
+            pq = ProductQuantizer.load(pq_path)
+            if pq.dim == dim:
+                return pq
+        print(f"⚠️ No trained PQ codebook at {pq_path}; falling back to int8 embeddings.")
+        return Int8Codec(dim)
+    return None
+
+def codec_stats(codec: Optional[Any], dim: int) -> Dict[str, Any]:
+    bytes_per_vector = codec.bytes_per_vector() if codec else dim * 4
+    return {
+        "codec": codec.name if codec else "float32",
+        "bytes_per_vector": bytes_per_vector,
+        "compression": round(dim * 4 / bytes_per_vector, 2),
+    }
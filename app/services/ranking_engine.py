@@ -1,10 +1,24 @@
+import os
 import math
+import heapq
 import asyncio
-from typing import List, Dict, Any, Optional
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 from opensearchpy import OpenSearch, RequestsHttpConnection
 from app.core.models import Video, HyperbolicIntent
 from app.core.config import settings
-from app.services.bedrock_agent import BedrockAgent
+from app.core.single_flight import SingleFlight
+from app.services.bedrock_agent import BedrockAgent, EmbeddingError, EmbeddingResult
+from app.services.embedding_cache import EmbeddingCache
+from app.services.quantization import make_codec
+from app.services.embedding_store import EmbeddingStore
+from app.services.pantry_index import PantryIndex
+from app.services.lexical_ranker import LexicalRanker
+from app.services.feedback_store import FeedbackStore
+
+# Number of Stage-1 survivors that get Titan embeddings
+SEMANTIC_POOL_SIZE = 40
 
 class RankingEngine:
     def __init__(self, bedrock_agent: Optional[BedrockAgent] = None):
@@ -13,8 +27,40 @@ class RankingEngine:
         Combines Semantic Bedrock Embeddings with Metadata Signals.
         """
         self.bedrock = bedrock_agent or BedrockAgent()
-        self.embedding_cache = {} # In-memory cache for speed
-        self.video_cache: Dict[str, Video] = {}
+        self.embedding_cache = EmbeddingCache(
+            model_id=self.bedrock.EMBEDDING_MODEL_ID,
+            max_bytes=int(settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024),
+            ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+            codec=make_codec(settings.EMBEDDING_CACHE_CODEC, self.bedrock.EMBEDDING_DIMENSIONS, settings.EMBEDDING_PQ_CODEBOOK),
+            dim=self.bedrock.EMBEDDING_DIMENSIONS
+        )
+        self.embedding_flights = SingleFlight() # At most one Bedrock call per key in flight
+        self.embedding_store: Optional[EmbeddingStore] = None
+        if settings.EMBEDDING_STORE_ENABLED:
+            try:
+                self.embedding_store = EmbeddingStore(
+                    directory=os.path.join(settings.CACHE_DIR, "embeddings"),
+                    dim=self.bedrock.EMBEDDING_DIMENSIONS
+                )
+                print(f"💾 Embedding store loaded ({len(self.embedding_store)} vectors)")
+            except OSError as e:
+                print(f"⚠️ Embedding store unavailable, using memory cache only: {e}")
+
+        self.pantry_index: Optional[PantryIndex] = None
+        if settings.PANTRY_INDEX_ENABLED:
+            try:
+                self.pantry_index = PantryIndex(
+                    directory=os.path.join(settings.CACHE_DIR, "pantry"),
+                    dim=self.bedrock.EMBEDDING_DIMENSIONS,
+                    nprobe=settings.PANTRY_INDEX_NPROBE,
+                    codec=settings.PANTRY_INDEX_CODEC
+                )
+                print(f"🗂️ Pantry index loaded ({self.pantry_index.load()} videos)")
+            except OSError as e:
+                print(f"⚠️ Pantry index unavailable: {e}")
+        self.video_cache: "OrderedDict[str, Video]" = OrderedDict() # Recently served videos (bounded)
+        self._served_sub_cultures: Dict[str, str] = {}
+        self.lexical_ranker = LexicalRanker()
         
         self.os_client = None
         if settings.OPENSEARCH_URL and settings.OPENSEARCH_URL.strip() and not settings.DEMO_MODE:
@@ -30,96 +76,296 @@ class RankingEngine:
             except Exception as e:
                 print(f"⚠️ OpenSearch connection failed: {e}")
 
-    def incorporate_feedback(self, video_id: str, is_relevant: bool):
+        self.feedback_store = FeedbackStore(
+            dim=self.bedrock.EMBEDDING_DIMENSIONS,
+            path=os.path.join(settings.CACHE_DIR, "feedback", "preferences.npz"),
+            learning_rate=settings.FEEDBACK_LEARNING_RATE,
+            decay=settings.FEEDBACK_DECAY
+        )
+        self.feedback_store.load()
+
+    @staticmethod
+    def _content_text(video: Video) -> str:
+        return f"{video.title}. {video.description}"
+
+    def _remember_served(self, videos: List[Video], intent: Optional[HyperbolicIntent]) -> None:
+        """Tracks served videos (and the sub-culture they were served for) so feedback can be learned from."""
+        for video in videos:
+            self.video_cache[video.video_id] = video
+            self.video_cache.move_to_end(video.video_id)
+            if intent:
+                self._served_sub_cultures[video.video_id] = intent.sub_culture
+        while len(self.video_cache) > settings.VIDEO_CACHE_MAX:
+            evicted_id, _ = self.video_cache.popitem(last=False)
+            self._served_sub_cultures.pop(evicted_id, None)
+
+    async def incorporate_feedback(self, video_id: str, is_relevant: bool, context: Optional[List[str]] = None) -> bool:
         """
-        Updates the global demand matrix / vector weights based on user feedback.
+        Updates the sub-culture preference vector based on user feedback.
+        `context[0]`, when given, overrides the sub-culture the video was served for.
         """
-        if video_id in self.video_cache or video_id in self.embedding_cache:
-            print(f"🧠 Feedback Received: Video '{video_id}' is {'Relevant' if is_relevant else 'Not Relevant'}.")
-        else:
+        video = self.video_cache.get(video_id)
+        if video is None:
             print(f"⚠️ Feedback ignored: Video {video_id} not in cache.")
+            return False
 
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        if not vec1 or not vec2 or len(vec1) != len(vec2): return 0.0
-        dot_product = sum(a * b for a, b in zip(vec1, vec2))
-        magnitude1 = math.sqrt(sum(a * a for a in vec1))
-        magnitude2 = math.sqrt(sum(b * b for b in vec2))
-        if magnitude1 == 0 or magnitude2 == 0: return 0.0
-        return dot_product / (magnitude1 * magnitude2)
-
-    async def get_cached_embedding(self, text: str) -> List[float]:
-        """Returns embedding from cache or Bedrock."""
-        if text in self.embedding_cache:
-            return self.embedding_cache[text]
-        
-        vector = await self.bedrock.generate_embeddings(text)
-        self.embedding_cache[text] = vector
+        sub_culture = (context[0] if context else None) or self._served_sub_cultures.get(video_id)
+        vector = await self.get_cached_embedding(self._content_text(video))
+        updated = self.feedback_store.update(sub_culture, vector, is_relevant)
+        if updated:
+            print(f"🧠 Feedback Received: Video '{video_id}' is {'Relevant' if is_relevant else 'Not Relevant'} for '{sub_culture}'.")
+        else:
+            print(f"⚠️ Feedback ignored: no sub-culture or embedding for {video_id}.")
+        return updated
+
+    def _score_batch(self, intent_vector: Sequence[float], video_vectors: List[Sequence[float]],
+                     videos: List[Video]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized equivalent of the per-video scoring formula.
+        Stacks all candidate embeddings into one float32 matrix and returns
+        (hyperbolic_scores, base_scores) aligned with `videos`.
+        """
+        n = len(videos)
+        if n == 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+
+        # 1. Cosine similarity against the intent vector (0.0 for empty / mismatched / zero vectors)
+        similarities = np.zeros(n, dtype=np.float32)
+        dim = len(intent_vector) if intent_vector is not None else 0
+        if dim:
+            query = np.asarray(intent_vector, dtype=np.float32)
+            rows = [i for i, vec in enumerate(video_vectors) if vec is not None and len(vec) == dim]
+            if rows:
+                matrix = np.asarray([video_vectors[i] for i in rows], dtype=np.float32)
+                norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+                dots = matrix @ query
+                valid = norms > 0
+                sims = np.zeros(len(rows), dtype=np.float32)
+                sims[valid] = dots[valid] / norms[valid]
+                similarities[rows] = sims
+
+        # 2. Engagement bonus & view score
+        raw_views = np.array(
+            [v.raw_views if type(v.raw_views) != str else 0 for v in videos], dtype=np.float64
+        )
+        engagement = np.array([v.engagement_rate for v in videos], dtype=np.float64)
+        view_score = np.log10(np.maximum(10, raw_views)) * 2.0
+        engagement_bonus = engagement * 50.0
+
+        hyperbolic_scores = (similarities * 70.0) + engagement_bonus + view_score
+        hyperbolic_scores = np.clip(hyperbolic_scores, 0.0, 100.0)
+        base_scores = np.minimum(100.0, similarities.astype(np.float64) * 100)
+        return hyperbolic_scores, base_scores
+
+    async def get_cached_embedding(self, text: str) -> np.ndarray:
+        """
+        Returns embedding (float32) from the memory cache, the on-disk store, or Bedrock.
+        Store hits are zero-copy views into the memory-mapped file.
+        Concurrent misses for the same text share a single Bedrock call.
+        """
+        vector = self.embedding_cache.get(text)
+        if vector is not None:
+            return vector
+
+        key = self.embedding_cache.make_key(text)
+        return await self.embedding_flights.do(key, lambda: self._load_embedding(text, key))
+
+    async def _load_embedding(self, text: str, key: str) -> np.ndarray:
+        if self.embedding_store is not None:
+            vector = await asyncio.to_thread(self.embedding_store.get, key)
+            if vector is not None:
+                return self.embedding_cache.put(text, vector)
+
+        vector = np.asarray(await self.bedrock.generate_embeddings(text), dtype=np.float32)
+        # Never cache the zero-vector fallback returned on Bedrock errors / DEMO_MODE
+        if not vector.any():
+            return vector
+        self.embedding_cache.put(text, vector)
+        if self.embedding_store is not None:
+            await asyncio.to_thread(self.embedding_store.put, key, vector)
         return vector
 
-    async def rank_videos(self, videos: List[Video], intent: HyperbolicIntent) -> List[Video]:
+    async def get_cached_embeddings(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Batch variant of `get_cached_embedding` for the semantic stage.
+        Misses not already in flight are embedded with one bounded-concurrency
+        Bedrock batch; failed items come back as None instead of zero vectors.
+        """
+        vectors: Dict[str, Optional[np.ndarray]] = {}
+        misses: Dict[str, str] = {} # key -> text
+        for text in texts:
+            if text in vectors:
+                continue
+            vectors[text] = self.embedding_cache.get(text)
+            if vectors[text] is None:
+                misses[self.embedding_cache.make_key(text)] = text
+
+        if misses:
+            new_keys = [k for k in misses if k not in self.embedding_flights]
+            batch = None
+            if new_keys:
+                batch = asyncio.ensure_future(self._load_embeddings_batch({k: misses[k] for k in new_keys}))
+
+            async def from_batch(key: str) -> np.ndarray:
+                # A flight that was running when new_keys was built may have finished since,
+                # leaving this key outside the batch: load it on its own
+                result = (await batch).get(key) if batch is not None else None
+                if result is None:
+                    text = misses[key]
+                    vector = self.embedding_cache.get(text)
+                    return vector if vector is not None else await self._load_embedding(text, key)
+                if not result.ok:
+                    raise EmbeddingError(result.error)
+                return result.vector
+
+            results = await asyncio.gather(
+                *(self.embedding_flights.do(k, lambda k=k: from_batch(k)) for k in misses),
+                return_exceptions=True
+            )
+            for key, result in zip(misses, results):
+                vectors[misses[key]] = None if isinstance(result, BaseException) else result
+
+        return [vectors[text] for text in texts]
+
+    async def _load_embeddings_batch(self, texts_by_key: Dict[str, str]) -> Dict[str, EmbeddingResult]:
+        results: Dict[str, EmbeddingResult] = {}
+        pending: Dict[str, str] = {}
+        stored_vectors: Dict[str, Optional[np.ndarray]] = {}
+        if self.embedding_store is not None:
+            stored_vectors = await asyncio.to_thread(self.embedding_store.get_many, list(texts_by_key))
+        for key, text in texts_by_key.items():
+            stored = stored_vectors.get(key)
+            if stored is not None:
+                results[key] = EmbeddingResult(text=text, vector=self.embedding_cache.put(text, stored))
+            else:
+                pending[key] = text
+
+        if pending:
+            batch = await self.bedrock.generate_embeddings_batch(list(pending.values()))
+            to_store = []
+            for key, result in zip(pending, batch):
+                if result.ok:
+                    vector = np.asarray(result.vector, dtype=np.float32)
+                    if vector.any():
+                        self.embedding_cache.put(result.text, vector)
+                        to_store.append((key, vector))
+                    result = EmbeddingResult(text=result.text, vector=vector)
+                results[key] = result
+            if to_store and self.embedding_store is not None:
+                await asyncio.to_thread(self.embedding_store.put_many, to_store)
+        return results
+
+    def compact_embedding_store(self) -> bool:
+        """Drops superseded and expired rows from the on-disk embedding store."""
+        if self.embedding_store is None:
+            return False
+        return self.embedding_store.compact(
+            max_age_seconds=settings.EMBEDDING_STORE_MAX_AGE_DAYS * 86400
+        )
+
+    @staticmethod
+    def intent_text(intent: Optional[HyperbolicIntent]) -> str:
+        if not intent:
+            return ""
+        return f"{intent.sub_culture} {intent.vibe} {' '.join(intent.boost_keywords)}"
+
+    async def index_video(self, video: Video) -> bool:
+        """Adds a Pantry video to the local semantic index (embedding comes from the cache/store)."""
+        if self.pantry_index is None:
+            return False
+        vector = await self.get_cached_embedding(self._content_text(video))
+        if not self.pantry_index.add_video(video, vector):
+            return False
+        self.pantry_index.schedule_retrain()
+        return True
+
+    async def search_pantry(self, intent: HyperbolicIntent, k: int) -> List[Dict[str, Any]]:
+        """
+        Semantic candidates for the intent from the local Pantry index.
+        Returns dicts in the `YouTubeClient.deep_search` format.
+        """
+        if self.pantry_index is None or len(self.pantry_index) == 0:
+            return []
+        intent_vector = await self.get_cached_embedding(self.intent_text(intent))
+        return self.pantry_index.search(intent_vector, k)
+
+    async def backfill_pantry_index(self, storage) -> int:
+        """Indexes Pantry videos stored before the index existed. Returns the number added."""
+        if self.pantry_index is None:
+            return 0
+        added = 0
+        for data in await asyncio.to_thread(lambda: list(storage.iter_video_data())):
+            if data.get("video_id") in self.pantry_index:
+                continue
+            try:
+                if await self.index_video(Video(**data)):
+                    added += 1
+            except Exception as e:
+                print(f"⚠️ Pantry backfill skipped {data.get('video_id')}: {e}")
+        return added
+
+    async def rank_videos(self, videos: List[Video], intent: HyperbolicIntent, k: Optional[int] = None) -> List[Video]:
         """
         Two-stage ranking for speed:
-        1. Metadata-driven pre-sort (Top 40)
+        1. Lexical (BM25) + metadata pre-sort (Top 40)
         2. Semantic Titan Embeddings for those 40.
+        With `k`, only the top-k are selected (heap-based), written back and returned;
+        without it, every video is returned and the rest get a zero score. Either way
+        Stage 1 still scores every video, so `k` trims selection and write-back only:
+        at large n the O(n) lexical pass dominates (see benchmarks/bench_rank_topk.py).
         """
         if not videos:
             return []
+        k = len(videos) if k is None else max(0, min(k, len(videos)))
 
-        # -- Stage 1: Metadata Pre-Sort (Heuristic) --
-        # Sort by view velocity + engagement to find the "best" candidates to rank semantically
+        # -- Stage 1: Lexical + Metadata Pre-Sort (Heuristic) --
+        # BM25 relevance to the intent lets on-topic low-view videos reach the semantic stage;
+        # view velocity + engagement still orders everything without keyword overlap
         def heuristic_score(v):
             v_count = getattr(v, 'raw_views', 0)
             if type(v_count) == str: v_count = 0
             e_rate = getattr(v, 'engagement_rate', 0.0)
             return math.log10(max(10, v_count)) + (e_rate * 10)
 
-        videos.sort(key=heuristic_score, reverse=True)
-        candidates = videos[:40] # Rank top 40 semantically
-        other_videos = videos[40:]
+        lexical_scores = self.lexical_ranker.score_videos(videos, intent)
+        stage1_scores = {
+            id(v): heuristic_score(v) + settings.LEXICAL_PRERANK_WEIGHT * lexical
+            for v, lexical in zip(videos, lexical_scores)
+        }
+        # Partial selection: only the semantic pool plus any top-k fillers are ordered
+        pool = heapq.nlargest(max(SEMANTIC_POOL_SIZE, k), videos, key=lambda v: stage1_scores[id(v)])
+        candidates = pool[:SEMANTIC_POOL_SIZE] # Rank top 40 semantically
+        other_videos = pool[SEMANTIC_POOL_SIZE:]
 
         # -- Stage 2: Semantic Ranking --
-        processed_results = []
-        
-        # 1. Generate Intent Embedding
-        intent_text = ""
-        if intent:
-            intent_text = f"{intent.sub_culture} {intent.vibe} {' '.join(intent.boost_keywords)}"
+        processed_results: List[Video] = []
         
-        intent_vector = await self.get_cached_embedding(intent_text)
+        # 1. Generate Intent Embedding, nudged toward learned feedback for this sub-culture
+        intent_vector = await self.get_cached_embedding(self.intent_text(intent))
+        intent_vector = self.feedback_store.apply(
+            intent_vector, intent.sub_culture if intent else None, settings.FEEDBACK_STRENGTH
+        )
         
-        async def process_single_video(video):
-            content_text = f"{video.title}. {video.description}"
-            video_vector = await self.get_cached_embedding(content_text)
-            
-            # 3. Calculate k-NN Cosine Similarity
-            similarity = self._cosine_similarity(intent_vector, video_vector)
-            
-            # 4. Regional & Engagement Bonus
-            raw_views = getattr(video, 'raw_views', 0)
-            if type(raw_views) == str: raw_views = 0 
-            
-            engagement = getattr(video, 'engagement_rate', 0.0)
-            engagement_bonus = engagement * 50.0 
-            
-            view_score = math.log10(max(10, raw_views)) * 2.0
-            hyperbolic_score = (similarity * 70.0) + (engagement_bonus) + (view_score)
-            
-            video.hyperbolic_score = min(100.0, max(0.0, hyperbolic_score))
-            video.base_score = min(100.0, similarity * 100)
-            video.match_reason = "Semantic Match (Top 40)"
-            return video
-
-        # Parallelize the 40 candidates
+        # Embeddings are fetched as one bounded batch; scoring happens in one vectorized pass
         print(f"🚀 Parallelizing semantic ranking for {len(candidates)} candidates...")
-        batch_results = await asyncio.gather(*(process_single_video(v) for v in candidates))
-        processed_results.extend(batch_results)
+        video_vectors = await self.get_cached_embeddings([self._content_text(v) for v in candidates])
+        hyperbolic_scores, base_scores = self._score_batch(intent_vector, video_vectors, candidates)
+
+        # Stable descending order; only the winners are written back to their Video objects
+        order = np.argsort(-hyperbolic_scores, kind="stable")[:k]
+        for i in order.tolist():
+            video = candidates[i]
+            video.hyperbolic_score = float(hyperbolic_scores[i])
+            video.base_score = float(base_scores[i])
+            video.match_reason = "Semantic Match (Top 40)" if video_vectors[i] is not None else "Metadata Match (Embedding Unavailable)"
+            processed_results.append(video)
         
         # Assign low scores to the rest instead of dropping them
-        for v in other_videos:
+        for v in other_videos[:k - len(processed_results)]:
             v.hyperbolic_score = 0.0
             v.base_score = 0.0
             v.match_reason = "Metadata Match (Lower Signal)"
             processed_results.append(v)
             
-        processed_results.sort(key=lambda x: x.hyperbolic_score, reverse=True)
+        self._remember_served(processed_results, intent)
         return processed_results
@@ -0,0 +1,104 @@
+import asyncio
+import sqlite3
+from typing import Any, Awaitable, Callable, Dict, List, Set
+from app.core.kv_cache import KVCache
+from app.core.single_flight import SingleFlight
+
+# search().list cost per call in YouTube Data API quota units
+SEARCH_QUOTA_UNITS = 100
+
+class SearchCache:
+    """
+    Persistent cache of YouTube search results (video id lists).
+    - Keyed by the normalized (query, maxResults, order, relevanceLanguage).
+    - Fresh for `ttl_seconds`; for a further `stale_seconds` the cached ids are served
+      immediately while one background refresh revalidates them (stale-while-revalidate).
+    - Misses and refreshes for the same key are coalesced, so concurrent /feed calls
+      spend the 100 quota units once.
+    - Failed searches are never cached. A failing SQLite store degrades to a miss on
+      read and a skipped write, never to a failed search.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, stale_seconds: float = 0):
+        self.store = KVCache(path, namespace="youtube_search")
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.flights = SingleFlight()
+        self._refreshes: Set["asyncio.Task[Any]"] = set()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+        self.store_errors = 0
+
+    @staticmethod
+    def make_key(query: str, max_results: int, order: str, language: str) -> str:
+        normalized = " ".join(query.lower().split())
+        return f"{normalized}|{max_results}|{order}|{language}"
+
+    async def _fetch_and_store(self, key: str, fetch: Callable[[], Awaitable[List[str]]]) -> List[str]:
+        video_ids = await fetch()
+        try:
+            await asyncio.to_thread(self.store.set, key, video_ids)
+        except sqlite3.Error as e:
+            self.store_errors += 1
+            print(f"⚠️ Search cache write failed ({key}): {e}")
+        return video_ids
+
+    def _refresh_in_background(self, key: str, fetch: Callable[[], Awaitable[List[str]]]) -> None:
+        if key in self.flights:
+            return
+
+        async def refresh():
+            try:
+                await self.flights.do(key, lambda: self._fetch_and_store(key, fetch))
+            except Exception as e:
+                self.refresh_errors += 1
+                print(f"⚠️ Search cache refresh failed ({key}): {e}")
+
+        task = asyncio.create_task(refresh())
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[List[str]]]) -> List[str]:
+        """
+        Returns cached ids when fresh (or stale but within the revalidation window),
+        otherwise awaits `fetch`. `fetch` should raise on failure so errors aren't cached.
+        """
+        try:
+            cached = await asyncio.to_thread(self.store.get, key)
+        except sqlite3.Error as e:
+            self.store_errors += 1
+            print(f"⚠️ Search cache read failed ({key}): {e}")
+            cached = None
+        if cached is not None:
+            video_ids, age = cached
+            if age <= self.ttl_seconds:
+                self.hits += 1
+                return video_ids
+            if age <= self.ttl_seconds + self.stale_seconds:
+                self.stale_hits += 1
+                self._refresh_in_background(key, fetch)
+                return video_ids
+
+        self.misses += 1
+        return await self.flights.do(key, lambda: self._fetch_and_store(key, fetch))
+
+    def purge(self) -> int:
+        """Drops entries past the stale window (blocking; run via asyncio.to_thread)."""
+        return self.store.purge(self.ttl_seconds + self.stale_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            "refreshing": len(self._refreshes),
+            "refresh_errors": self.refresh_errors,
+            "store_errors": self.store_errors,
+            "coalesced": self.flights.coalesced,
+            "quota_units_saved": (self.hits + self.flights.coalesced) * SEARCH_QUOTA_UNITS, # stale hits still refresh
+        }
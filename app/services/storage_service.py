@@ -1,15 +1,18 @@
 import boto3
 import json
 import logging
+import datetime
+from typing import Iterator
 from botocore.exceptions import ClientError
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 class StorageService:
-    def __init__(self):
+    def __init__(self, pantry_index=None):
         self.s3_client = None
         self.bucket_name = settings.S3_BUCKET_NAME
+        self.pantry_index = pantry_index # Optional PantryIndex kept in sync with soft-deletes
         
         if settings.AWS_ACCESS_KEY_ID and settings.AWS_SECRET_ACCESS_KEY:
             try:
@@ -59,7 +62,6 @@ class StorageService:
             key = f"videos/{video_id}.json"
             
             # Add timestamp for "Internet Archaeology"
-            import datetime
             video_data['_ingested_at'] = datetime.datetime.utcnow().isoformat()
             
             # Convert to JSON
@@ -97,7 +99,13 @@ class StorageService:
             data['_last_updated'] = datetime.datetime.utcnow().isoformat()
             
             # 3. Save back
-            return self.upload_video_data(data)
+            if not self.upload_video_data(data):
+                return False
+
+            # 4. Drop from the local semantic index so /feed stops serving it
+            if self.pantry_index is not None:
+                self.pantry_index.remove_video(video_id)
+            return True
             
         except Exception as e:
             logger.error(f"Failed to soft-delete {video_id}: {e}")
@@ -118,3 +126,19 @@ class StorageService:
         except Exception as e:
             logger.error(f"Failed to read from S3: {e}")
             return None
+
+    def iter_video_data(self) -> Iterator[dict]:
+        """
+        Yields every non-deleted video record in the S3 'Pantry'.
+        Used to (re)build the local semantic index.
+        """
+        if not self.s3_client:
+            return
+
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix="videos/"):
+            for obj in page.get('Contents', []):
+                video_id = obj['Key'][len("videos/"):-len(".json")]
+                data = self.get_video_data(video_id)
+                if data and data.get('status') != 'deleted':
+                    yield data
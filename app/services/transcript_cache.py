@@ -0,0 +1,57 @@
+from typing import Any, Dict, Optional, Tuple
+from app.core.kv_cache import KVCache
+
+class TranscriptCache:
+    """
+    Persistent transcript cache keyed by (video_id, language).
+    Also remembers "no captions available" with a shorter TTL, so videos without
+    captions skip YouTubeTranscriptApi on every request. Callers only store a
+    negative after a definitive answer, never after a network error.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, negative_ttl_seconds: float):
+        self.store = KVCache(path, namespace="transcripts")
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(video_id: str, language: str) -> str:
+        return f"{video_id}:{language}"
+
+    def get(self, video_id: str, language: str) -> Tuple[bool, Optional[str]]:
+        """
+        Blocking; run via asyncio.to_thread.
+        Returns (found, text). found with text None means "known to have no captions".
+        """
+        cached = self.store.get(self.make_key(video_id, language))
+        if cached is not None:
+            value, age = cached
+            text = value.get("text")
+            if text is not None and age <= self.ttl_seconds:
+                self.hits += 1
+                return True, text
+            if text is None and age <= self.negative_ttl_seconds:
+                self.negative_hits += 1
+                return True, None
+        self.misses += 1
+        return False, None
+
+    def put(self, video_id: str, language: str, text: Optional[str], source: str = "captions") -> None:
+        """Blocking; run via asyncio.to_thread. text=None records a negative."""
+        self.store.set(self.make_key(video_id, language), {"text": text, "source": source})
+
+    def purge(self) -> int:
+        return self.store.purge(max(self.ttl_seconds, self.negative_ttl_seconds))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+        }
@@ -1,14 +1,31 @@
 import aiohttp
 import asyncio
 import base64
+import hashlib
 import os
 import boto3
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+from botocore.exceptions import ClientError
 from app.core.config import settings
+from app.core.replay import replay
+
+# REPLAY_FAULTS names -> (HTTP status, body) Sarvam would answer with
+SARVAM_REPLAY_FAULTS = {
+    "throttling": (429, "Rate limit exceeded (replay)"),
+    "quotaExceeded": (403, "Quota exceeded (replay)"),
+    "unavailable": (503, "Service unavailable (replay)"),
+}
+
+def _sarvam_fault(fault: str) -> Tuple[int, Any]:
+    return SARVAM_REPLAY_FAULTS.get(fault, (500, f"Injected {fault} (replay)"))
+
+def _polly_fault(fault: str):
+    code = {"throttling": "ThrottlingException", "unavailable": "ServiceFailureException"}.get(fault, fault)
+    raise ClientError({"Error": {"Code": code, "Message": f"Injected {fault} (replay)"}}, "SynthesizeSpeech")
 
 class TranslationEngine:
     def __init__(self):
-        self.sarvam_key = settings.SARVAM_API_KEY
+        self.sarvam_key = settings.SARVAM_API_KEY or ("replay" if replay.replaying else "")
         self.bhashini_key = settings.BHASHINI_API_KEY
         
         # [NEW] Custom Endpoint Support for Enterprise/Proxy users
@@ -78,12 +95,28 @@ class TranslationEngine:
                     return base64.b64encode(response["AudioStream"].read()).decode("utf-8")
                 return ""
 
-            audio_base64 = await asyncio.to_thread(synthesize)
+            request = {"engine": engine, "language": target_lang_code, "voice": voice_id, "text": text}
+            audio_base64 = await replay.call("polly", request, lambda: asyncio.to_thread(synthesize), on_fault=_polly_fault)
             return audio_base64
         except Exception as e:
             print(f"⚠️ [Polly] Synthesis Failed: {str(e)}")
             return ""
 
+    async def _post_sarvam(self, url: str, request: Dict[str, Any], **kwargs) -> Tuple[int, Any]:
+        """
+        POSTs to a Sarvam endpoint and returns (status, JSON body or error text).
+        `request` identifies the call for the record/replay layer (no secrets, no file bytes).
+        """
+        async def post():
+            async with aiohttp.ClientSession() as session:
+                async with session.post(url, **kwargs) as resp:
+                    if resp.status != 200:
+                        return resp.status, await resp.text()
+                    return resp.status, await resp.json()
+
+        status, body = await replay.call("sarvam", {"url": url, **request}, post, on_fault=_sarvam_fault)
+        return status, body
+
     async def _translate_sarvam(self, text: str, target_lang: str) -> Dict[str, Any]:
         headers = {
             "API-Subscription-Key": self.sarvam_key,
@@ -111,26 +144,23 @@ class TranslationEngine:
         print(f"🌐 [Translation] Requesting Sarvam AI: {text[:30]}... ({source_lang} -> {target_lang_code})")
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.sarvam_url, json=payload, headers=headers) as resp:
-                    if resp.status != 200:
-                        error_text = await resp.text()
-                        print(f"❌ [Translation] API Error: {error_text}")
-                        return {"error": f"Sarvam Translation API error: {resp.status} - {error_text}"}
-                    
-                    translation_data = await resp.json()
-                    translated_text = translation_data.get("translated_text", "")
-                    print(f"✅ [Translation] Success: {translated_text[:30]}...")
-
-                # Use Amazon Polly for TTS instead of Sarvam
-                audio_base64 = await self._generate_polly_audio(translated_text, target_lang_code)
-                
-                return {
-                    "original_text": text,
-                    "translated_text": translated_text,
-                    "audio_base64": audio_base64,
-                    "provider": "Sarvam AI (Translate) + Amazon Polly (TTS)"
-                }
+            status, body = await self._post_sarvam(self.sarvam_url, payload, json=payload, headers=headers)
+            if status != 200:
+                print(f"❌ [Translation] API Error: {body}")
+                return {"error": f"Sarvam Translation API error: {status} - {body}"}
+
+            translated_text = body.get("translated_text", "")
+            print(f"✅ [Translation] Success: {translated_text[:30]}...")
+
+            # Use Amazon Polly for TTS instead of Sarvam
+            audio_base64 = await self._generate_polly_audio(translated_text, target_lang_code)
+            
+            return {
+                "original_text": text,
+                "translated_text": translated_text,
+                "audio_base64": audio_base64,
+                "provider": "Sarvam AI (Translate) + Amazon Polly (TTS)"
+            }
         except Exception as e:
             print(f"❌ [Translation] Internal Failure: {str(e)}")
             return {"error": f"Internal translation failure: {str(e)}"}
@@ -149,33 +179,33 @@ class TranslationEngine:
         print(f"🌐 [Audio Translation] Sending to Sarvam STTT: {audio_path}")
         
         try:
+            with open(audio_path, 'rb') as f:
+                audio_bytes = f.read()
             data = aiohttp.FormData()
             data.add_field('file', 
-                           open(audio_path, 'rb'), 
+                           audio_bytes, 
                            filename=os.path.basename(audio_path),
                            content_type='audio/wav')
             data.add_field('model', 'saaras:v2.5')
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.sarvam_sttt_url, data=data, headers=headers) as resp:
-                    if resp.status != 200:
-                        error_text = await resp.text()
-                        print(f"❌ [Audio Translation] API Error: {error_text}")
-                        return {"error": f"Sarvam STTT API error: {resp.status} - {error_text}"}
-                    
-                    result = await resp.json()
-                    transcript = result.get("transcript", "")
-                    print(f"✅ [Audio Translation] Success: {transcript[:50]}...")
-                    
-                    # Generate Polly Audio for the transcript
-                    audio_base64 = await self._generate_polly_audio(transcript, "en-IN")
-                    
-                    return {
-                        "original_text": "Audio Content",
-                        "translated_text": transcript,
-                        "audio_base64": audio_base64, 
-                        "provider": "Sarvam AI STTT + Amazon Polly (TTS)"
-                    }
+            request = {"audio_sha256": hashlib.sha256(audio_bytes).hexdigest(), "model": "saaras:v2.5"}
+            status, result = await self._post_sarvam(self.sarvam_sttt_url, request, data=data, headers=headers)
+            if status != 200:
+                print(f"❌ [Audio Translation] API Error: {result}")
+                return {"error": f"Sarvam STTT API error: {status} - {result}"}
+
+            transcript = result.get("transcript", "")
+            print(f"✅ [Audio Translation] Success: {transcript[:50]}...")
+            
+            # Generate Polly Audio for the transcript
+            audio_base64 = await self._generate_polly_audio(transcript, "en-IN")
+            
+            return {
+                "original_text": "Audio Content",
+                "translated_text": transcript,
+                "audio_base64": audio_base64, 
+                "provider": "Sarvam AI STTT + Amazon Polly (TTS)"
+            }
         except Exception as e:
             print(f"❌ [Audio Translation] Internal Failure: {str(e)}")
             return {"error": f"Internal audio translation failure: {str(e)}"}
@@ -0,0 +1,273 @@
+"""
+In-process approximate nearest-neighbour index (IVF-Flat, cosine similarity).
+Small indexes are searched exhaustively; once `train_threshold` vectors exist the
+space is partitioned with spherical k-means and only the `nprobe` closest lists
+are scanned per query.
+
+With codec="int8" vectors are held as per-vector scaled int8 codes (~4x smaller)
+and query similarity is computed on the codes directly.
+"""
+import os
+import json
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from app.services.quantization import Int8Codec
+
+class VectorIndex:
+    def __init__(self, dim: int, nprobe: int = 8, train_threshold: int = 2048, codec: str = "float32"):
+        if codec not in ("float32", "int8"):
+            raise ValueError(f"Unsupported index codec: {codec}")
+        self.dim = dim
+        self.nprobe = nprobe
+        self.train_threshold = train_threshold
+        self.codec = codec
+        self._int8 = Int8Codec(dim) if codec == "int8" else None
+        self._dtype = np.int8 if self._int8 else np.float32
+
+        self._ids: List[str] = []
+        self._slots: Dict[str, int] = {}
+        self._vectors = np.zeros((0, dim), dtype=self._dtype)
+        self._scales = np.zeros(0, dtype=np.float32) # int8 only
+        self._alive = np.zeros(0, dtype=bool)
+        self._count = 0
+
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._trained_at = 0
+        self._added_during_fit: Optional[Set[str]] = None
+
+    # ── Mutation ─────────────────────────────────────────────────────
+
+    def _grow(self) -> None:
+        capacity = max(64, len(self._vectors) * 2)
+        vectors = np.zeros((capacity, self.dim), dtype=self._dtype)
+        vectors[:self._count] = self._vectors[:self._count]
+        scales = np.zeros(capacity, dtype=np.float32)
+        scales[:self._count] = self._scales[:self._count]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._count] = self._alive[:self._count]
+        assignments = np.full(capacity, -1, dtype=np.int32)
+        assignments[:self._count] = self._assignments[:self._count]
+        self._vectors, self._scales, self._alive, self._assignments = vectors, scales, alive, assignments
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _decoded(self, rows: slice) -> np.ndarray:
+        if self._int8:
+            return self._int8.decode(self._vectors[rows], self._scales[rows])
+        return self._vectors[rows]
+
+    def _scores(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        if self._int8:
+            return self._int8.inner_products(query, self._vectors[rows], self._scales[rows])
+        return self._vectors[rows] @ query
+
+    def add(self, item_id: str, vector: Sequence[float]) -> bool:
+        array = np.asarray(vector, dtype=np.float32)
+        if array.shape != (self.dim,) or not array.any():
+            return False
+
+        if item_id in self._slots:
+            self.remove(item_id)
+        if self._count == len(self._vectors):
+            self._grow()
+
+        slot = self._count
+        normalized = self._normalize(array)
+        if self._int8:
+            codes, scales = self._int8.encode(normalized)
+            self._vectors[slot], self._scales[slot] = codes[0], scales[0]
+        else:
+            self._vectors[slot] = normalized
+        self._alive[slot] = True
+        self._assignments[slot] = self._nearest_centroid(normalized) if self._centroids is not None else -1
+        self._ids.append(item_id)
+        self._slots[item_id] = slot
+        self._count += 1
+        if self._added_during_fit is not None:
+            self._added_during_fit.add(item_id)
+        return True
+
+    def remove(self, item_id: str) -> bool:
+        slot = self._slots.pop(item_id, None)
+        if slot is None:
+            return False
+        self._alive[slot] = False
+        return True
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._slots
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    # ── Partitioning ─────────────────────────────────────────────────
+
+    def _nearest_centroid(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self._centroids.T, axis=-1).astype(np.int32)
+
+    @property
+    def needs_training(self) -> bool:
+        """True once the index has doubled since the last partitioning (keeps lists balanced)."""
+        live = len(self._slots)
+        return live >= self.train_threshold and live >= 2 * self._trained_at
+
+    def training_data(self) -> Tuple[List[str], np.ndarray]:
+        """
+        Live ids and their unit vectors, for `fit_centroids` in a worker thread.
+        Compaction leaves fresh arrays that later mutations replace rather than write into.
+        """
+        self._compact()
+        self._added_during_fit = set()
+        return list(self._ids), self._decoded(slice(0, self._count))
+
+    @classmethod
+    def fit_centroids(cls, data: np.ndarray, iterations: int = 10, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """Spherical k-means. Pure function of `data`; returns (centroids, assignments)."""
+        n = len(data)
+        nlist = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        centroids = data[rng.choice(n, size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(data @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = data[assignments == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids = cls._normalize(centroids)
+        return centroids, np.argmax(data @ centroids.T, axis=1).astype(np.int32)
+
+    def install_centroids(self, ids: List[str], centroids: np.ndarray, assignments: np.ndarray) -> None:
+        """
+        Swaps in centroids fitted on `training_data()`. Vectors added (or re-added)
+        since then are assigned here.
+        """
+        self._compact()
+        fitted = dict(zip(ids, assignments.tolist()))
+        changed = self._added_during_fit or set()
+        self._added_during_fit = None
+        self._centroids = centroids
+        # New array rather than in-place writes: a concurrent snapshot may still hold the old one
+        updated = np.full(len(self._vectors), -1, dtype=np.int32)
+        stale = []
+        for slot, item_id in enumerate(self._ids):
+            if item_id in fitted and item_id not in changed:
+                updated[slot] = fitted[item_id]
+            else:
+                stale.append(slot)
+        if stale:
+            updated[stale] = self._nearest_centroid(self._decoded(np.array(stale)))
+        self._assignments = updated
+        self._trained_at = len(ids)
+
+    def train(self, iterations: int = 10, seed: int = 0) -> None:
+        """Blocking spherical k-means over live vectors; compacts tombstoned slots as a side effect."""
+        ids, data = self.training_data()
+        if len(ids) < self.train_threshold:
+            self._added_during_fit = None
+            self._centroids = None
+            self._assignments = np.full(len(self._vectors), -1, dtype=np.int32)
+            return
+        self.install_centroids(ids, *self.fit_centroids(data, iterations, seed))
+
+    def _compact(self) -> None:
+        keep = np.flatnonzero(self._alive[:self._count])
+        self._ids = [self._ids[i] for i in keep]
+        self._vectors = self._vectors[keep].copy()
+        self._scales = self._scales[keep].copy()
+        self._alive = np.ones(len(keep), dtype=bool)
+        self._assignments = self._assignments[keep].copy()
+        self._slots = {item_id: i for i, item_id in enumerate(self._ids)}
+        self._count = len(keep)
+
+    # ── Query ────────────────────────────────────────────────────────
+
+    def search(self, query: Sequence[float], k: int = 10) -> List[Tuple[str, float]]:
+        array = np.asarray(query, dtype=np.float32)
+        if array.shape != (self.dim,) or not array.any() or not self._slots:
+            return []
+        array = self._normalize(array)
+
+        if self._centroids is not None:
+            probes = np.argsort(-(self._centroids @ array))[:self.nprobe]
+            mask = np.isin(self._assignments[:self._count], probes) & self._alive[:self._count]
+        else:
+            mask = self._alive[:self._count]
+        candidates = np.flatnonzero(mask)
+        if len(candidates) == 0:
+            return []
+
+        scores = self._scores(candidates, array)
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._ids[candidates[i]], float(scores[i])) for i in top]
+
+    # ── Persistence ──────────────────────────────────────────────────
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Compacted state safe to hand to a background thread: compaction copies every array,
+        and later adds/trains replace them instead of writing into them.
+        """
+        self._compact()
+        return {
+            "vectors": self._vectors,
+            "scales": self._scales,
+            "assignments": self._assignments,
+            "centroids": self._centroids,
+            "ids": list(self._ids),
+            "trained_at": self._trained_at,
+        }
+
+    def persist(self, snapshot: Dict[str, Any], path: str) -> None:
+        """Blocking atomic write of a snapshot (temp file, then rename); run via asyncio.to_thread."""
+        tmp_path = f"{path}.tmp.npz"
+        centroids = snapshot["centroids"]
+        np.savez(
+            tmp_path,
+            vectors=snapshot["vectors"],
+            scales=snapshot["scales"],
+            codec=np.array(self.codec),
+            assignments=snapshot["assignments"],
+            centroids=centroids if centroids is not None else np.zeros((0, self.dim), dtype=np.float32),
+            ids=np.array(json.dumps(snapshot["ids"])),
+            trained_at=np.array(snapshot["trained_at"]),
+        )
+        os.replace(tmp_path, path)
+
+    def save(self, path: str) -> None:
+        """Blocking snapshot + write in one step."""
+        self.persist(self.snapshot(), path)
+
+    @classmethod
+    def load(cls, path: str, dim: int, **kwargs) -> "VectorIndex":
+        index = cls(dim, **kwargs)
+        with np.load(path) as data:
+            vectors = data["vectors"]
+            if vectors.shape[1:] != (dim,):
+                raise ValueError(f"Index snapshot has dim {vectors.shape[1:]}, expected {dim}")
+            scales = data["scales"].astype(np.float32) if "scales" in data else np.zeros(len(vectors), dtype=np.float32)
+            saved_codec = str(data["codec"]) if "codec" in data else "float32"
+            # Re-encode when the configured codec changed since the snapshot was taken
+            if saved_codec == "int8" and index.codec != "int8":
+                vectors = Int8Codec(dim).decode(vectors, scales)
+            elif saved_codec != "int8" and index.codec == "int8":
+                vectors, scales = index._int8.encode(vectors)
+            index._ids = json.loads(str(data["ids"]))
+            index._vectors = vectors.astype(index._dtype)
+            index._scales = scales
+            index._assignments = data["assignments"].astype(np.int32)
+            index._centroids = data["centroids"] if len(data["centroids"]) else None
+            index._trained_at = int(data["trained_at"])
+        index._count = len(index._ids)
+        index._alive = np.ones(index._count, dtype=bool)
+        index._slots = {item_id: i for i, item_id in enumerate(index._ids)}
+        return index
@@ -0,0 +1,69 @@
+from typing import Any, Dict, List, Tuple
+from app.core.kv_cache import KVCache
+
+SNIPPET_FIELDS = ("video_id", "title", "description", "channel_id", "channel_title", "tags", "thumbnail_url", "published_at")
+STATISTICS_FIELDS = ("views", "likes")
+
+class VideoDetailsCache:
+    """
+    Per-video cache of `videos().list` records with separate lifetimes:
+    snippets (title, tags, ...) almost never change, statistics drift slowly.
+    Backed by the shared SQLite KV store, so every worker benefits.
+    """
+
+    def __init__(self, path: str, snippet_ttl_seconds: float, statistics_ttl_seconds: float):
+        self.snippets = KVCache(path, namespace="video_snippet")
+        self.statistics = KVCache(path, namespace="video_statistics")
+        self.snippet_ttl_seconds = snippet_ttl_seconds
+        self.statistics_ttl_seconds = statistics_ttl_seconds
+
+        self.hits = 0
+        self.statistics_refreshes = 0
+        self.misses = 0
+
+    def lookup(self, video_ids: List[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str], List[str]]:
+        """
+        Blocking; run via asyncio.to_thread.
+        Returns (fresh records, ids needing a full fetch, ids needing statistics only).
+        Records for the statistics-only ids carry their cached snippet fields and the last
+        known statistics, so a failed refresh still leaves a usable record.
+        """
+        snippets = self.snippets.get_many(video_ids)
+        statistics = self.statistics.get_many(video_ids)
+
+        records: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        stale_statistics: List[str] = []
+        for video_id in video_ids:
+            snippet = snippets.get(video_id)
+            if snippet is None or snippet[1] > self.snippet_ttl_seconds:
+                missing.append(video_id)
+                continue
+            stats = statistics.get(video_id)
+            records[video_id] = dict(snippet[0])
+            if stats is not None:
+                records[video_id].update(stats[0])
+            if stats is None or stats[1] > self.statistics_ttl_seconds:
+                stale_statistics.append(video_id)
+
+        self.misses += len(missing)
+        self.statistics_refreshes += len(stale_statistics)
+        self.hits += len(video_ids) - len(missing) - len(stale_statistics)
+        return records, missing, stale_statistics
+
+    def store(self, records: List[Dict[str, Any]], statistics_only: bool = False) -> None:
+        """Blocking; run via asyncio.to_thread."""
+        if not statistics_only:
+            self.snippets.set_many({r["video_id"]: {f: r[f] for f in SNIPPET_FIELDS} for r in records})
+        self.statistics.set_many({r["video_id"]: {f: r[f] for f in STATISTICS_FIELDS} for r in records})
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.statistics_refreshes + self.misses
+        return {
+            "hits": self.hits,
+            "statistics_refreshes": self.statistics_refreshes,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "snippet_ttl_seconds": self.snippet_ttl_seconds,
+            "statistics_ttl_seconds": self.statistics_ttl_seconds,
+        }
@@ -1,92 +1,180 @@
 import os
 import asyncio
+import sqlite3
 from typing import List, Dict, Any, Optional
-import httplib2
-import certifi
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from youtube_transcript_api import YouTubeTranscriptApi
+from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound, TranscriptsDisabled, VideoUnavailable
 from app.core.config import settings
+from app.core.rate_limit import KeyedRateLimiter
+from app.core.single_flight import SingleFlight
+from app.core.replay import replay
+from app.services.search_cache import SearchCache
+from app.services.video_details_cache import VideoDetailsCache
+from app.services.transcript_cache import TranscriptCache
+from app.services.youtube_quota import KeyQuotaScheduler
+from app.services.youtube_transport import (
+    YouTubeAPIError, make_transport, SEARCH_FIELDS, VIDEO_FIELDS, COMMENT_THREAD_FIELDS
+)
+
+# Error reasons that mean "this key is spent for the day"
+QUOTA_REASONS = {"quotaExceeded", "dailyLimitExceeded"}
+# ...and "this key is briefly throttled": try another key, don't park this one
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+# REPLAY_FAULTS names -> the error the Data API would return
+REPLAY_FAULTS = {
+    "quotaExceeded": (403, "quotaExceeded"),
+    "throttling": (429, "rateLimitExceeded"),
+    "unavailable": (503, "backendError"),
+    "timeout": (0, "transportError"),
+}
+
+def _replay_fault(fault: str):
+    status, reason = REPLAY_FAULTS.get(fault, (500, fault))
+    raise YouTubeAPIError(status, reason, f"Injected {fault} (replay)")
 
 class YouTubeClient:
     def __init__(self):
-        self.api_keys = settings.YOUTUBE_API_KEYS
-        self.current_key_index = 0
-        self.exhausted = False
-        self.youtube = None
+        self.api_keys = settings.YOUTUBE_API_KEYS or (["replay"] if replay.replaying else [])
+        self.quota = KeyQuotaScheduler(len(self.api_keys), settings.YOUTUBE_DAILY_QUOTA_UNITS)
+        self.transport = None
+        self._search_semaphore = asyncio.Semaphore(settings.YOUTUBE_SEARCH_CONCURRENCY)
+        self._details_semaphore = asyncio.Semaphore(settings.YOUTUBE_DETAILS_CONCURRENCY)
+        self.key_limiter = KeyedRateLimiter(settings.YOUTUBE_KEY_RATE_PER_SECOND, settings.YOUTUBE_KEY_BURST)
+        self.search_cache: Optional[SearchCache] = None
+        self.details_cache: Optional[VideoDetailsCache] = None
+        self.transcript_cache: Optional[TranscriptCache] = None
+        self.transcript_flights = SingleFlight()
+        cache_path = os.path.join(settings.CACHE_DIR, "youtube_cache.sqlite3")
+        if settings.SEARCH_CACHE_ENABLED:
+            try:
+                self.search_cache = SearchCache(
+                    path=cache_path,
+                    ttl_seconds=settings.SEARCH_CACHE_TTL_SECONDS,
+                    stale_seconds=settings.SEARCH_CACHE_STALE_SECONDS
+                )
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️ Search cache unavailable: {e}")
+        if settings.VIDEO_DETAILS_CACHE_ENABLED:
+            try:
+                self.details_cache = VideoDetailsCache(
+                    path=cache_path,
+                    snippet_ttl_seconds=settings.VIDEO_SNIPPET_TTL_SECONDS,
+                    statistics_ttl_seconds=settings.VIDEO_STATISTICS_TTL_SECONDS
+                )
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️ Video details cache unavailable: {e}")
+        if settings.TRANSCRIPT_CACHE_ENABLED:
+            try:
+                self.transcript_cache = TranscriptCache(
+                    path=cache_path,
+                    ttl_seconds=settings.TRANSCRIPT_CACHE_TTL_SECONDS,
+                    negative_ttl_seconds=settings.TRANSCRIPT_NEGATIVE_TTL_SECONDS
+                )
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️ Transcript cache unavailable: {e}")
         self._initialize_client()
 
     def _initialize_client(self):
         if not self.api_keys:
              print("WARNING: No YOUTUBE_API_KEYS found. Discovery will fail in production.")
              return
-        
-        current_key = self.api_keys[self.current_key_index]
-        try:
-            # Use certifi to fix macOS SSL record layer failure
-            http_obj = httplib2.Http(ca_certs=certifi.where())
-            self.youtube = build('youtube', 'v3', developerKey=current_key, http=http_obj)
-            print(f"✅ YouTube Client Initialized (Project Key #{self.current_key_index + 1})")
-        except Exception as e:
-            print(f"Failed to initialize YouTube Client with SSL certs: {e}")
-            # Fallback to default build if certifi fails
-            self.youtube = build('youtube', 'v3', developerKey=current_key)
 
-    def rotate_key(self) -> bool:
+        if self.transport is None:
+            self.transport = make_transport(
+                settings.YOUTUBE_TRANSPORT,
+                pool_size=settings.YOUTUBE_HTTP_POOL_SIZE,
+                timeout_seconds=settings.YOUTUBE_HTTP_TIMEOUT_SECONDS
+            )
+        print(f"✅ YouTube Client Initialized ({len(self.api_keys)} project keys, {self.transport.name} transport)")
+
+    @property
+    def exhausted(self) -> bool:
+        """True while every key has hit its daily quota (clears at midnight Pacific)."""
+        return self.quota.exhausted
+
+    async def _request(self, resource: str, **params) -> Dict[str, Any]:
         """
-        Rotates to the next available API key in the pool.
-        Returns True if successful, False if no more keys are available.
+        One Data API call, routed to the key with the most remaining budget and paced by
+        that key's rate limiter. Quota errors park the key and retry on the next best one.
         """
-        if self.current_key_index >= len(self.api_keys) - 1:
-            print("❌ Quota Exhausted: No more fallback YouTube API keys available.")
-            self.exhausted = True
+        tried = set()
+        last_error: Optional[YouTubeAPIError] = None
+        while True:
+            key_index = self.quota.choose(resource, exclude=tried)
+            if key_index is None:
+                if last_error is not None and not self.exhausted:
+                    raise last_error # Every live key is rate limited right now
+                if not tried:
+                    print("❌ Quota Exhausted: No YouTube API keys have budget left today.")
+                raise YouTubeAPIError(403, "quotaExceeded", "All YouTube API keys are out of quota")
+
+            tried.add(key_index)
+            await self.key_limiter.acquire(key_index)
+            self.quota.charge(key_index, resource)
+            try:
+                return await replay.call(
+                    f"youtube.{resource}", params,
+                    lambda: self.transport.request(resource, params, self.api_keys[key_index]),
+                    on_fault=_replay_fault
+                )
+            except YouTubeAPIError as e:
+                last_error = e
+                if self._is_daily_quota_error(e):
+                    self.quota.mark_exhausted(key_index)
+                    print(f"🔄 YouTube API Key #{key_index + 1} out of quota; rerouting...")
+                elif e.status not in (403, 429) or e.reason not in RATE_LIMIT_REASONS:
+                    raise
+
+    async def close(self) -> None:
+        if self.transport is not None:
+            await self.transport.close()
+
+    @staticmethod
+    def _is_daily_quota_error(e: YouTubeAPIError) -> bool:
+        if e.status not in (403, 429) or e.reason in RATE_LIMIT_REASONS:
             return False
-            
-        self.current_key_index += 1
-        print(f"🔄 Rotating to YouTube API Key #{self.current_key_index + 1}...")
-        self._initialize_client()
-        return True
+        return e.reason in QUOTA_REASONS or "quota" in str(e).lower()
 
     async def deep_search(self, queries: List[str], max_results_per_query: int = 30) -> List[Dict[str, Any]]:
         """
         Executes multiple targeted queries simultaneously to bypass algorithmic bias.
-        Includes automatic key rotation on quota exhaustion.
+        Queries run concurrently (YOUTUBE_SEARCH_CONCURRENCY), each paced by its key's rate limiter,
+        and results are served from the persistent search cache when possible.
+        Each call goes to the key with the most quota left (see KeyQuotaScheduler).
         """
-        if not self.youtube:
+        if not self.transport:
             # Note: _get_mock_results is only for total key absence, not exhaustion.
             return self._get_mock_results(queries)
 
         all_video_ids = set()
         
-        async def fetch_query(query, retry_count=0):
+        async def fetch_query(query):
+            async with self._search_semaphore:
+                response = await self._request(
+                    "search",
+                    part="id",
+                    q=query,
+                    type="video",
+                    maxResults=max_results_per_query,
+                    relevanceLanguage="en",
+                    order="relevance",
+                    fields=SEARCH_FIELDS
+                )
+            return [item['id']['videoId'] for item in response.get('items', [])]
+
+        async def cached_fetch(query):
             try:
-                def execute_search():
-                    request = self.youtube.search().list(
-                        part="id",
-                        q=query,
-                        type="video",
-                        maxResults=max_results_per_query,
-                        relevanceLanguage="en",
-                        order="relevance"
-                    )
-                    return request.execute()
-                
-                response = await asyncio.to_thread(execute_search)
-                return [item['id']['videoId'] for item in response.get('items', [])]
-            except HttpError as e:
-                # 403 quotaExceeded is the trigger for rotation
-                if (e.resp.status == 403 or e.resp.status == 429) and retry_count < len(self.api_keys):
-                    if "quota" in str(e).lower() or "limit" in str(e).lower():
-                        if self.rotate_key():
-                            return await fetch_query(query, retry_count + 1)
+                if self.search_cache is None:
+                    return await fetch_query(query)
+                key = SearchCache.make_key(query, max_results_per_query, "relevance", "en")
+                return await self.search_cache.get_or_fetch(key, lambda: fetch_query(query))
+            except YouTubeAPIError as e:
                 print(f"YouTube Search Query Failed: {query}. Error: {e}")
                 return []
 
-        results = []
-        for q in queries:
-            v_ids = await fetch_query(q)
-            results.append(v_ids)
-            
+        results = await asyncio.gather(*(cached_fetch(q) for q in queries))
+
+
         for item_list in results:
             for vid in item_list:
                 all_video_ids.add(vid)
@@ -97,66 +185,206 @@ class YouTubeClient:
             
         return await self.get_video_details(unique_ids)
 
-    async def get_video_details(self, video_ids: List[str], retry_count=0) -> List[Dict[str, Any]]:
+    async def get_video_details(self, video_ids: List[str]) -> List[Dict[str, Any]]:
         """
         Fetches rich details for videos, with key rotation support.
+        With the details cache enabled only missing/stale IDs hit the API: a stale snippet
+        refetches the whole record, stale statistics alone are refreshed with part="statistics".
+        Results keep the order of `video_ids`.
         """
-        if not self.youtube:
+        if not self.transport:
              return []
+        if self.details_cache is None:
+            return await self._fetch_video_details(video_ids, "snippet,statistics")
 
-        videos = []
-        for i in range(0, len(video_ids), 50):
-            batch_ids = video_ids[i:i+50]
-            id_string = ",".join(batch_ids)
-            
-            try:
-                def execute_details():
-                    request = self.youtube.videos().list(
-                        part="snippet,statistics",
-                        id=id_string
-                    )
-                    return request.execute()
-                
-                response = await asyncio.to_thread(execute_details)
-                
-                for item in response.get('items', []):
-                    videos.append({
-                        "video_id": item['id'],
-                        "title": item['snippet']['title'],
-                        "description": item['snippet']['description'],
-                        "channel_id": item['snippet']['channelId'],
-                        "channel_title": item['snippet']['channelTitle'],
-                        "tags": item['snippet'].get('tags', []),
-                        "thumbnail_url": item['snippet']['thumbnails'].get('high', {}).get('url', ''),
-                        "views": int(item['statistics'].get('viewCount', 0)),
-                        "likes": int(item['statistics'].get('likeCount', 0)),
-                        "published_at": item['snippet']['publishedAt']
-                    })
-            except HttpError as e:
-                if (e.resp.status == 403 or e.resp.status == 429) and retry_count < len(self.api_keys):
-                     if "quota" in str(e).lower() or "limit" in str(e).lower():
-                        if self.rotate_key():
-                            # Retry the entire details fetch with the new key (recursive)
-                            return await self.get_video_details(video_ids, retry_count + 1)
-                print(f"Error fetching video details: {e}")
+        video_ids = list(dict.fromkeys(video_ids))
+        try:
+            records, missing, stale_statistics = await asyncio.to_thread(self.details_cache.lookup, video_ids)
+        except sqlite3.Error as e:
+            print(f"⚠️ Video details cache read failed, fetching directly: {e}")
+            return await self._fetch_video_details(video_ids, "snippet,statistics")
+
+        # Fold statistics-only IDs into the full fetch when that saves a 50-ID batch
+        if missing and stale_statistics and self._batches(len(missing) + len(stale_statistics)) < self._batches(len(missing)) + self._batches(len(stale_statistics)):
+            missing, stale_statistics = missing + stale_statistics, []
+
+        fetched, refreshed = await asyncio.gather(
+            self._fetch_video_details(missing, "snippet,statistics"),
+            self._fetch_video_details(stale_statistics, "statistics")
+        )
+        try:
+            if fetched:
+                await asyncio.to_thread(self.details_cache.store, fetched)
+            if refreshed:
+                await asyncio.to_thread(self.details_cache.store, refreshed, True)
+        except sqlite3.Error as e:
+            print(f"⚠️ Video details cache write failed: {e}")
+
+        for video in fetched:
+            records[video["video_id"]] = video
+        for stats in refreshed:
+            if stats["video_id"] in records:
+                records[stats["video_id"]].update(stats)
+        # Statistics that failed to refresh fall back to the last known values
+        return [records[vid] for vid in video_ids if vid in records and "views" in records[vid]]
+
+    @staticmethod
+    def _batches(count: int) -> int:
+        return -(-count // 50)
+
+    @staticmethod
+    def _parse_video_item(item: Dict[str, Any]) -> Dict[str, Any]:
+        video = {
+            "video_id": item['id'],
+            "views": int(item.get('statistics', {}).get('viewCount', 0)),
+            "likes": int(item.get('statistics', {}).get('likeCount', 0)),
+        }
+        if 'snippet' in item:
+            video.update({
+                "title": item['snippet']['title'],
+                "description": item['snippet'].get('description', ''),
+                "channel_id": item['snippet']['channelId'],
+                "channel_title": item['snippet']['channelTitle'],
+                "tags": item['snippet'].get('tags', []),
+                "thumbnail_url": item['snippet'].get('thumbnails', {}).get('high', {}).get('url', ''),
+                "published_at": item['snippet']['publishedAt']
+            })
+        return video
+
+    def _is_retryable_error(self, e: YouTubeAPIError) -> bool:
+        if e.status == 0 or e.status >= 500:
+            return True # Network / backend hiccup
+        return e.status in (403, 429) and e.reason in RATE_LIMIT_REASONS
+
+    async def _fetch_video_details(self, video_ids: List[str], part: str) -> List[Dict[str, Any]]:
+        """
+        Fetches 50-ID chunks concurrently (YOUTUBE_DETAILS_CONCURRENCY). Quota errors are
+        rerouted to another key inside _request; chunks that still fail transiently are
+        retried on their own, so finished chunks are never fetched twice.
+        """
+        video_ids = list(dict.fromkeys(video_ids))
+        chunks = [video_ids[i:i+50] for i in range(0, len(video_ids), 50)]
+
+        async def fetch_chunk(batch_ids):
+            async with self._details_semaphore:
+                response = await self._request("videos", part=part, id=",".join(batch_ids), fields=VIDEO_FIELDS[part])
+            return [self._parse_video_item(item) for item in response.get('items', [])]
 
+        results: Dict[int, List[Dict[str, Any]]] = {}
+        pending = list(range(len(chunks)))
+        for attempt in range(settings.YOUTUBE_DETAILS_RETRIES + 1):
+            if attempt:
+                await asyncio.sleep(0.5 * attempt)
+            outcomes = await asyncio.gather(*(fetch_chunk(chunks[i]) for i in pending), return_exceptions=True)
+            failed = []
+            for i, outcome in zip(pending, outcomes):
+                if isinstance(outcome, YouTubeAPIError):
+                    if self._is_retryable_error(outcome) and attempt < settings.YOUTUBE_DETAILS_RETRIES:
+                        failed.append(i)
+                    else:
+                        print(f"Error fetching video details: {outcome}")
+                elif isinstance(outcome, BaseException):
+                    raise outcome
+                else:
+                    results[i] = outcome
+            if not failed:
+                break
+            pending = failed
+
+        videos = []
+        seen = set()
+        for i in sorted(results):
+            for video in results[i]:
+                if video["video_id"] not in seen:
+                    seen.add(video["video_id"])
+                    videos.append(video)
         return videos
 
-    async def get_captions(self, video_id: str) -> str | None:
+    async def get_comment_threads(self, video_id: str, max_results: int = 50) -> List[Dict[str, Any]]:
+        """
+        Top-level comments for a video (one commentThreads page, most relevant first).
+        """
+        if not self.transport:
+            return []
+
+        try:
+            response = await self._request(
+                "commentThreads",
+                part="snippet",
+                videoId=video_id,
+                maxResults=min(max_results, 100),
+                order="relevance",
+                textFormat="plainText",
+                fields=COMMENT_THREAD_FIELDS
+            )
+        except YouTubeAPIError as e:
+            print(f"Error fetching comments for {video_id}: {e}")
+            return []
+
+        comments = []
+        for item in response.get('items', []):
+            comment = item['snippet']['topLevelComment']['snippet']
+            comments.append({
+                "text": comment.get('textDisplay', ''),
+                "author": comment.get('authorDisplayName', ''),
+                "likes": int(comment.get('likeCount', 0)),
+                "published_at": comment.get('publishedAt', '')
+            })
+        return comments
+
+    async def get_captions(self, video_id: str, language: str = "en") -> str | None:
         """
         Attempts to fetch auto-generated or manual captions via YouTubeTranscriptApi.
         Note: This library does NOT use the official API key for transcripts.
+        Results, including "no captions", are cached per (video_id, language).
         """
+        if self.transcript_cache is not None:
+            try:
+                found, text = await asyncio.to_thread(self.transcript_cache.get, video_id, language)
+            except Exception as e:
+                print(f"⚠️ Transcript cache read failed for {video_id}: {e}")
+                found, text = False, None
+            if found:
+                return text
+        return await self.transcript_flights.do(
+            TranscriptCache.make_key(video_id, language),
+            lambda: self._fetch_captions(video_id, language)
+        )
+
+    async def _fetch_captions(self, video_id: str, language: str) -> str | None:
+        def fetch_transcript():
+            if hasattr(YouTubeTranscriptApi, "get_transcript"): # youtube-transcript-api < 1.0
+                transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=(language,))
+            else:
+                transcript_list = YouTubeTranscriptApi().fetch(video_id, languages=(language,)).to_raw_data()
+            return " ".join([t['text'] for t in transcript_list])
+
         try:
-            def fetch_transcript():
-                transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-                return " ".join([t['text'] for t in transcript_list])
-            
-            return await asyncio.to_thread(fetch_transcript)
+            text = await asyncio.to_thread(fetch_transcript)
+        except (NoTranscriptFound, TranscriptsDisabled, VideoUnavailable) as e:
+            print(f"Captions missing for {video_id}, falling back to audio pipeline. ({e.__class__.__name__})")
+            await self.cache_transcript(video_id, None, language)
+            return None
         except Exception as e:
+            # Network errors / IP blocks are not an answer: don't cache them
             print(f"Captions missing for {video_id}, falling back to audio pipeline. ({e.__class__.__name__})")
             return None
-            
+
+        await self.cache_transcript(video_id, text, language)
+        return text
+
+    async def cache_transcript(self, video_id: str, text: Optional[str], language: str = "en", source: str = "captions") -> None:
+        """
+        Stores a transcript (or a "no captions" negative when text is None). Used by the
+        audio pipeline too, so a video transcribed once is served instantly next time.
+        """
+        if self.transcript_cache is None:
+            return
+        try:
+            await asyncio.to_thread(self.transcript_cache.put, video_id, language, text, source)
+        except sqlite3.Error as e:
+            print(f"⚠️ Transcript cache write failed for {video_id}: {e}")
+
     @staticmethod
     def extract_video_id(url: str) -> str | None:
         """
@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+    try:
+        QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+    except ZoneInfoNotFoundError:
+        QUOTA_TIMEZONE = timezone(timedelta(hours=-8)) # No tzdata (slim images): assume PST
+except ImportError:
+    QUOTA_TIMEZONE = timezone(timedelta(hours=-8))
+
+# YouTube Data API v3 cost per call, in quota units
+UNIT_COSTS = {
+    "search": 100,
+    "videos": 1,
+    "commentThreads": 1,
+}
+
+class KeyQuotaScheduler:
+    """
+    Tracks estimated daily quota spend per YouTube API key and picks the key with
+    the most remaining budget for each call. Keys that return quotaExceeded are
+    parked until the next reset (midnight Pacific), then everything starts fresh.
+
+    All methods are synchronous and called from the event loop, so concurrent
+    coroutines never see a half-updated state.
+    """
+
+    def __init__(self, num_keys: int, daily_quota: int = 10000):
+        self.num_keys = num_keys
+        self.daily_quota = daily_quota
+        self._spent: List[int] = [0] * num_keys
+        self._calls: List[int] = [0] * num_keys
+        self._exhausted: List[bool] = [False] * num_keys
+        self._quota_day = self._today()
+
+    @staticmethod
+    def _today():
+        return datetime.now(QUOTA_TIMEZONE).date()
+
+    def _maybe_reset(self) -> None:
+        today = self._today()
+        if today != self._quota_day:
+            print(f"🌅 YouTube quota day rolled over ({today}); resetting {self.num_keys} key budgets.")
+            self._quota_day = today
+            self._spent = [0] * self.num_keys
+            self._calls = [0] * self.num_keys
+            self._exhausted = [False] * self.num_keys
+
+    def remaining(self, key_index: int) -> int:
+        self._maybe_reset()
+        if self._exhausted[key_index]:
+            return 0
+        return max(0, self.daily_quota - self._spent[key_index])
+
+    def choose(self, resource: str, exclude: Optional[Set[int]] = None) -> Optional[int]:
+        """
+        Key with the most remaining budget that isn't parked or excluded. When every
+        estimate says the call won't fit, the best key is still tried (estimates drift);
+        only a real quotaExceeded parks a key. None means every key is parked.
+        """
+        self._maybe_reset()
+        exclude = exclude or set()
+        candidates = [i for i in range(self.num_keys) if not self._exhausted[i] and i not in exclude]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda i: (self.daily_quota - self._spent[i], -i))
+
+    def charge(self, key_index: int, resource: str) -> None:
+        # YouTube bills the call whether or not it succeeds
+        self._spent[key_index] += UNIT_COSTS.get(resource, 1)
+        self._calls[key_index] += 1
+
+    def mark_exhausted(self, key_index: int) -> None:
+        self._exhausted[key_index] = True
+
+    @property
+    def exhausted(self) -> bool:
+        self._maybe_reset()
+        return self.num_keys > 0 and all(self._exhausted)
+
+    def seconds_until_reset(self) -> int:
+        now = datetime.now(QUOTA_TIMEZONE)
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=now.tzinfo)
+        return int((midnight - now).total_seconds())
+
+    def stats(self) -> Dict[str, Any]:
+        self._maybe_reset()
+        keys = [
+            {
+                "key": f"#{i + 1}",
+                "spent_units": self._spent[i],
+                "remaining_units": self.remaining(i),
+                "calls": self._calls[i],
+                "exhausted": self._exhausted[i],
+            }
+            for i in range(self.num_keys)
+        ]
+        return {
+            "quota_day": str(self._quota_day),
+            "daily_quota_per_key": self.daily_quota,
+            "remaining_units": sum(k["remaining_units"] for k in keys),
+            "searches_remaining": sum(k["remaining_units"] // UNIT_COSTS["search"] for k in keys),
+            "resets_in_seconds": self.seconds_until_reset(),
+            "keys": keys,
+        }
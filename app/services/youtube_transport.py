@@ -0,0 +1,123 @@
+"""
+Transports for the YouTube Data API v3.
+
+- AiohttpTransport (default): calls the REST endpoints directly on one pooled
+  keep-alive aiohttp session. No thread per request, no shared httplib2.Http.
+- DiscoveryTransport: the original googleapiclient path, imported lazily and
+  given a fresh httplib2.Http per call (httplib2 is not thread-safe).
+
+Both raise YouTubeAPIError, so callers handle one exception type.
+"""
+import json
+import asyncio
+from typing import Any, Dict, List, Optional
+import aiohttp
+
+YOUTUBE_API_BASE = "https://www.googleapis.com/youtube/v3"
+
+# Partial responses: only the fields YouTubeClient actually reads
+SEARCH_FIELDS = "items(id/videoId)"
+VIDEO_FIELDS = {
+    "snippet,statistics": "items(id,snippet(title,description,channelId,channelTitle,tags,thumbnails/high/url,publishedAt),statistics(viewCount,likeCount))",
+    "statistics": "items(id,statistics(viewCount,likeCount))",
+}
+COMMENT_THREAD_FIELDS = "nextPageToken,items(snippet/topLevelComment/snippet(textDisplay,authorDisplayName,likeCount,publishedAt))"
+
+class YouTubeAPIError(Exception):
+    def __init__(self, status: int, reason: str = "", message: str = ""):
+        self.status = status
+        self.reason = reason
+        self.message = message
+        super().__init__(f"YouTube API {status} {reason}: {message}")
+
+class AiohttpTransport:
+    name = "aiohttp"
+
+    def __init__(self, pool_size: int = 20, timeout_seconds: float = 15):
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(total=timeout_seconds)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # A session is bound to its event loop (Lambda may hand us a fresh one)
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed and self._session_loop is not loop:
+            # Release the previous loop's connector instead of leaking it ("Unclosed client session")
+            try:
+                await self._session.close()
+            except Exception as e:
+                print(f"⚠️ Could not close stale YouTube session: {e}")
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=30, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers={"Accept-Encoding": "gzip"}
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def request(self, resource: str, params: Dict[str, Any], api_key: str) -> Dict[str, Any]:
+        query = {k: v for k, v in params.items() if v is not None}
+        query["key"] = api_key
+        session = await self._get_session()
+        try:
+            async with session.get(f"{YOUTUBE_API_BASE}/{resource}", params=query) as resp:
+                if resp.status < 400:
+                    return await resp.json(content_type=None)
+                body = await resp.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise YouTubeAPIError(0, "transportError", str(e) or e.__class__.__name__) from e
+        except ValueError as e:
+            # Truncated / non-JSON success body: status 0 so callers retry it like a transport error
+            raise YouTubeAPIError(0, "invalidResponse", str(e) or e.__class__.__name__) from e
+        raise _error_from_body(resp.status, body)
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+class DiscoveryTransport:
+    name = "discovery"
+
+    def __init__(self):
+        self._services: Dict[str, Any] = {}
+
+    def _service(self, api_key: str):
+        service = self._services.get(api_key)
+        if service is None:
+            from googleapiclient.discovery import build
+            service = self._services[api_key] = build('youtube', 'v3', developerKey=api_key)
+        return service
+
+    async def request(self, resource: str, params: Dict[str, Any], api_key: str) -> Dict[str, Any]:
+        import httplib2
+        import certifi
+        from googleapiclient.errors import HttpError
+
+        def execute():
+            request = getattr(self._service(api_key), resource)().list(**{k: v for k, v in params.items() if v is not None})
+            # Use certifi to fix macOS SSL record layer failure
+            return request.execute(http=httplib2.Http(ca_certs=certifi.where()))
+
+        try:
+            return await asyncio.to_thread(execute)
+        except HttpError as e:
+            raise _error_from_body(e.resp.status, e.content.decode("utf-8", "replace") if isinstance(e.content, bytes) else str(e.content)) from e
+
+    async def close(self) -> None:
+        pass
+
+def _error_from_body(status: int, body: str) -> YouTubeAPIError:
+    try:
+        error = json.loads(body).get("error", {})
+        errors: List[Dict[str, Any]] = error.get("errors") or [{}]
+        return YouTubeAPIError(status, errors[0].get("reason", ""), error.get("message", ""))
+    except (ValueError, AttributeError):
+        return YouTubeAPIError(status, "", body[:200])
+
+def make_transport(name: str, pool_size: int = 20, timeout_seconds: float = 15):
+    if name == "discovery":
+        return DiscoveryTransport()
+    return AiohttpTransport(pool_size=pool_size, timeout_seconds=timeout_seconds)
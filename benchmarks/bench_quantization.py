@@ -0,0 +1,101 @@
+"""
+Memory / recall trade-off of the embedding codecs in app/services/quantization.py.
+
+Vectors come from the local Pantry index snapshot (CACHE_DIR/pantry), else the
+embedding store (CACHE_DIR/embeddings), else a synthetic clustered set. Held-out
+vectors act as queries; recall@10 is measured against exact float32 search.
+
+    python -m benchmarks.bench_quantization [--limit 20000] [--save]
+
+--save trains the m=256 product quantizer on the data and writes it to
+EMBEDDING_PQ_CODEBOOK so EMBEDDING_CACHE_CODEC=pq can use it.
+"""
+import os
+import sys
+import time
+import numpy as np
+from app.core.config import settings
+from app.services.bedrock_agent import BedrockAgent
+from app.services.embedding_store import EmbeddingStore
+from app.services.quantization import Int8Codec, ProductQuantizer
+from app.services.vector_index import VectorIndex
+
+DIM = BedrockAgent.EMBEDDING_DIMENSIONS
+QUERIES = 200
+TOP_K = 10
+
+def load_vectors(limit: int):
+    pantry_path = os.path.join(settings.CACHE_DIR, "pantry", "pantry_index.npz")
+    if os.path.exists(pantry_path):
+        index = VectorIndex.load(pantry_path, DIM)
+        if len(index) >= 1000:
+            return index._decoded(slice(0, min(len(index), limit))), "pantry index"
+
+    store_dir = os.path.join(settings.CACHE_DIR, "embeddings")
+    if os.path.isdir(store_dir):
+        store = EmbeddingStore(store_dir, DIM)
+        keys = list(store._index)[:limit]
+        vectors = [v for v in (store.get(k) for k in keys) if v is not None and v.any()]
+        if len(vectors) >= 1000:
+            return np.stack(vectors), "embedding store"
+
+    # Clustered stand-in: a few hundred "topics" with per-video noise
+    rng = np.random.default_rng(0)
+    n = min(limit, 20000)
+    topics = rng.standard_normal((300, DIM)).astype(np.float32)
+    vectors = topics[rng.integers(0, 300, n)] + 0.6 * rng.standard_normal((n, DIM)).astype(np.float32)
+    return vectors, "synthetic (no local pantry data found)"
+
+def recall(truth: np.ndarray, scores: np.ndarray) -> float:
+    found = np.argpartition(-scores, TOP_K, axis=1)[:, :TOP_K]
+    return float(np.mean([len(set(t) & set(f)) / TOP_K for t, f in zip(truth, found)]))
+
+def main():
+    limit = int(sys.argv[sys.argv.index("--limit") + 1]) if "--limit" in sys.argv else 20000
+    vectors, source = load_vectors(limit + QUERIES)
+    vectors = (vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)).astype(np.float32)
+    queries, base = vectors[:QUERIES], vectors[QUERIES:]
+    print(f"📊 {len(base)} vectors x {DIM} dims from {source}, {QUERIES} queries, recall@{TOP_K}\n")
+
+    exact = queries @ base.T
+    truth = np.argpartition(-exact, TOP_K, axis=1)[:, :TOP_K]
+    print(f"{'codec':<12}{'bytes/vec':>10}{'memory':>10}{'ratio':>8}{'recall@10':>11}{'ms/query':>10}{'us/decode':>11}")
+
+    def report(name, bytes_per_vector, score_fn, decode_fn=None):
+        start = time.perf_counter()
+        scores = np.stack([score_fn(q) for q in queries])
+        ms = (time.perf_counter() - start) * 1000 / QUERIES
+        memory_mb = bytes_per_vector * len(base) / 2 ** 20
+        # Per-hit cost of EmbeddingCache.get, which decodes one entry back to float32
+        decode_us = "-"
+        if decode_fn:
+            rows = min(len(base), 2000)
+            start = time.perf_counter()
+            for i in range(rows):
+                decode_fn(i)
+            decode_us = f"{(time.perf_counter() - start) * 1e6 / rows:.1f}"
+        print(f"{name:<12}{bytes_per_vector:>10}{memory_mb:>8.1f}MB{DIM * 4 / bytes_per_vector:>7.1f}x"
+              f"{recall(truth, scores):>11.3f}{ms:>10.2f}{decode_us:>11}")
+
+    report("float32", DIM * 4, lambda q: base @ q)
+
+    int8 = Int8Codec(DIM)
+    codes, scales = int8.encode(base)
+    report("int8", int8.bytes_per_vector(), lambda q: int8.inner_products(q, codes, scales),
+           lambda i: int8.decode_one((codes[i], scales[i])))
+
+    for m in (256, 128, 64):
+        pq = ProductQuantizer(DIM, m=m)
+        pq.train(base[:min(len(base), 10000)])
+        pq_codes = pq.encode(base)
+        report(f"pq m={m}", pq.bytes_per_vector(), lambda q: pq.inner_products(q, pq_codes),
+               lambda i: pq.decode_one(pq_codes[i]))
+        if m == 256 and "--save" in sys.argv:
+            pq.save(settings.EMBEDDING_PQ_CODEBOOK)
+            saved = settings.EMBEDDING_PQ_CODEBOOK
+
+    if "--save" in sys.argv:
+        print(f"\n💾 PQ codebook (m=256) written to {saved}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Micro-benchmark: full ranking (k=None) vs heap-based top-k selection (k=50)
+in RankingEngine.rank_videos at 5k and 50k candidates.
+
+Embeddings come from a deterministic in-process stand-in and are pre-warmed.
+k only saves the full sort and write-back of the non-winners; Stage 1 (BM25 +
+heuristic over every candidate) runs either way and dominates at 50k, so expect
+roughly a third off, not a cost proportional to k.
+
+    DEMO_MODE=False EMBEDDING_STORE_ENABLED=False PANTRY_INDEX_ENABLED=False \
+        python -m benchmarks.bench_rank_topk
+"""
+import time
+import asyncio
+import random
+import statistics
+import numpy as np
+from app.core.models import Video, HyperbolicIntent
+from app.services.bedrock_agent import BedrockAgent, EmbeddingResult
+from app.services.ranking_engine import RankingEngine
+
+WORDS = [f"term{i}" for i in range(5000)] + ["lofi", "beats", "study", "chill"]
+
+class StaticEmbeddingAgent(BedrockAgent):
+    """Deterministic Titan stand-in: a seeded random unit vector per text."""
+
+    def __init__(self):
+        pass
+
+    async def generate_embeddings(self, text):
+        rng = np.random.default_rng(abs(hash(text)) % (2 ** 32))
+        vector = rng.standard_normal(self.EMBEDDING_DIMENSIONS).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    async def generate_embeddings_batch(self, texts):
+        return [EmbeddingResult(text=t, vector=await self.generate_embeddings(t)) for t in texts]
+
+def make_videos(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    def text(words): return " ".join(rng.choice(WORDS) for _ in range(words))
+    return [
+        Video(
+            video_id=f"vid{i}", title=text(8), description=text(rng.randint(20, 200)),
+            channel="bench", views="0", published="2024-01-01T00:00:00Z",
+            tags=text(5).split(), raw_views=rng.randint(0, 5_000_000),
+            engagement_rate=rng.random() * 0.1
+        )
+        for i in range(n)
+    ]
+
+async def time_rank(engine, videos, intent, k, repeats):
+    timings = []
+    for _ in range(repeats):
+        batch = [v.model_copy() for v in videos]
+        start = time.perf_counter()
+        result = await engine.rank_videos(batch, intent, k=k)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), len(result)
+
+async def main():
+    engine = RankingEngine(bedrock_agent=StaticEmbeddingAgent())
+    intent = HyperbolicIntent(
+        sub_culture="Lofi Study", vibe="Chill", target_audience="Students",
+        boost_keywords=["lofi beats", "study"], suppress_keywords=[]
+    )
+    print(f"{'candidates':>10} | {'k':>5} | {'median ms':>9} | returned")
+    for n in (5_000, 50_000):
+        videos = make_videos(n)
+        await engine.rank_videos([v.model_copy() for v in videos], intent, k=None) # warm embeddings
+        repeats = 7 if n <= 5_000 else 3
+        for k in (None, 50):
+            ms, returned = await time_rank(engine, videos, intent, k, repeats)
+            print(f"{n:>10} | {str(k):>5} | {ms:>9.1f} | {returned}")
+
+if __name__ == "__main__":
+    asyncio.run(main())